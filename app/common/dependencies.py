@@ -1,5 +1,7 @@
 from typing import Union, Annotated
 from datetime import datetime, timezone, timedelta
+import hashlib
+import time
 import jwt
 from fastapi.security import APIKeyCookie
 from fastapi import Depends
@@ -8,12 +10,20 @@ from app.core import config
 from app.common import exceptions
 from app.common.token_schema import AccessToken, Token
 from app.modules.admin.admin_model import AdminModel
+from app.modules.users.users_model import UsersModel
 from app.core.crypto import TextCrypto
+from app.core.cache import TTLCache
 
 
 authentication_cookie_scheme = APIKeyCookie(name="Authorization")
 refresh_cookie_scheme = APIKeyCookie(name="Refresh")
 
+# decoded and decrypted principals by token digest, each one expires with its token
+token_claims_cache = TTLCache(
+    ttl=config.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    max_entries=config.TOKEN_CLAIMS_CACHE_MAX_ENTRIES,
+)
+
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
@@ -81,19 +91,42 @@ async def validate_refresh_token(
 
 
 async def get_current_basic_user(
-    token_data: Annotated[AccessToken, Depends(validate_access_token)],
+    token: Annotated[str, Depends(authentication_cookie_scheme)],
 ):
+    token_digest = hashlib.sha256(token.encode()).digest()
+    current_user = token_claims_cache.get(token_digest)
+    if current_user is not None:
+        return current_user
+
+    token_data = await validate_access_token(token)
     username = TextCrypto(encrypted_text=token_data.name).decrypt_text()
     role = TextCrypto(encrypted_text=token_data.role).decrypt_text()
 
-    return {"user_uuid": token_data.sub, "username": username, "role": role}
+    current_user = {"user_uuid": token_data.sub, "username": username, "role": role}
+    token_claims_cache.set(
+        token_digest, current_user, ttl=token_data.exp - time.time()
+    )
+
+    return current_user
 
 
 async def get_refresh_token(
     token_data: Annotated[AccessToken, Depends(validate_access_token)],
     auth_model: Annotated[AdminModel, Depends(AdminModel)],
 ):
-    user = auth_model.get_user_by_uuid(user_uuid=token_data.sub)
+    user = await auth_model.get_user_by_uuid(user_uuid=token_data.sub)
+
+    if not user:
+        raise exceptions.permission_exception
+
+    return user
+
+
+async def get_refresh_customer_user(
+    token_data: Annotated[AccessToken, Depends(validate_access_token)],
+    users_model: Annotated[UsersModel, Depends(UsersModel)],
+):
+    user = await users_model.get_user_by_uuid(user_uuid=token_data.sub)
 
     if not user:
         raise exceptions.permission_exception
@@ -104,8 +137,20 @@ async def get_refresh_token(
 async def get_current_admin_user(
     current_user: Annotated[dict, Depends(get_current_basic_user)],
 ):
-    print(current_user, config.ADMIN_ROLE)
     if current_user.get("role") != config.ADMIN_ROLE:
         raise exceptions.permission_exception
 
     return current_user
+
+
+async def get_current_customer_user(
+    current_user: Annotated[dict, Depends(get_current_basic_user)],
+):
+    """
+    Claims of a customer user, its user_uuid is the sys_user_uuid of the
+    customer
+    """
+    if current_user.get("role") != config.USER_ROLE:
+        raise exceptions.permission_exception
+
+    return current_user
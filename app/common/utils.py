@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable
+from fastapi import HTTPException, status
+from app.core import config
+
+
+async def gather_limited(
+    function: Callable[[Any], Awaitable[Any]], items: Iterable[Any], limit: int
+) -> list[Any]:
+    """
+    Run a coroutine function for every item with at most `limit` running at once
+    args:
+        function: Callable -> coroutine function called with each item
+        items: Iterable -> items to process
+        limit: int -> max concurrent calls
+    return:
+        list with the result or the raised exception of every item, in order
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            return await function(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+
+def batch_results(outcomes: list[Any]) -> list[dict]:
+    """
+    Build the per item status of a batch
+    args:
+        outcomes: list -> results or exceptions returned by gather_limited
+    return:
+        list of dicts with the index, status_code and result or detail
+    """
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, HTTPException):
+            results.append(
+                {
+                    "index": index,
+                    "status_code": outcome.status_code,
+                    "detail": outcome.detail,
+                }
+            )
+        elif isinstance(outcome, Exception):
+            results.append(
+                {
+                    "index": index,
+                    "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "detail": "Unexpected error",
+                }
+            )
+        else:
+            results.append(
+                {"index": index, "status_code": status.HTTP_200_OK, "result": outcome}
+            )
+    return results
+
+
+def check_batch_size(items: list):
+    """
+    Reject batches bigger than the configured limit
+    """
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch accepts at most {config.BATCH_MAX_ITEMS} items.",
+        )
@@ -0,0 +1,427 @@
+"""In-process caches"""
+
+import asyncio
+import contextlib
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from fastapi import HTTPException
+from app.core import config
+
+# coroutine function returning a fresh value and its tags
+Loader = Callable[[], Awaitable[tuple[Any, set]]]
+
+
+class CacheEntry:
+    """
+    Object of a cached value
+    """
+
+    def __init__(
+        self,
+        value: Any,
+        expires_at: float,
+        stale_until: float,
+        tags: frozenset,
+        loader: Optional[Loader] = None,
+    ):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.tags = tags
+        self.loader = loader
+        self.hits = 0
+
+
+def is_server_error(exc: Exception) -> bool:
+    return not isinstance(exc, HTTPException) or exc.status_code >= 500
+
+
+class TTLCache:
+    """
+    LRU cache with a time to live per entry and tag based invalidation.
+    Entries read through get_or_load are kept past their ttl to be served
+    stale while a background task refreshes them, or while the source fails
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        stale_while_revalidate: float = 0.0,
+        stale_if_error: float = 0.0,
+    ):
+        """
+        args:
+            ttl: float -> seconds an entry is fresh
+            max_entries: int -> max entries before the least recently used is evicted
+            stale_while_revalidate: float -> seconds an expired entry is served
+                        while it is refreshed in the background
+            stale_if_error: float -> seconds an expired entry is served when
+                        its refresh fails
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.__entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self.__tags: dict[Hashable, set] = {}
+        self.__refreshing: dict[Hashable, asyncio.Task] = {}
+        # generation of the last invalidation of each tag, kept while a load
+        # started before it may still store its value
+        self.__generation = 0
+        self.__invalidated: dict[Hashable, int] = {}
+        self.__cleared = 0
+        self.__loads = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        self.stale_errors = 0
+        self.refreshes = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a fresh value from the cache
+        args:
+            key: Hashable -> key of the entry
+        return:
+            The cached value or None on a miss
+        """
+        entry = self.__entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry.expires_at <= now:
+            if entry is not None and entry.stale_until <= now:
+                self.delete(key)
+            self.misses += 1
+            return None
+
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        entry.hits += 1
+        return entry.value
+
+    async def get_or_load(self, key: Hashable, loader: Loader) -> Any:
+        """
+        Get a value from the cache, loading it on a miss. An expired entry is
+        returned at once while a background task refreshes it, and is returned
+        when loading it fails with a server error
+        args:
+            key: Hashable -> key of the entry
+            loader: Loader -> coroutine function returning the value and its tags
+        return:
+            The fresh or stale value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        entry = self.__entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry.expires_at + self.stale_while_revalidate:
+            self.__entries.move_to_end(key)
+            self.stale_hits += 1
+            entry.hits += 1
+            self.refresh(key, loader)
+            return entry.value
+
+        generation = self.__start_load()
+        try:
+            value, tags = await loader()
+
+        except Exception as exc:
+            entry = self.__entries.get(key)
+            if (
+                entry is not None
+                and now < entry.expires_at + self.stale_if_error
+                and is_server_error(exc)
+            ):
+                self.stale_errors += 1
+                return entry.value
+            raise
+
+        finally:
+            self.__loads -= 1
+
+        # a value read before an invalidation of its tags is not stored
+        if not self.invalidated_since(generation, tags):
+            self.set(key, value, tags=tags, loader=loader)
+        return value
+
+    def refresh(self, key: Hashable, loader: Loader):
+        """
+        Reload an entry in the background, one refresh per key at a time
+        args:
+            key: Hashable -> key of the entry
+            loader: Loader -> coroutine function returning the value and its tags
+        """
+        if key in self.__refreshing:
+            return
+
+        entry = self.__entries.get(key)
+        task = asyncio.create_task(self.__reload(key, loader, entry))
+        self.__refreshing[key] = task
+        task.add_done_callback(lambda done: self.__refreshed(key, done))
+
+    async def __reload(
+        self, key: Hashable, loader: Loader, entry: Optional[CacheEntry]
+    ):
+        generation = self.__start_load()
+        try:
+            value, tags = await loader()
+        finally:
+            self.__loads -= 1
+        # skip the value when the entry was invalidated or replaced meanwhile
+        if self.__entries.get(key) is entry and not self.invalidated_since(
+            generation, tags
+        ):
+            self.set(key, value, tags=tags, loader=loader)
+            self.refreshes += 1
+
+    def __refreshed(self, key: Hashable, task: asyncio.Task):
+        if self.__refreshing.get(key) is task:
+            del self.__refreshing[key]
+        if not task.cancelled():
+            # a failed refresh keeps the stale entry, the error is not raised
+            task.exception()
+
+    def refresh_hot(self, top: int, horizon: float) -> int:
+        """
+        Refresh the most read entries that expire within the horizon, before
+        any request finds them expired. The read counters are halved so the
+        ranking follows the recent traffic
+        args:
+            top: int -> number of entries considered
+            horizon: float -> seconds ahead of the expiration
+        return:
+            Number of refreshes started
+        """
+        deadline = time.monotonic() + horizon
+        candidates = [
+            (entry.hits, key, entry)
+            for key, entry in self.__entries.items()
+            if entry.loader is not None and entry.hits > 0
+        ]
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        started = 0
+        for _, key, entry in candidates[:top]:
+            if entry.expires_at <= deadline:
+                self.refresh(key, entry.loader)
+                started += 1
+        for entry in self.__entries.values():
+            entry.hits //= 2
+        return started
+
+    async def cancel_refreshes(self):
+        tasks = list(self.__refreshing.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable] = (),
+        ttl: Optional[float] = None,
+        loader: Optional[Loader] = None,
+    ):
+        """
+        Store a value in the cache
+        args:
+            key: Hashable -> key of the entry
+            value: Any -> value to store
+            tags: Iterable -> tags to invalidate the entry with
+            ttl: float -> seconds the entry is fresh, defaults to the cache ttl
+            loader: Loader -> reloads the entry, entries without one are never
+                        served stale
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+
+        self.delete(key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        stale_until = expires_at
+        if loader is not None:
+            stale_until += max(self.stale_while_revalidate, self.stale_if_error)
+        entry = CacheEntry(
+            value=value,
+            expires_at=expires_at,
+            stale_until=stale_until,
+            tags=frozenset(tags),
+            loader=loader,
+        )
+        self.__entries[key] = entry
+        for tag in entry.tags:
+            self.__tags.setdefault(tag, set()).add(key)
+
+        while len(self.__entries) > self.max_entries:
+            oldest_key = next(iter(self.__entries))
+            self.delete(oldest_key)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """
+        Remove an entry from the cache
+        args:
+            key: Hashable -> key of the entry
+        """
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return
+
+        for tag in entry.tags:
+            keys = self.__tags.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.__tags[tag]
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """
+        Remove every entry stored with the tag
+        args:
+            tag: Hashable -> tag to invalidate
+        return:
+            Number of entries removed
+        """
+        self.__generation += 1
+        if self.__loads:
+            self.__invalidated[tag] = self.__generation
+        keys = list(self.__tags.get(tag, ()))
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+    def __start_load(self) -> int:
+        """
+        Count a load in flight and get the generation it starts at, the
+        invalidations older than every load in flight are forgotten
+        """
+        if not self.__loads:
+            self.__invalidated.clear()
+        self.__loads += 1
+        return self.__generation
+
+    def invalidated_since(self, generation: int, tags: Iterable[Hashable]) -> bool:
+        """
+        Check whether the cache was cleared or one of the tags invalidated
+        after the generation was read
+        """
+        if self.__cleared > generation:
+            return True
+        return any(self.__invalidated.get(tag, 0) > generation for tag in tags)
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+        """
+        self.__generation += 1
+        self.__cleared = self.__generation
+        self.__entries.clear()
+        self.__tags.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.__entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "stale_hits": self.stale_hits,
+            "stale_errors": self.stale_errors,
+            "refreshes": self.refreshes,
+            "refreshing": len(self.__refreshing),
+        }
+
+
+def make_key(path: str, params: Optional[dict] = None) -> tuple:
+    """
+    Build a cache key from a path and its query params, ignoring empty params
+    and the order they were sent in
+    args:
+        path: str -> request path
+        params: dict -> request query params
+    return:
+        tuple with the path and the normalized params
+    """
+    normalized = tuple(
+        sorted(
+            (name, str(value))
+            for name, value in (params or {}).items()
+            if value is not None
+        )
+    )
+    return (path, normalized)
+
+
+@lru_cache(maxsize=32)
+def tag_pattern(fields: tuple[str, ...]) -> re.Pattern:
+    names = b"|".join(re.escape(field.encode()) for field in fields)
+    return re.compile(rb'"(' + names + rb')"\s*:\s*"([^"\\]*)"')
+
+
+def collect_tags(content: bytes, fields: Iterable[str]) -> set:
+    """
+    Scan a JSON body for the given string fields and collect (field, value)
+    tags, without decoding the body
+    args:
+        content: bytes -> JSON body
+        fields: Iterable[str] -> field names to collect, e.g. item_uuid
+    return:
+        set of (field, value) tags
+    """
+    return {
+        (field.decode(), value.decode())
+        for field, value in tag_pattern(tuple(fields)).findall(content)
+    }
+
+
+catalog_cache = TTLCache(
+    ttl=config.CATALOG_CACHE_TTL_SECONDS,
+    max_entries=config.CATALOG_CACHE_MAX_ENTRIES,
+    stale_while_revalidate=config.CATALOG_CACHE_STALE_WHILE_REVALIDATE,
+    stale_if_error=config.CATALOG_CACHE_STALE_IF_ERROR,
+)
+catalog_refresh_task: Optional[asyncio.Task] = None
+
+
+async def refresh_catalog_cache():
+    """
+    Refresh the hottest catalog entries about to expire, every
+    CATALOG_REFRESH_INTERVAL seconds
+    """
+    while True:
+        await asyncio.sleep(config.CATALOG_REFRESH_INTERVAL)
+        catalog_cache.refresh_hot(
+            top=config.CATALOG_REFRESH_TOP_N, horizon=config.CATALOG_REFRESH_INTERVAL
+        )
+
+
+def start_catalog_refresh():
+    global catalog_refresh_task
+    if config.CATALOG_REFRESH_INTERVAL > 0 and not catalog_refresh_task:
+        catalog_refresh_task = asyncio.create_task(refresh_catalog_cache())
+
+
+async def stop_catalog_refresh():
+    global catalog_refresh_task
+    if catalog_refresh_task:
+        catalog_refresh_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await catalog_refresh_task
+        catalog_refresh_task = None
+    await catalog_cache.cancel_refreshes()
@@ -22,3 +22,153 @@ VERIFY_TOKEN_SECRET_KEY = str(os.environ.get("JWT_VERIFY_TOKEN_SECRET_KEY"))
 VERIFY_TOKEN_EXPIRE_MINUTES = int(os.environ.get("JWT_VERIFY_TOKEN_EXPIRE_MINUTES"))
 ADMIN_ROLE = str(os.environ.get("JWT_ADMIN_ROLE"))
 USER_ROLE = str(os.environ.get("JWT_USER_ROLE"))
+
+PRODUCT_API_TIMEOUT = float(os.environ.get("API_PRODUCT_TIMEOUT", 50.0))
+PRODUCT_API_READ_TIMEOUT = float(os.environ.get("API_PRODUCT_READ_TIMEOUT", 10.0))
+PRODUCT_API_WRITE_TIMEOUT = float(os.environ.get("API_PRODUCT_WRITE_TIMEOUT", 50.0))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "false").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+)
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30.0))
+
+# resilience of the upstream calls, see app/core/resilience.py
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(
+    os.environ.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5)
+)
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = float(
+    os.environ.get("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", 30.0)
+)
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(
+    os.environ.get("CIRCUIT_BREAKER_HALF_OPEN_CALLS", 1)
+)
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 2))
+UPSTREAM_RETRY_BACKOFF = float(os.environ.get("UPSTREAM_RETRY_BACKOFF", 0.1))
+UPSTREAM_RETRY_MAX_BACKOFF = float(os.environ.get("UPSTREAM_RETRY_MAX_BACKOFF", 2.0))
+UPSTREAM_RETRY_BUDGET_RATIO = float(
+    os.environ.get("UPSTREAM_RETRY_BUDGET_RATIO", 0.1)
+)
+UPSTREAM_RETRY_MIN_PER_SECOND = float(
+    os.environ.get("UPSTREAM_RETRY_MIN_PER_SECOND", 1.0)
+)
+UPSTREAM_RETRY_BUDGET_MAX = float(os.environ.get("UPSTREAM_RETRY_BUDGET_MAX", 10.0))
+UPSTREAM_HEDGE_ENABLED = (
+    os.environ.get("UPSTREAM_HEDGE_ENABLED", "false").lower() == "true"
+)
+UPSTREAM_HEDGE_MIN_DELAY = float(os.environ.get("UPSTREAM_HEDGE_MIN_DELAY", 0.05))
+# JSON object of per route policies, e.g. {"GET /product/all": {"retries": 3}}
+UPSTREAM_ROUTE_POLICIES = os.environ.get("UPSTREAM_ROUTE_POLICIES", "{}")
+
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", 60.0))
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", 1024))
+CATALOG_CACHE_STALE_WHILE_REVALIDATE = float(
+    os.environ.get("CATALOG_CACHE_STALE_WHILE_REVALIDATE", 30.0)
+)
+CATALOG_CACHE_STALE_IF_ERROR = float(
+    os.environ.get("CATALOG_CACHE_STALE_IF_ERROR", 300.0)
+)
+CATALOG_REFRESH_INTERVAL = float(os.environ.get("CATALOG_REFRESH_INTERVAL", 10.0))
+CATALOG_REFRESH_TOP_N = int(os.environ.get("CATALOG_REFRESH_TOP_N", 50))
+
+SINGLE_FLIGHT_ENABLED = (
+    os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+)
+SINGLE_FLIGHT_MAX_WAITERS = int(os.environ.get("SINGLE_FLIGHT_MAX_WAITERS", 1000))
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT", 30.0))
+
+DATABASE_POOL_MIN_SIZE = int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2))
+DATABASE_POOL_MAX_SIZE = int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10))
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 5.0))
+DATABASE_POOL_MAX_WAITING = int(os.environ.get("DATABASE_POOL_MAX_WAITING", 0))
+DATABASE_POOL_MAX_IDLE = float(os.environ.get("DATABASE_POOL_MAX_IDLE", 600.0))
+DATABASE_POOL_MAX_LIFETIME = float(os.environ.get("DATABASE_POOL_MAX_LIFETIME", 3600.0))
+DATABASE_POOL_RECONNECT_TIMEOUT = float(
+    os.environ.get("DATABASE_POOL_RECONNECT_TIMEOUT", 300.0)
+)
+DATABASE_POOL_CHECK_ON_ACQUIRE = (
+    os.environ.get("DATABASE_POOL_CHECK_ON_ACQUIRE", "false").lower() == "true"
+)
+DATABASE_POOL_CHECK_INTERVAL = float(
+    os.environ.get("DATABASE_POOL_CHECK_INTERVAL", 30.0)
+)
+
+RUN_MIGRATIONS_ON_STARTUP = (
+    os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "false").lower() == "true"
+)
+
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+)
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 64))
+
+TOKEN_CLAIMS_CACHE_MAX_ENTRIES = int(
+    os.environ.get("TOKEN_CLAIMS_CACHE_MAX_ENTRIES", 10000)
+)
+
+# the refresh route reads the admin users from a cache, a login reads the user
+# again and admin_model.invalidate_user drops it after a write, an update made
+# straight in the database is seen once the cached lookup is this old
+ADMIN_USER_CACHE_TTL_SECONDS = float(
+    os.environ.get("ADMIN_USER_CACHE_TTL_SECONDS", 60.0)
+)
+ADMIN_USER_CACHE_MAX_ENTRIES = int(os.environ.get("ADMIN_USER_CACHE_MAX_ENTRIES", 1024))
+
+# catalog read source per route: "upstream" (PRODUCT_API) or "native" (Postgres),
+# cursor pages of /product/all are always native
+CATALOG_PRODUCT_ALL_SOURCE = os.environ.get("CATALOG_PRODUCT_ALL_SOURCE", "upstream")
+CATALOG_PRODUCT_SOURCE = os.environ.get("CATALOG_PRODUCT_SOURCE", "upstream")
+CATALOG_CATEGORY_SOURCE = os.environ.get("CATALOG_CATEGORY_SOURCE", "upstream")
+CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", 20))
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", 100))
+
+CATALOG_EXPORT_BATCH_SIZE = int(os.environ.get("CATALOG_EXPORT_BATCH_SIZE", 1000))
+CATALOG_IMPORT_CHUNK_SIZE = int(os.environ.get("CATALOG_IMPORT_CHUNK_SIZE", 5000))
+CATALOG_IMPORT_MAX_ERRORS = int(os.environ.get("CATALOG_IMPORT_MAX_ERRORS", 1000))
+CATALOG_IMPORT_MAX_JOBS = int(os.environ.get("CATALOG_IMPORT_MAX_JOBS", 100))
+
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 500))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 10))
+
+SEARCH_INDEX_ENABLED = os.environ.get("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+SEARCH_INDEX_BATCH_SIZE = int(os.environ.get("SEARCH_INDEX_BATCH_SIZE", 5000))
+SEARCH_FUZZY_THRESHOLD = float(os.environ.get("SEARCH_FUZZY_THRESHOLD", 0.3))
+SEARCH_RESULTS_LIMIT = int(os.environ.get("SEARCH_RESULTS_LIMIT", 20))
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", 100))
+
+CATEGORY_ITEMS_ENABLED = (
+    os.environ.get("CATEGORY_ITEMS_ENABLED", "true").lower() == "true"
+)
+CATEGORY_ITEMS_REFRESH_INTERVAL = float(
+    os.environ.get("CATEGORY_ITEMS_REFRESH_INTERVAL", 300.0)
+)
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+
+CART_LOG_PATH = os.environ.get("CART_LOG_PATH", "var/cart.log")
+CART_LOG_FSYNC = os.environ.get("CART_LOG_FSYNC", "false").lower() == "true"
+CART_FLUSH_INTERVAL = float(os.environ.get("CART_FLUSH_INTERVAL", 1.0))
+CART_FLUSH_MAX_WRITES = int(os.environ.get("CART_FLUSH_MAX_WRITES", 500))
+CART_MAX_CARTS = int(os.environ.get("CART_MAX_CARTS", 100000))
+CART_MAX_ITEMS = int(os.environ.get("CART_MAX_ITEMS", 100))
+CART_MAX_ITEM_QUANTITY = int(os.environ.get("CART_MAX_ITEM_QUANTITY", 99))
+CART_OWNER_CACHE_TTL_SECONDS = float(
+    os.environ.get("CART_OWNER_CACHE_TTL_SECONDS", 300.0)
+)
+
+ORDER_MAX_LINES = int(os.environ.get("ORDER_MAX_LINES", 100))
+ORDER_MAX_ITEM_QUANTITY = int(os.environ.get("ORDER_MAX_ITEM_QUANTITY", 99))
+ORDER_TRANSACTION_RETRIES = int(os.environ.get("ORDER_TRANSACTION_RETRIES", 3))
+
+RESERVATION_ENABLED = os.environ.get("RESERVATION_ENABLED", "true").lower() == "true"
+RESERVATION_SHARDS = int(os.environ.get("RESERVATION_SHARDS", 16))
+RESERVATION_TTL = float(os.environ.get("RESERVATION_TTL", 600.0))
+RESERVATION_RECONCILE_INTERVAL = float(
+    os.environ.get("RESERVATION_RECONCILE_INTERVAL", 2.0)
+)
+
+PRICE_OFF_MODE = os.environ.get("PRICE_OFF_MODE", "percent")
+PRICE_TIMER_TICK = float(os.environ.get("PRICE_TIMER_TICK", 1.0))
+PRICE_TIMER_SLOTS = int(os.environ.get("PRICE_TIMER_SLOTS", 3600))
@@ -9,6 +9,87 @@ from Crypto.Util.Padding import pad, unpad
 from app.core import config
 
 
+class CryptoService:
+    """
+    AES-CBC with the key schedule derived once and reused by every call,
+    and a table of ciphertexts for constant values like role names
+    """
+
+    def __init__(self, key: bytes, iv: bytes):
+        """
+        args:
+            key: bytes -> AES key
+            iv: bytes -> IV used for encryption
+        """
+        self.__iv = iv
+        self.__iv_int = int.from_bytes(iv)
+        # ECB holds no chaining state, so one object serves every message
+        self.__cipher = AES.new(key, AES.MODE_ECB)
+        self.__constants: dict[str, str] = {}
+
+    def encrypt(self, plain_text: str) -> str:
+        """
+        Encrypt text to AES-CBC
+        args:
+            plain_text: str -> text to encrypt
+        return:
+            str of the base64 of the IV and the AES encryption
+        """
+        padded_text = pad(plain_text.encode(), AES.block_size)
+        encrypted_bytes = bytearray()
+        previous = self.__iv_int
+        for start in range(0, len(padded_text), AES.block_size):
+            block = int.from_bytes(padded_text[start : start + AES.block_size])
+            encrypted_block = self.__cipher.encrypt(
+                (block ^ previous).to_bytes(AES.block_size)
+            )
+            previous = int.from_bytes(encrypted_block)
+            encrypted_bytes += encrypted_block
+        return base64.b64encode(self.__iv + encrypted_bytes).decode()
+
+    def decrypt(self, encrypted_text: str) -> str:
+        """
+        Decrypt AES-CBC to plain text, every block is decrypted in one call
+        args:
+            encrypted_text: str -> encrypted base64 text to decrypt
+        return:
+            str of the plain text of the base64 text decryption
+        """
+        encrypted_data = base64.b64decode(encrypted_text)
+        iv = encrypted_data[: AES.block_size]
+        encrypted_bytes = encrypted_data[AES.block_size :]
+        if not encrypted_bytes or len(encrypted_bytes) % AES.block_size:
+            raise ValueError("Encrypted text is not block aligned")
+
+        decrypted_bytes = self.__cipher.decrypt(encrypted_bytes)
+        # each block is xored with the previous ciphertext block, the first with the IV
+        chain = iv + encrypted_bytes[: -AES.block_size]
+        padded_text = (
+            int.from_bytes(decrypted_bytes) ^ int.from_bytes(chain)
+        ).to_bytes(len(encrypted_bytes))
+        return unpad(padded_text, AES.block_size).decode()
+
+    def encrypt_constant(self, plain_text: str) -> str:
+        """
+        Encrypt a constant value, the encryption is deterministic so the
+        ciphertext is computed once and reused
+        args:
+            plain_text: str -> constant text like a role name
+        return:
+            str of the base64 of the AES encryption
+        """
+        encrypted_text = self.__constants.get(plain_text)
+        if encrypted_text is None:
+            encrypted_text = self.encrypt(plain_text)
+            self.__constants[plain_text] = encrypted_text
+        return encrypted_text
+
+
+crypto_service = CryptoService(key=config.AES_KEY, iv=config.AES_IV)
+crypto_service.encrypt_constant(config.ADMIN_ROLE)
+crypto_service.encrypt_constant(config.USER_ROLE)
+
+
 class TextInfo:
     """
     Object of text information
@@ -100,10 +181,7 @@ class TextCrypto:
         return:
             str of the base64 of the AES encryption
         """
-        aes_context = AES.new(config.AES_KEY, AES.MODE_CBC, config.AES_IV)
-        padded_text = pad(self.__plain_text.encode(), AES.block_size)
-        encrypted_bytes = aes_context.encrypt(padded_text)
-        return base64.b64encode(config.AES_IV + encrypted_bytes).decode()
+        return crypto_service.encrypt(self.__plain_text)
 
     def decrypt_text(self) -> str:
         """
@@ -113,12 +191,7 @@ class TextCrypto:
         return:
             str of the plain text of the base64 text decryption
         """
-        encrypted_data = base64.b64decode(self.__encrypted_text)
-        iv = encrypted_data[:16]
-        encrypted_bytes = encrypted_data[16:]
-        cipher = AES.new(config.AES_KEY, AES.MODE_CBC, iv)
-        decrypted_bytes = unpad(cipher.decrypt(encrypted_bytes), AES.block_size)
-        self.__plain_text = decrypted_bytes.decode()
+        self.__plain_text = crypto_service.decrypt(self.__encrypted_text)
         return self.__plain_text
 
 
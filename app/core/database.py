@@ -2,39 +2,148 @@
 database connection and handling data
 """
 
-from typing import Optional
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-import psycopg2 as pg
-import psycopg2.extras
+from fastapi import HTTPException, status
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
 from app.core import config
 
 
-db = None
+pool: Optional[AsyncConnectionPool] = None
+health_check_task: Optional[asyncio.Task] = None
 
 
-def start_connection(custom_uri: Optional[str] = None):
+async def start_connection(custom_uri: Optional[str] = None):
     """
-    Starts the connection to the database
+    Opens the connection pool to the database
     """
+    global pool, health_check_task
     try:
-        global db
-        if custom_uri:
-            db = pg.connect(custom_uri, cursor_factory=psycopg2.extras.RealDictCursor)
-        else:
-            db = pg.connect(
-                config.DATABASE_URI, cursor_factory=psycopg2.extras.RealDictCursor
-            )
-        db.autocommit = True
+        pool = AsyncConnectionPool(
+            conninfo=custom_uri or config.DATABASE_URI,
+            min_size=config.DATABASE_POOL_MIN_SIZE,
+            max_size=config.DATABASE_POOL_MAX_SIZE,
+            timeout=config.DATABASE_POOL_TIMEOUT,
+            max_waiting=config.DATABASE_POOL_MAX_WAITING,
+            max_idle=config.DATABASE_POOL_MAX_IDLE,
+            max_lifetime=config.DATABASE_POOL_MAX_LIFETIME,
+            reconnect_timeout=config.DATABASE_POOL_RECONNECT_TIMEOUT,
+            kwargs={"autocommit": True, "row_factory": dict_row},
+            check=(
+                AsyncConnectionPool.check_connection
+                if config.DATABASE_POOL_CHECK_ON_ACQUIRE
+                else None
+            ),
+            name="store",
+            open=False,
+        )
+        await pool.open(wait=True, timeout=config.DATABASE_POOL_TIMEOUT)
     except Exception as exc:
         raise RuntimeError("database error") from exc
 
+    if config.DATABASE_POOL_CHECK_INTERVAL > 0:
+        health_check_task = asyncio.create_task(check_connections())
 
-def get_database():
+
+async def close_connection():
+    """
+    Closes the connection pool and its health checks
     """
-    Get the database connection
+    global pool, health_check_task
+    if health_check_task:
+        health_check_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await health_check_task
+        health_check_task = None
+
+    if pool:
+        await pool.close()
+        pool = None
+
+
+async def check_connections():
+    """
+    Periodically checks the idle connections, broken ones are replaced
+    """
+    while True:
+        await asyncio.sleep(config.DATABASE_POOL_CHECK_INTERVAL)
+        if pool:
+            await pool.check()
+
+
+def get_pool() -> AsyncConnectionPool:
+    """
+    Get the connection pool
     return:
-        Database Connection with
+        The opened pool of database connections
     """
-    if not db:
+    if not pool:
         raise RuntimeError("Database not initialized")
-    return db
+    return pool
+
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[AsyncConnection]:
+    """
+    Acquire a connection from the pool, returned when the block exits
+    raise:
+        HTTPException 503 when no connection is free before the acquire timeout
+    """
+    try:
+        async with get_pool().connection() as database:
+            yield database
+
+    except (PoolTimeout, TooManyRequests) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="DB is not responding",
+        ) from exc
+
+
+async def get_database() -> AsyncIterator[AsyncConnection]:
+    """
+    Get a database connection for the current request
+    return:
+        Database Connection returning rows as dicts
+    """
+    async with connection() as database:
+        yield database
+
+
+async def fetch_all(query: str, params=None) -> list[dict]:
+    """
+    Run a query on a pooled connection and fetch every row
+    args:
+        query: str -> SQL query with %s or %(name)s placeholders
+        params: tuple | dict -> query params
+    return:
+        list of rows as dicts
+    """
+    try:
+        async with connection() as database:
+            cursor = database.cursor()
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+    except HTTPException:
+        raise
+
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="DB is not responding",
+        ) from exc
+
+
+def get_pool_stats() -> dict:
+    """
+    Return the wait-time and utilization counters of the pool
+    """
+    if not pool:
+        return {}
+    return pool.get_stats()
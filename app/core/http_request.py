@@ -1,206 +1,568 @@
 """module for http requests"""
 
-from typing import Optional
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Optional
 import httpx
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, Response, status
+from app.core import config
+from app.core.cache import make_key
+from app.core.resilience import (
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUS,
+    CircuitOpenError,
+    LatencyTracker,
+    get_breaker,
+    get_route_policy,
+    retry_budget,
+)
+from app.core.single_flight import SingleFlight
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import brotli
+
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+clients: list["Client"] = []
+# upstream headers forwarded with a passthrough body, the body is already decoded
+# by httpx so the content-encoding and content-length are not
+PASSTHROUGH_HEADERS = (
+    "content-type",
+    "content-language",
+    "cache-control",
+    "last-modified",
+)
+# headers a 304 repeats from the full response
+NOT_MODIFIED_HEADERS = ("cache-control", "last-modified", "etag", "vary")
+
+
+async def start_clients():
+    """
+    Opens the shared connection pool of every registered client
+    """
+    for client in clients:
+        await client.start()
+
+
+async def close_clients():
+    """
+    Closes the shared connection pool of every registered client
+    """
+    for client in clients:
+        await client.close()
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Read the encodings of an Accept-Encoding header, the ones with q=0 excluded
+    """
+    encodings = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name.strip():
+            encodings.add(name.strip())
+    return encodings
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+class RawResponse:
+    """
+    Body bytes of a response and the headers sent with it to the client, the
+    body is only decoded when someone needs to inspect it. The ETag and the
+    compressed variants are computed once and kept with the object, so a
+    cached response is never hashed or compressed twice
+    """
+
+    def __init__(self, content: bytes, headers: Optional[dict] = None):
+        self.content = content
+        self.headers = headers or {"content-type": "application/json"}
+        self.__digest: Optional[str] = None
+        self.__variants: dict[str, bytes] = {}
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """
+        Strong ETag of the body, each encoding is a different representation
+        args:
+            encoding: str -> content encoding of the representation, None for
+                        the plain body
+        return:
+            str quoted entity tag
+        """
+        if self.__digest is None:
+            self.__digest = hashlib.blake2b(self.content, digest_size=16).hexdigest()
+        if encoding:
+            return f'"{self.__digest}-{encoding}"'
+        return f'"{self.__digest}"'
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        """
+        Pick the best encoding the client accepts, small bodies are sent plain
+        """
+        if len(self.content) < config.COMPRESS_MIN_SIZE:
+            return None
+        encodings = accepted_encodings(accept_encoding)
+        if BROTLI_AVAILABLE and "br" in encodings:
+            return "br"
+        if "gzip" in encodings:
+            return "gzip"
+        return None
+
+    def encoded(self, encoding: str) -> bytes:
+        """
+        Get the body compressed with an encoding, compressed on first use
+        """
+        variant = self.__variants.get(encoding)
+        if variant is None:
+            if encoding == "br":
+                variant = brotli.compress(
+                    self.content, quality=config.COMPRESS_BROTLI_QUALITY
+                )
+            else:
+                variant = gzip.compress(
+                    self.content, compresslevel=config.COMPRESS_GZIP_LEVEL, mtime=0
+                )
+            self.__variants[encoding] = variant
+        return variant
+
+    def response(self, request: Optional[Request] = None) -> Response:
+        """
+        Build the response for a request, compressed when the client accepts
+        it and a 304 when the client already has this representation
+        args:
+            request: Request -> request being answered, None for a plain response
+        return:
+            Response with the body bytes
+        """
+        if request is None:
+            return Response(content=self.content, headers=self.headers)
+
+        encoding = self.choose_encoding(request.headers.get("accept-encoding", ""))
+        headers = dict(self.headers)
+        headers["etag"] = self.etag(encoding)
+        headers["vary"] = "Accept-Encoding"
+
+        if etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={
+                    name: value
+                    for name, value in headers.items()
+                    if name in NOT_MODIFIED_HEADERS
+                },
+            )
+
+        if encoding:
+            headers["content-encoding"] = encoding
+            return Response(content=self.encoded(encoding), headers=headers)
+        return Response(content=self.content, headers=headers)
 
 
 class Client:
     """HTTP Request handler"""
 
-    def __init__(self, base_url: str, timeout: Optional[float | int]):
+    def __init__(
+        self,
+        base_url: str,
+        timeout: Optional[float | int],
+        coalesce: bool = config.SINGLE_FLIGHT_ENABLED,
+    ):
         self.__base_url = base_url
         self.__timeout = timeout
+        self.__client: Optional[httpx.AsyncClient] = None
+        self.breaker = get_breaker(base_url)
+        self.latencies: dict[tuple[str, str], LatencyTracker] = {}
+        self.hedged = 0
+        self.flight: Optional[SingleFlight] = None
+        if coalesce:
+            self.flight = SingleFlight(
+                max_waiters=config.SINGLE_FLIGHT_MAX_WAITERS,
+                timeout=config.SINGLE_FLIGHT_TIMEOUT,
+            )
+        clients.append(self)
+
+    async def start(self):
+        """
+        Creates the pooled async client, kept alive for the whole app lifespan
+        """
+        if self.__client:
+            return
+
+        self.__client = httpx.AsyncClient(
+            base_url=self.__base_url,
+            timeout=self.__timeout,
+            http2=config.HTTP2_ENABLED and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def close(self):
+        """
+        Closes the pooled async client and its open connections
+        """
+        if self.__client:
+            await self.__client.aclose()
+            self.__client = None
 
-    def get(
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Get the pooled async client
+        return:
+            The shared httpx.AsyncClient of this handler
+        """
+        if not self.__client:
+            raise RuntimeError("HTTP client not initialized")
+        return self.__client
+
+    async def send(
         self,
+        method: str,
         path: str = "/",
         params: Optional[dict] = None,
+        data: Optional[dict] = None,
+        json: Optional[dict] = None,
         headers: Optional[dict] = None,
-    ) -> dict:
+        timeout: Optional[float | int] = None,
+    ) -> httpx.Response:
         """
-        Sends a GET request to an external service using the configured HTTP client.
+        Sends a request to an external service using the shared HTTP client.
 
         Args:
+            method (str): The HTTP method of the request.
             path (str): The endpoint path to send the request to (default is "/").
             params (dict, optional): Query parameters to include in the request.
+            data (dict, optional): Form data to include in the request.
+            json (dict, optional): JSON body to include in the request.
             headers (dict, optional): Custom headers to include in the request.
+            timeout (float, optional): Timeout for this route, overrides the
+                        client timeout.
 
         Returns:
-            dict: The JSON response from the external service.
+            httpx.Response: The successful response from the external service.
 
         Raises:
             HTTPException: If the response contains an HTTP error status code,
                         if the request times out, or if there is a connection error.
                 - 502 Bad Gateway: When a general request error occurs.
                 - 504 Gateway Timeout: When the request times out.
+                - 503 Service Unavailable: While the circuit of the upstream is open.
                 - Other: Based on the status code returned from the external service.
         """
-        with httpx.Client(
-            base_url=self.__base_url, timeout=self.__timeout, headers=headers
-        ) as client:
+        policy = get_route_policy(method, path)
+        retries = policy.retries if method in IDEMPOTENT_METHODS else 0
+        timeout = policy.timeout or timeout
+
+        def attempt() -> Awaitable[httpx.Response]:
+            return self.attempt(
+                method,
+                path,
+                params=params,
+                data=data,
+                json=json,
+                headers=headers,
+                timeout=timeout,
+            )
+
+        retry_budget.deposit()
+        retry = 0
+        while True:
             try:
-                response = client.get(path, params=params, timeout=self.__timeout)
-                response.raise_for_status()
-
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(
-                    status_code=exc.response.status_code,
-                    detail=exc.response.json(),
-                )
-
-            except httpx.ReadTimeout:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="The request to the services timedout.",
-                )
-
-            except httpx.RequestError:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to reach external service",
+                if policy.hedge and method == "GET":
+                    return await self.hedge(path, attempt)
+                return await attempt()
+
+            except CircuitOpenError:
+                raise
+
+            except HTTPException as exc:
+                if (
+                    retry >= retries
+                    or exc.status_code not in RETRYABLE_STATUS
+                    or not retry_budget.withdraw()
+                ):
+                    raise
+                retry += 1
+                await asyncio.sleep(policy.backoff(retry))
+
+    async def attempt(
+        self,
+        method: str,
+        path: str = "/",
+        params: Optional[dict] = None,
+        data: Optional[dict] = None,
+        json: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
+    ) -> httpx.Response:
+        """
+        One call to the upstream through its circuit breaker, 5xx responses,
+        timeouts and connection errors count as failures
+        """
+        client = self.get_client()
+        probe = self.breaker.before_call()
+        started_at = time.monotonic()
+
+        try:
+            response = await client.request(
+                method,
+                path,
+                params=params,
+                data=data,
+                json=json,
+                headers=headers,
+                timeout=timeout or self.__timeout,
+            )
+            response.raise_for_status()
+
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise HTTPException(
+                status_code=exc.response.status_code,
+                detail=exc.response.json(),
+            )
+
+        except httpx.ReadTimeout:
+            self.breaker.record_failure()
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="The request to the services timedout.",
+            )
+
+        except httpx.RequestError:
+            self.breaker.record_failure()
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Failed to reach external service",
+            )
+
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+        self.breaker.record_success()
+        self.get_latency(method, path).add(time.monotonic() - started_at)
+        return response
+
+    def get_latency(self, method: str, path: str) -> LatencyTracker:
+        latency = self.latencies.get((method, path))
+        if latency is None:
+            latency = self.latencies[(method, path)] = LatencyTracker()
+        return latency
+
+    async def hedge(
+        self, path: str, attempt: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        """
+        Send a second copy of a GET when the first one is slower than the p95
+        of the route, the first successful answer wins and the other is
+        cancelled
+        args:
+            path: str -> path of the route
+            attempt: Callable -> coroutine function doing one call
+        return:
+            the first successful response
+        """
+        delay = max(
+            self.get_latency("GET", path).percentile(0.95) or 0.0,
+            config.UPSTREAM_HEDGE_MIN_DELAY,
+        )
+        first = asyncio.create_task(attempt())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not retry_budget.withdraw():
+            return await first
+
+        self.hedged += 1
+        pending = {first, asyncio.create_task(attempt())}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
                 )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
 
-        return response.json()
+        finally:
+            for task in pending:
+                task.cancel()
 
-    def post(
+    async def request(
         self,
+        method: str,
         path: str = "/",
+        params: Optional[dict] = None,
         data: Optional[dict] = None,
         json: Optional[dict] = None,
         headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
     ) -> dict:
-        with httpx.Client(
-            base_url=self.__base_url, timeout=self.__timeout, headers=headers
-        ) as client:
-            try:
-                response = client.post(
-                    path, data=data, json=json, timeout=self.__timeout
-                )
-                response.raise_for_status()
-
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(
-                    status_code=exc.response.status_code,
-                    detail=exc.response.json(),
-                )
-
-            except httpx.ReadTimeout:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="The request to the services timedout.",
-                )
-
-            except httpx.RequestError:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to reach external service",
-                )
-
+        """
+        Sends a request and decodes the JSON response
+        """
+        response = await self.send(
+            method,
+            path,
+            params=params,
+            data=data,
+            json=json,
+            headers=headers,
+            timeout=timeout,
+        )
         return response.json()
 
-    def patch(
+    async def request_raw(
+        self,
+        method: str,
+        path: str = "/",
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
+    ) -> RawResponse:
+        """
+        Sends a request and keeps the response body as bytes
+        """
+        response = await self.send(
+            method, path, params=params, headers=headers, timeout=timeout
+        )
+        return RawResponse(
+            content=response.content,
+            headers={
+                name: response.headers[name]
+                for name in PASSTHROUGH_HEADERS
+                if name in response.headers
+            },
+        )
+
+    async def coalesce(self, key: tuple, function: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Share the call between identical concurrent requests when the client
+        coalesces
+        """
+        if not self.flight:
+            return await function()
+        return await self.flight.do(key, function)
+
+    async def get(
+        self,
+        path: str = "/",
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
+    ) -> dict:
+        """
+        Sends a GET request, identical concurrent GETs share one upstream call
+        when the client coalesces
+        """
+        key = ("GET",) + make_key(path, params) + make_key("headers", headers)
+        return await self.coalesce(
+            key,
+            lambda: self.request(
+                "GET", path, params=params, headers=headers, timeout=timeout
+            ),
+        )
+
+    async def get_raw(
         self,
         path: str = "/",
         params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
+    ) -> RawResponse:
+        """
+        Sends a GET request whose body is passed through without decoding,
+        identical concurrent GETs share one upstream call
+        """
+        key = ("GET", "raw") + make_key(path, params) + make_key("headers", headers)
+        return await self.coalesce(
+            key,
+            lambda: self.request_raw(
+                "GET", path, params=params, headers=headers, timeout=timeout
+            ),
+        )
+
+    async def post(
+        self,
+        path: str = "/",
         data: Optional[dict] = None,
         json: Optional[dict] = None,
         headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
     ) -> dict:
-        with httpx.Client(
-            base_url=self.__base_url, timeout=self.__timeout, headers=headers
-        ) as client:
-            try:
-                response = client.patch(
-                    path, params=params, data=data, json=json, timeout=self.__timeout
-                )
-                response.raise_for_status()
-
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(
-                    status_code=exc.response.status_code,
-                    detail=exc.response.json(),
-                )
-
-            except httpx.ReadTimeout:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="The request to the services timedout.",
-                )
-
-            except httpx.RequestError:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to reach external service",
-                )
-
-        return response.json()
+        return await self.request(
+            "POST", path, data=data, json=json, headers=headers, timeout=timeout
+        )
 
-    def put(
+    async def patch(
         self,
         path: str = "/",
         params: Optional[dict] = None,
+        data: Optional[dict] = None,
         json: Optional[dict] = None,
         headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
     ) -> dict:
-        with httpx.Client(
-            base_url=self.__base_url, timeout=self.__timeout, headers=headers
-        ) as client:
-            try:
-                response = client.put(
-                    path, params=params, json=json, timeout=self.__timeout
-                )
-                response.raise_for_status()
-
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(
-                    status_code=exc.response.status_code,
-                    detail=exc.response.json(),
-                )
-
-            except httpx.ReadTimeout:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="The request to the services timedout.",
-                )
-
-            except httpx.RequestError:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to reach external service",
-                )
-
-        return response.json()
-
-    def delete(
+        return await self.request(
+            "PATCH",
+            path,
+            params=params,
+            data=data,
+            json=json,
+            headers=headers,
+            timeout=timeout,
+        )
+
+    async def put(
         self,
         path: str = "/",
         params: Optional[dict] = None,
+        json: Optional[dict] = None,
         headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
     ) -> dict:
-        with httpx.Client(
-            base_url=self.__base_url, timeout=self.__timeout, headers=headers
-        ) as client:
-            try:
-                response = client.delete(path, params=params, timeout=self.__timeout)
-                response.raise_for_status()
-
-            except httpx.HTTPStatusError as exc:
-                raise HTTPException(
-                    status_code=exc.response.status_code,
-                    detail=exc.response.json(),
-                )
-
-            except httpx.ReadTimeout:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="The request to the services timedout.",
-                )
-
-            except httpx.RequestError:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Failed to reach external service",
-                )
+        return await self.request(
+            "PUT", path, params=params, json=json, headers=headers, timeout=timeout
+        )
 
-        return response.json()
+    async def delete(
+        self,
+        path: str = "/",
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float | int] = None,
+    ) -> dict:
+        return await self.request(
+            "DELETE", path, params=params, headers=headers, timeout=timeout
+        )
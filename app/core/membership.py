@@ -0,0 +1,85 @@
+"""Sorted in-memory membership lists"""
+
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+
+class MembershipIndex:
+    """
+    Sorted member ids per group kept as compact int arrays, groups are marked
+    stale when a write touches them and reloaded by the owner
+    """
+
+    def __init__(self):
+        self.__members: dict[str, array] = {}
+        self.__stale: set[str] = set()
+        self.loaded = False
+
+    def replace(self, key: str, member_ids: Iterable[int]):
+        """
+        Set the members of a group
+        args:
+            key: str -> id of the group
+            member_ids: Iterable[int] -> ids of the members, in any order
+        """
+        self.__members[key] = array("i", sorted(member_ids))
+        self.__stale.discard(key)
+
+    def remove(self, key: str):
+        self.__members.pop(key, None)
+        self.__stale.discard(key)
+
+    def get(self, key: str) -> Optional[array]:
+        return self.__members.get(key)
+
+    def page(self, key: str, offset: int, limit: int) -> list[int]:
+        """
+        Get a page of the sorted members of a group
+        args:
+            key: str -> id of the group
+            offset: int -> members skipped
+            limit: int -> members returned
+        return:
+            list of member ids
+        """
+        members = self.__members.get(key)
+        if members is None:
+            return []
+        return members[offset : offset + limit].tolist()
+
+    def contains(self, key: str, member_id: int) -> bool:
+        members = self.__members.get(key)
+        if members is None:
+            return False
+        position = bisect_left(members, member_id)
+        return position < len(members) and members[position] == member_id
+
+    def counts(self) -> dict[str, int]:
+        """
+        Return the number of members of every group
+        """
+        return {key: len(members) for key, members in self.__members.items()}
+
+    def mark_stale(self, key: str):
+        self.__stale.add(key)
+
+    def is_stale(self, key: str) -> bool:
+        return not self.loaded or key in self.__stale
+
+    def stale(self) -> set[str]:
+        return set(self.__stale)
+
+    def expire(self):
+        """
+        Mark every group stale, the next read reloads all of them
+        """
+        self.loaded = False
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "groups": len(self.__members),
+            "members": sum(len(members) for members in self.__members.values()),
+            "stale": len(self.__stale),
+        }
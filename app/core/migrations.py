@@ -0,0 +1,116 @@
+"""
+Versioned SQL migrations recorded in store.migrations
+
+usage:
+    python -m app.core.migrations
+"""
+
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import Optional
+
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from app.core import config
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "database" / "migrations"
+MIGRATION_FILE = re.compile(r"^(?P<version>\d+)_(?P<name>\w+)\.sql$")
+# any constant works, it only has to be the same for every app instance
+MIGRATIONS_LOCK_ID = 7_300_001
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    """
+    Object of a numbered SQL migration file
+    """
+
+    def __init__(self, version: str, name: str, path: Path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+
+def get_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """
+    Find the migration files sorted by version
+    args:
+        directory: Path -> folder with the NNNN_name.sql files
+    return:
+        list of migrations from the oldest to the newest
+    """
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            continue
+        migrations.append(
+            Migration(
+                version=str(int(match.group("version"))),
+                name=match.group("name"),
+                path=path,
+            )
+        )
+    return sorted(migrations, key=lambda migration: int(migration.version))
+
+
+async def run_migrations(
+    database: AsyncConnection, directory: Path = MIGRATIONS_DIR
+) -> list[str]:
+    """
+    Apply the migrations that are not recorded in store.migrations yet, each one
+    in its own transaction
+    args:
+        database: AsyncConnection -> connection in autocommit mode
+        directory: Path -> folder with the NNNN_name.sql files
+    return:
+        list with the names of the applied migrations
+    """
+    applied = []
+    cursor = database.cursor()
+
+    # one instance migrates at a time, the others wait and find nothing to do
+    await cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+    try:
+        await cursor.execute("SELECT version FROM store.migrations")
+        done = {str(row["version"]) for row in await cursor.fetchall()}
+
+        for migration in get_migrations(directory):
+            if migration.version in done:
+                continue
+
+            async with database.transaction():
+                await cursor.execute(migration.path.read_text())
+                await cursor.execute(
+                    """
+                        INSERT INTO store.migrations (migration_name, version)
+                        VALUES (%s, %s)
+                    """,
+                    (migration.name, migration.version),
+                )
+            applied.append(migration.name)
+            logger.info("Applied migration: %s", migration.name)
+
+    finally:
+        await cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+
+    return applied
+
+
+async def main(custom_uri: Optional[str] = None):
+    database = await AsyncConnection.connect(
+        custom_uri or config.DATABASE_URI, autocommit=True, row_factory=dict_row
+    )
+    async with database:
+        applied = await run_migrations(database)
+
+    if not applied:
+        logger.info("Database is up to date")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main())
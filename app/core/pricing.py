@@ -0,0 +1,85 @@
+"""Effective prices of the catalog items"""
+
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Optional
+
+PERCENT_MODE = "percent"
+AMOUNT_MODE = "amount"
+CENT = Decimal("0.01")
+HUNDRED = Decimal(100)
+
+
+def to_decimal(value) -> Optional[Decimal]:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def to_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def apply_effective_prices(
+    items: list[dict], today: date, mode: str = PERCENT_MODE
+) -> Optional[date]:
+    """
+    Set the effective_price of every item of a page in one pass. A discount
+    applies while item_price_off is set and item_price_off_until_date is not
+    past, in percent of item_price or as an amount taken from it
+    args:
+        items: list -> products with item_price, item_price_off and
+                item_price_off_until_date, updated in place
+        today: date -> day the prices are computed for
+        mode: str -> PERCENT_MODE or AMOUNT_MODE
+    return:
+        first day the effective price of an item changes, None when no
+        discount of the page ends
+    """
+    next_change = None
+    for item in items:
+        price = to_decimal(item.get("item_price"))
+        if price is None:
+            item["effective_price"] = None
+            continue
+
+        off = to_decimal(item.get("item_price_off"))
+        until = to_date(item.get("item_price_off_until_date"))
+        if off and off > 0 and (until is None or today <= until):
+            if mode == AMOUNT_MODE:
+                price = max(price - off, Decimal(0))
+            else:
+                price = price * (HUNDRED - min(off, HUNDRED)) / HUNDRED
+            # the discount ends once its last day is over
+            if until is not None and (next_change is None or until < next_change):
+                next_change = until
+
+        item["effective_price"] = price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+    return next_change + timedelta(days=1) if next_change else None
+
+
+def page_items(payload) -> Optional[list]:
+    """
+    Get the items of a listing page, a list of products or a dict with them
+    under items
+    """
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        return payload["items"]
+    return None
@@ -0,0 +1,259 @@
+"""In-memory stock reservations"""
+
+import time
+import uuid
+import zlib
+from typing import Awaitable, Callable, Iterable, Optional
+from fastapi import HTTPException, status
+
+# reads the stock left in Postgres of the given items
+StockLoader = Callable[[list[str]], Awaitable[dict[str, int]]]
+
+
+class Reservation:
+    """
+    Object of the stock held for a buyer until it is committed, released or
+    expired
+    """
+
+    def __init__(self, owner: str, lines: dict[str, int], expires_at: float):
+        self.reservation_id = str(uuid.uuid4())
+        self.owner = owner
+        # quantity by item_uuid
+        self.lines = lines
+        self.expires_at = expires_at
+        # set while its order is written, it does not expire then
+        self.committing = False
+
+
+class StockShard:
+    """
+    Available and held counts of the items hashed to the shard
+    """
+
+    def __init__(self):
+        self.available: dict[str, int] = {}
+        self.held: dict[str, int] = {}
+        # units committed since the last refresh started
+        self.sold: dict[str, int] = {}
+
+    def set_stock(self, item_uuid: str, stock: int):
+        """
+        Set the available count from the stock left in Postgres, the held
+        units and the ones sold while it was read are not available
+        """
+        self.available[item_uuid] = (
+            stock - self.held.get(item_uuid, 0) - self.sold.get(item_uuid, 0)
+        )
+
+    def hold(self, item_uuid: str, quantity: int):
+        self.available[item_uuid] -= quantity
+        self.held[item_uuid] = self.held.get(item_uuid, 0) + quantity
+
+    def unhold(self, item_uuid: str, quantity: int, restock: bool):
+        held = self.held.get(item_uuid, 0) - quantity
+        if held > 0:
+            self.held[item_uuid] = held
+        else:
+            self.held.pop(item_uuid, None)
+        if restock:
+            if item_uuid in self.available:
+                self.available[item_uuid] += quantity
+        else:
+            self.sold[item_uuid] = self.sold.get(item_uuid, 0) + quantity
+
+
+class ReservationEngine:
+    """
+    Per-item available counts kept in memory and sharded by item_uuid. A
+    reservation takes units from the counts without touching Postgres, a
+    commit keeps them taken and a release or the expiry gives them back.
+    Every check and update of the counts runs without awaiting, so it is
+    atomic on the event loop. The counts are set again from Postgres by
+    refresh, one query per shard
+    """
+
+    def __init__(self, loader: StockLoader, shards: int, ttl: float):
+        """
+        args:
+            loader: StockLoader -> reads the stock left of a list of items
+            shards: int -> number of shards of the counts
+            ttl: float -> seconds a reservation is held when not committed
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.__shards = [StockShard() for _ in range(max(shards, 1))]
+        self.__reservations: dict[str, Reservation] = {}
+        self.reserved = 0
+        self.rejected = 0
+        self.committed = 0
+        self.released = 0
+        self.expired = 0
+
+    def shard(self, item_uuid: str) -> StockShard:
+        return self.__shards[zlib.crc32(item_uuid.encode()) % len(self.__shards)]
+
+    async def reserve(
+        self, owner: str, lines: Iterable[tuple[str, int]], ttl: Optional[float] = None
+    ) -> Reservation:
+        """
+        Hold the units of every line or none of them
+        args:
+            owner: str -> uuid of the user holding the reservation
+            lines: Iterable -> (item_uuid, quantity) with unique item_uuids
+            ttl: float -> seconds the reservation is held, the engine ttl by default
+        return:
+            Reservation holding the units
+        raise:
+            HTTPException 409 when an item is missing or short of stock
+        """
+        lines = dict(lines)
+        cold = [
+            item_uuid
+            for item_uuid in lines
+            if item_uuid not in self.shard(item_uuid).available
+        ]
+        if cold:
+            await self.load(cold)
+
+        short = [
+            item_uuid
+            for item_uuid, quantity in lines.items()
+            if self.shard(item_uuid).available.get(item_uuid, 0) < quantity
+        ]
+        if short:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Items out of stock", "item_uuids": short},
+            )
+
+        for item_uuid, quantity in lines.items():
+            self.shard(item_uuid).hold(item_uuid, quantity)
+
+        reservation = Reservation(
+            owner=owner,
+            lines=lines,
+            expires_at=time.monotonic() + (self.ttl if ttl is None else ttl),
+        )
+        self.__reservations[reservation.reservation_id] = reservation
+        self.reserved += 1
+        return reservation
+
+    def get(self, reservation_id: str, owner: str) -> Reservation:
+        """
+        Get a reservation held by the owner
+        raise:
+            HTTPException 404 when it expired or is held by someone else
+        """
+        reservation = self.__reservations.get(reservation_id)
+        if (
+            reservation is None
+            or reservation.owner != owner
+            or reservation.expires_at <= time.monotonic()
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Reservation not found",
+            )
+        return reservation
+
+    def begin_commit(self, reservation_id: str, owner: str) -> Reservation:
+        """
+        Get a reservation held by the owner and keep it from expiring while
+        its order is written
+        raise:
+            HTTPException 404 when it expired or is held by someone else, 409
+            when another order is committing it
+        """
+        reservation = self.get(reservation_id, owner)
+        if reservation.committing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Reservation is already being ordered",
+            )
+        reservation.committing = True
+        return reservation
+
+    def commit(self, reservation: Reservation):
+        """
+        Keep the units of a reservation taken, they leave the counts for good
+        once the order that sold them is applied to Postgres
+        """
+        if self.__reservations.pop(reservation.reservation_id, None) is None:
+            return
+        for item_uuid, quantity in reservation.lines.items():
+            self.shard(item_uuid).unhold(item_uuid, quantity, restock=False)
+        self.committed += 1
+
+    def release(self, reservation: Reservation):
+        """
+        Give the units of a reservation back
+        """
+        if self.__reservations.pop(reservation.reservation_id, None) is None:
+            return
+        for item_uuid, quantity in reservation.lines.items():
+            self.shard(item_uuid).unhold(item_uuid, quantity, restock=True)
+        self.released += 1
+
+    def expire(self) -> int:
+        """
+        Release the reservations held past their ttl
+        return:
+            number of reservations released
+        """
+        now = time.monotonic()
+        expired = [
+            reservation
+            for reservation in self.__reservations.values()
+            if reservation.expires_at <= now and not reservation.committing
+        ]
+        for reservation in expired:
+            self.release(reservation)
+        self.released -= len(expired)
+        self.expired += len(expired)
+        return len(expired)
+
+    async def load(self, item_uuids: list[str]):
+        """
+        Read the stock of items not counted yet, the items missing in
+        Postgres are counted with no stock
+        """
+        stock = await self.loader(item_uuids)
+        for item_uuid in item_uuids:
+            shard = self.shard(item_uuid)
+            # another request loaded the item while this one waited
+            if item_uuid not in shard.available:
+                shard.set_stock(item_uuid, stock.get(item_uuid, 0))
+
+    async def refresh(self):
+        """
+        Set the counts of every shard again from the stock left in Postgres
+        """
+        for shard in self.__shards:
+            # an order committed while the stock is read may be missing from
+            # it, its units are subtracted on top and counted twice at worst
+            shard.sold = {}
+            item_uuids = list(shard.available)
+            if not item_uuids:
+                continue
+            stock = await self.loader(item_uuids)
+            for item_uuid in item_uuids:
+                if item_uuid in stock:
+                    shard.set_stock(item_uuid, stock[item_uuid])
+                elif item_uuid not in shard.held:
+                    shard.available.pop(item_uuid, None)
+                else:
+                    shard.available[item_uuid] = 0
+
+    def stats(self) -> dict:
+        return {
+            "shards": len(self.__shards),
+            "items": sum(len(shard.available) for shard in self.__shards),
+            "reservations": len(self.__reservations),
+            "reserved": self.reserved,
+            "rejected": self.rejected,
+            "committed": self.committed,
+            "released": self.released,
+            "expired": self.expired,
+        }
@@ -0,0 +1,261 @@
+"""Circuit breaking, retries and hedging of the upstream calls"""
+
+import json
+import random
+import time
+from collections import deque
+from typing import Optional
+from fastapi import HTTPException, status
+from app.core import config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# the upstream deletes are not safe to repeat, a retried DELETE can answer 404
+# after the first one went through
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT"))
+RETRYABLE_STATUS = frozenset(
+    (
+        status.HTTP_502_BAD_GATEWAY,
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        status.HTTP_504_GATEWAY_TIMEOUT,
+    )
+)
+
+
+class CircuitOpenError(HTTPException):
+    """
+    Raised without calling the upstream while its circuit is open
+    """
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The external service is unavailable.",
+        )
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream after consecutive failures. Once the recovery
+    timeout passes a few probe calls go through (half open), a success closes
+    the circuit and a failure opens it again
+    """
+
+    def __init__(
+        self, failure_threshold: int, recovery_timeout: float, half_open_calls: int
+    ):
+        """
+        args:
+            failure_threshold: int -> consecutive failures opening the circuit
+            recovery_timeout: float -> seconds the circuit stays open
+            half_open_calls: int -> concurrent probe calls while half open
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+
+    def before_call(self) -> bool:
+        """
+        Check the circuit before calling the upstream
+        return:
+            bool, True when the call is a half open probe
+        raise:
+            CircuitOpenError while the circuit is open or the probes are taken
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError()
+            self.state = HALF_OPEN
+            self.probes = 0
+
+        if self.state == HALF_OPEN:
+            if self.probes >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError()
+            self.probes += 1
+            return True
+        return False
+
+    def release_probe(self):
+        """
+        Give back the probe of a call that ended without a success or a
+        failure, a cancelled hedge or an unexpected error
+        """
+        if self.state == HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket shared by every upstream call, each call deposits a fraction
+    of a retry so retries stay a small share of the traffic when the upstream
+    is failing
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float):
+        """
+        args:
+            ratio: float -> retries earned by every call
+            min_per_second: float -> retries always allowed per second
+            max_tokens: float -> max retries saved up
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated_at = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        """
+        Take one retry from the budget
+        return:
+            bool, False when the budget is exhausted
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.tokens + (now - self.updated_at) * self.min_per_second,
+            self.max_tokens,
+        )
+        self.updated_at = now
+
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tokens": round(self.tokens, 2),
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+class LatencyTracker:
+    """
+    Latencies of the latest calls of a route
+    """
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples: deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a percentile of the latest latencies
+        return:
+            seconds, None until there are enough samples
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class RoutePolicy:
+    """
+    Object of the retry and hedging settings of an upstream route
+    """
+
+    def __init__(
+        self,
+        retries: int = config.UPSTREAM_RETRIES,
+        hedge: bool = config.UPSTREAM_HEDGE_ENABLED,
+        timeout: Optional[float] = None,
+    ):
+        self.retries = retries
+        self.hedge = hedge
+        self.timeout = timeout
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full jitter exponential backoff before a retry
+        args:
+            attempt: int -> number of the retry, starting at 1
+        return:
+            seconds to wait
+        """
+        ceiling = min(
+            config.UPSTREAM_RETRY_BACKOFF * 2 ** (attempt - 1),
+            config.UPSTREAM_RETRY_MAX_BACKOFF,
+        )
+        return random.uniform(0, ceiling)
+
+
+def load_route_policies(raw: str) -> dict[str, RoutePolicy]:
+    """
+    Read the per route policies, a JSON object keyed by "METHOD /path", e.g.
+    {"GET /product/all": {"retries": 3, "hedge": true, "timeout": 5}}
+    """
+    policies = {}
+    for route, settings in json.loads(raw or "{}").items():
+        method, _, path = route.strip().partition(" ")
+        policies[f"{method.upper()} {path.strip()}"] = RoutePolicy(
+            retries=settings.get("retries", config.UPSTREAM_RETRIES),
+            hedge=settings.get("hedge", config.UPSTREAM_HEDGE_ENABLED),
+            timeout=settings.get("timeout"),
+        )
+    return policies
+
+
+default_policy = RoutePolicy()
+route_policies = load_route_policies(config.UPSTREAM_ROUTE_POLICIES)
+retry_budget = RetryBudget(
+    ratio=config.UPSTREAM_RETRY_BUDGET_RATIO,
+    min_per_second=config.UPSTREAM_RETRY_MIN_PER_SECOND,
+    max_tokens=config.UPSTREAM_RETRY_BUDGET_MAX,
+)
+breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_route_policy(method: str, path: str) -> RoutePolicy:
+    return route_policies.get(f"{method} {path}", default_policy)
+
+
+def get_breaker(base_url: str) -> CircuitBreaker:
+    """
+    Get the circuit breaker of an upstream, shared by its clients
+    """
+    breaker = breakers.get(base_url)
+    if breaker is None:
+        breaker = breakers[base_url] = CircuitBreaker(
+            failure_threshold=config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=config.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+            half_open_calls=config.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+        )
+    return breaker
@@ -0,0 +1,281 @@
+"""In-process full text search"""
+
+import bisect
+import contextlib
+import re
+import unicodedata
+from typing import Iterable, Optional
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text in lowercase words without accents
+    args:
+        text: str -> text to split
+    return:
+        list of words
+    """
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(
+        char for char in normalized if not unicodedata.combining(char)
+    )
+    return TOKEN.findall(without_accents)
+
+
+def trigrams(term: str) -> set[str]:
+    padded = f"  {term} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted index of documents by the words of their name and categories,
+    with prefix matching over the sorted terms and typo tolerant matching
+    over the trigrams of the terms
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.3, max_expansions: int = 50):
+        """
+        args:
+            fuzzy_threshold: float -> min trigram similarity of a typo match
+            max_expansions: int -> max terms a prefix or typo match expands to
+        """
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_expansions = max_expansions
+        self.category_names: dict[str, str] = {}
+        self.__documents: dict[str, dict] = {}
+        self.__names: dict[str, str] = {}
+        self.__doc_terms: dict[str, frozenset] = {}
+        self.__doc_categories: dict[str, frozenset] = {}
+        self.__postings: dict[str, set[str]] = {}
+        self.__category_postings: dict[str, set[str]] = {}
+        self.__trigrams: dict[str, set[str]] = {}
+        self.__terms: list[str] = []
+        # new terms of a bulk load, sorted into __terms once it ends
+        self.__pending_terms: set[str] = set()
+        self.__bulk = False
+
+    def __len__(self) -> int:
+        return len(self.__documents)
+
+    def add(
+        self,
+        doc_id: str,
+        name: str,
+        category_uuids: Iterable[str],
+        document: dict,
+    ):
+        """
+        Index a document, replacing the previous version with the same id
+        args:
+            doc_id: str -> id of the document
+            name: str -> searchable name
+            category_uuids: Iterable[str] -> categories of the document
+            document: dict -> value returned by the searches
+        """
+        self.remove(doc_id)
+
+        category_uuids = frozenset(category_uuids)
+        text = " ".join(
+            [name]
+            + [
+                self.category_names.get(category_uuid, "")
+                for category_uuid in category_uuids
+            ]
+        )
+        terms = frozenset(tokenize(text))
+
+        self.__documents[doc_id] = document
+        self.__names[doc_id] = name
+        self.__doc_terms[doc_id] = terms
+        self.__doc_categories[doc_id] = category_uuids
+
+        for term in terms:
+            postings = self.__postings.get(term)
+            if postings is None:
+                postings = self.__postings[term] = set()
+                if self.__bulk:
+                    self.__pending_terms.add(term)
+                else:
+                    bisect.insort(self.__terms, term)
+                for trigram in trigrams(term):
+                    self.__trigrams.setdefault(trigram, set()).add(term)
+            postings.add(doc_id)
+
+        for category_uuid in category_uuids:
+            self.__category_postings.setdefault(category_uuid, set()).add(doc_id)
+
+    def remove(self, doc_id: str):
+        """
+        Remove a document from the index
+        args:
+            doc_id: str -> id of the document
+        """
+        if doc_id not in self.__documents:
+            return
+
+        del self.__documents[doc_id]
+        del self.__names[doc_id]
+
+        for term in self.__doc_terms.pop(doc_id):
+            postings = self.__postings[term]
+            postings.discard(doc_id)
+            if postings:
+                continue
+
+            del self.__postings[term]
+            if term in self.__pending_terms:
+                self.__pending_terms.discard(term)
+            else:
+                del self.__terms[bisect.bisect_left(self.__terms, term)]
+            for trigram in trigrams(term):
+                terms = self.__trigrams[trigram]
+                terms.discard(term)
+                if not terms:
+                    del self.__trigrams[trigram]
+
+        for category_uuid in self.__doc_categories.pop(doc_id):
+            postings = self.__category_postings[category_uuid]
+            postings.discard(doc_id)
+            if not postings:
+                del self.__category_postings[category_uuid]
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        """
+        Add many documents at once, the new terms are sorted in one pass when
+        the block exits instead of one insert per term. Prefix matches scan
+        the new terms until then
+        """
+        self.__bulk = True
+        try:
+            yield self
+        finally:
+            self.__bulk = False
+            self.__terms.extend(self.__pending_terms)
+            self.__terms.sort()
+            self.__pending_terms.clear()
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        return self.__documents.get(doc_id)
+
+    def get_categories(self, doc_id: str) -> frozenset:
+        return self.__doc_categories.get(doc_id, frozenset())
+
+    def set_category(self, category_uuid: str, category_name: Optional[str]):
+        """
+        Rename a category, or drop it when the name is None, and reindex its
+        documents
+        args:
+            category_uuid: str -> uuid of the category
+            category_name: str -> new name of the category
+        """
+        if category_name is None:
+            self.category_names.pop(category_uuid, None)
+        else:
+            self.category_names[category_uuid] = category_name
+
+        for doc_id in list(self.__category_postings.get(category_uuid, ())):
+            category_uuids = self.__doc_categories[doc_id]
+            if category_name is None:
+                category_uuids = category_uuids - {category_uuid}
+            self.add(
+                doc_id, self.__names[doc_id], category_uuids, self.__documents[doc_id]
+            )
+
+    def search(
+        self, query: str, category_uuid: Optional[str] = None, limit: int = 20
+    ) -> list[dict]:
+        """
+        Find the documents matching every word of the query, by exact word,
+        prefix or trigram similarity
+        args:
+            query: str -> words to search
+            category_uuid: str -> only documents of this category
+            limit: int -> max documents returned
+        return:
+            list of documents from the best match to the worst
+        """
+        scores: Optional[dict[str, float]] = None
+
+        for token in tokenize(query):
+            token_scores = self.__match(token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    doc_id: score + token_scores[doc_id]
+                    for doc_id, score in scores.items()
+                    if doc_id in token_scores
+                }
+            if not scores:
+                return []
+
+        if scores is None:
+            return []
+
+        if category_uuid:
+            members = self.__category_postings.get(category_uuid, set())
+            scores = {
+                doc_id: score for doc_id, score in scores.items() if doc_id in members
+            }
+
+        ranked = sorted(
+            scores, key=lambda doc_id: (-scores[doc_id], self.__names[doc_id])
+        )
+        return [self.__documents[doc_id] for doc_id in ranked[:limit]]
+
+    def __match(self, token: str) -> dict[str, float]:
+        """
+        Score the documents matching one word, keeping the best match per document
+        """
+        term_scores: dict[str, float] = {}
+
+        if token in self.__postings:
+            term_scores[token] = 3.0
+
+        start = bisect.bisect_left(self.__terms, token)
+        for term in self.__terms[start : start + self.max_expansions]:
+            if not term.startswith(token):
+                break
+            term_scores.setdefault(term, 2.0 * len(token) / len(term))
+        prefixed = [term for term in self.__pending_terms if term.startswith(token)]
+        for term in sorted(prefixed)[: self.max_expansions]:
+            term_scores.setdefault(term, 2.0 * len(token) / len(term))
+
+        if len(token) >= 3:
+            token_trigrams = trigrams(token)
+            shared: dict[str, int] = {}
+            for trigram in token_trigrams:
+                for term in self.__trigrams.get(trigram, ()):
+                    shared[term] = shared.get(term, 0) + 1
+
+            similar = []
+            for term, count in shared.items():
+                similarity = count / (len(token_trigrams) + len(trigrams(term)) - count)
+                if similarity >= self.fuzzy_threshold:
+                    similar.append((similarity, term))
+            for similarity, term in sorted(similar, reverse=True)[
+                : self.max_expansions
+            ]:
+                term_scores.setdefault(term, similarity)
+
+        doc_scores: dict[str, float] = {}
+        for term, score in term_scores.items():
+            for doc_id in self.__postings[term]:
+                if score > doc_scores.get(doc_id, 0.0):
+                    doc_scores[doc_id] = score
+        return doc_scores
+
+    def stats(self) -> dict:
+        """
+        Return the size of the index
+        """
+        return {
+            "documents": len(self.__documents),
+            "terms": len(self.__postings),
+            "trigrams": len(self.__trigrams),
+            "categories": len(self.__category_postings),
+        }
@@ -1,22 +1,107 @@
+import asyncio
 import json
-from typing import TypeVar, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, TypeVar, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from app.core.crypto import TextCrypto
+from app.core import config
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 T = TypeVar("T", bound=BaseModel)
 
 
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordExecutor:
+    """
+    Process pool running the bcrypt work outside of the event loop
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        """
+        args:
+            workers: int -> processes hashing in parallel
+            max_queue: int -> calls allowed to wait for a free process
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        self.__executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        """
+        Starts the worker processes
+        """
+        if not self.__executor:
+            self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        """
+        Stops the worker processes
+        """
+        if self.__executor:
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+            self.__executor = None
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        """
+        Run a function on the pool
+        args:
+            function: Callable -> module level function, it is sent to a process
+        return:
+            The result of the function
+        raise:
+            HTTPException 503 when every process is busy and the queue is full
+        """
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again later.",
+            )
+
+        self.start()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the pool
+        """
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+
+password_executor = PasswordExecutor(
+    workers=config.PASSWORD_HASH_WORKERS, max_queue=config.PASSWORD_HASH_MAX_QUEUE
+)
+
+
 class AuthUtils:
     """
     Utils for verify identification
     """
 
-    def verify_password(self, plain_password: str, hashed_password) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password) -> bool:
         """
         Verify bcrypt password with hashed password
         args:
@@ -25,9 +110,11 @@ class AuthUtils:
         return:
             A boolean result if the password hash matches or not
         """
-        return pwd_context.verify(plain_password, hashed_password)
+        return await password_executor.run(
+            check_password, plain_password, hashed_password
+        )
 
-    def authenticate_user(
+    async def authenticate_user(
         self, username: str, password: str, auth_model: object
     ) -> Optional[T]:
         """
@@ -39,8 +126,10 @@ class AuthUtils:
             A dictionary with the user information or a False state
             if is not
         """
-        user = auth_model.get_user_by_username(username)
-        if not user or not self.verify_password(password, user.sys_user_password):
+        user = await auth_model.get_user_by_username(username)
+        if not user or not await self.verify_password(
+            password, user.sys_user_password
+        ):
             return None
         return user
 
@@ -65,7 +154,7 @@ class AuthUtils:
 
         return data
 
-    def get_password_hash(self, password: str) -> str:
+    async def get_password_hash(self, password: str) -> str:
         """
         Hashes a plain-text password using the configured password hashing context.
 
@@ -75,4 +164,4 @@ class AuthUtils:
         Returns:
             str: The hashed password.
         """
-        return pwd_context.hash(password)
+        return await password_executor.run(hash_password, password)
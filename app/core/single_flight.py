@@ -0,0 +1,93 @@
+"""Coalescing of identical concurrent calls"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from fastapi import HTTPException, status
+
+
+class Flight:
+    """
+    Object of an in-flight call and the callers waiting on it
+    """
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Share one in-flight call, its result or its error, between every caller
+    that asks for the same key while it runs
+    """
+
+    def __init__(self, max_waiters: int, timeout: Optional[float] = None):
+        """
+        args:
+            max_waiters: int -> max callers sharing one call, extra callers get a 503
+            timeout: float -> seconds a caller waits for the shared call
+        """
+        self.max_waiters = max_waiters
+        self.timeout = timeout
+        self.__flights: dict[Hashable, Flight] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run the function once for every concurrent caller of the key
+        args:
+            key: Hashable -> identity of the call
+            function: Callable -> coroutine function doing the call
+        return:
+            The result of the shared call
+        """
+        flight = self.__flights.get(key)
+
+        if flight is None:
+            task = asyncio.create_task(function())
+            task.add_done_callback(lambda done: self.__finish(key, done))
+            flight = Flight(task)
+            self.__flights[key] = flight
+            self.calls += 1
+
+        elif flight.waiters >= self.max_waiters:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many requests waiting for the external service.",
+            )
+
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            # shield so a caller leaving does not cancel the call for the others
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.timeout)
+
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="The request to the services timedout.",
+            )
+
+        finally:
+            flight.waiters -= 1
+
+    def __finish(self, key: Hashable, task: asyncio.Task):
+        if self.__flights.get(key) is not None and self.__flights[key].task is task:
+            del self.__flights[key]
+        if not task.cancelled():
+            # mark the error as retrieved when every caller already left
+            task.exception()
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the coalesced calls
+        """
+        return {
+            "in_flight": len(self.__flights),
+            "calls": self.calls,
+            "shared": self.shared,
+            "max_waiters": self.max_waiters,
+        }
@@ -0,0 +1,76 @@
+"""Hashed timing wheel"""
+
+import math
+import time
+from typing import Hashable
+
+
+class TimerWheel:
+    """
+    Timers hashed by their deadline to a ring of slots of tick seconds. A
+    slot holds the timers of every turn of the ring, so scheduling is O(1)
+    and advancing visits one slot per tick elapsed plus the timers due
+    """
+
+    def __init__(self, tick: float, slots: int):
+        """
+        args:
+            tick: float -> seconds per slot, the precision of the deadlines
+            slots: int -> slots of the ring
+        """
+        self.tick = tick
+        self.__slots: list[dict[Hashable, int]] = [{} for _ in range(max(slots, 1))]
+        self.__deadlines: dict[Hashable, int] = {}
+        self.__current = math.floor(time.time() / tick)
+
+    def schedule(self, when: float, key: Hashable) -> bool:
+        """
+        Schedule a timer, a key is scheduled once at its earliest deadline
+        args:
+            when: float -> epoch seconds the timer is due, past ones are due
+                    on the next tick
+            key: Hashable -> key returned by advance when the timer is due
+        return:
+            True when the timer was scheduled or moved earlier
+        """
+        deadline = max(math.ceil(when / self.tick), self.__current + 1)
+        scheduled = self.__deadlines.get(key)
+        if scheduled is not None:
+            if scheduled <= deadline:
+                return False
+            self.cancel(key)
+
+        self.__deadlines[key] = deadline
+        self.__slots[deadline % len(self.__slots)][key] = deadline
+        return True
+
+    def cancel(self, key: Hashable):
+        deadline = self.__deadlines.pop(key, None)
+        if deadline is not None:
+            self.__slots[deadline % len(self.__slots)].pop(key, None)
+
+    def advance(self, now: float) -> list[Hashable]:
+        """
+        Move the wheel to a time and pop the timers due
+        args:
+            now: float -> epoch seconds
+        return:
+            list of the keys due
+        """
+        tick = math.floor(now / self.tick)
+        due = []
+        # after a full turn every slot has been visited once
+        last = min(tick, self.__current + len(self.__slots))
+        for current in range(self.__current + 1, last + 1):
+            slot = self.__slots[current % len(self.__slots)]
+            for key, deadline in list(slot.items()):
+                if deadline <= tick:
+                    del slot[key]
+                    del self.__deadlines[key]
+                    due.append(key)
+
+        self.__current = max(self.__current, tick)
+        return due
+
+    def __len__(self) -> int:
+        return len(self.__deadlines)
@@ -0,0 +1,206 @@
+"""Local append-only log of the writes waiting to be flushed"""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, TextIO
+
+
+class AppendLog:
+    """
+    Append-only log of JSON records. Before a flush the active file is rotated
+    into a numbered segment, removed once the flush commits, so after a crash
+    the records not flushed yet are read back from the segments and the
+    active file. The file work runs on one writer thread in the order it was
+    requested, the records queued together are written with one flush and
+    one fsync
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        """
+        args:
+            path: str -> path of the active file
+            fsync: bool -> fsync every record, survives a host crash and not
+                        only a process crash
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+        self.__file: Optional[TextIO] = None
+        self.__queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.__writer: Optional[threading.Thread] = None
+
+    def open(self):
+        """
+        Open the active file and start the writer thread
+        """
+        self.__open_file()
+        if not self.__writer:
+            self.__writer = threading.Thread(
+                target=self.__run, name="append-log", daemon=True
+            )
+            self.__writer.start()
+
+    async def close(self):
+        """
+        Write the queued records, stop the writer thread and close the file
+        """
+        if self.__writer:
+            writer, self.__writer = self.__writer, None
+            self.__queue.put(None)
+            await asyncio.to_thread(writer.join)
+        self.__close_file()
+
+    def append(self, record: Any) -> asyncio.Future:
+        """
+        Queue a record for the end of the active file, the queue order is the
+        write order
+        args:
+            record: Any -> JSON serializable record
+        return:
+            future done once the record is written
+        """
+        if not self.__writer:
+            raise RuntimeError("Write log not opened")
+        return self.__submit(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def rotate(self) -> asyncio.Future:
+        """
+        Move the active file into a new segment and start an empty one, after
+        the records queued before
+        return:
+            future with every segment not removed yet, the new one included
+        """
+        return self.__submit(self.__rotate)
+
+    def remove(self, segments: list[Path]) -> asyncio.Future:
+        """
+        Remove flushed segments
+        """
+        return self.__submit(lambda: self.__remove(segments))
+
+    def segments(self) -> list[Path]:
+        """
+        Get the rotated segments from the oldest to the newest
+        """
+        segments = []
+        for path in self.path.parent.glob(self.path.name + ".*"):
+            suffix = path.name[len(self.path.name) + 1 :]
+            if suffix.isdigit():
+                segments.append((int(suffix), path))
+        return [path for _, path in sorted(segments)]
+
+    def read(self) -> Iterator[Any]:
+        """
+        Read the records of the segments and of the active file in write order,
+        a line cut by a crash is skipped
+        """
+        for path in self.segments() + [self.path]:
+            if not path.exists():
+                continue
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def __submit(self, task: str | Callable[[], Any]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.__queue.put((task, future, loop))
+        return future
+
+    def __run(self):
+        while True:
+            batch = [self.__queue.get()]
+            while True:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            written = []
+            for item in batch:
+                if item is None:
+                    self.__sync(written)
+                    return
+                task, future, loop = item
+                if isinstance(task, str):
+                    try:
+                        self.__file.write(task)
+                        written.append((future, loop, None))
+                    except Exception as exc:
+                        written.append((future, loop, exc))
+                    continue
+
+                # the records before a rotate or a remove are on disk first
+                self.__sync(written)
+                written = []
+                try:
+                    resolve(future, loop, task(), None)
+                except Exception as exc:
+                    resolve(future, loop, None, exc)
+            self.__sync(written)
+
+    def __sync(self, written: list):
+        """
+        Flush the records written since the last sync and resolve their futures
+        """
+        if not written:
+            return
+        error = None
+        try:
+            self.__file.flush()
+            if self.fsync:
+                os.fsync(self.__file.fileno())
+        except Exception as exc:
+            error = exc
+        for future, loop, write_error in written:
+            resolve(future, loop, None, write_error or error)
+
+    def __open_file(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__file = open(self.path, "a", encoding="utf-8")
+
+    def __close_file(self):
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+
+    def __rotate(self) -> list[Path]:
+        self.__close_file()
+        if self.path.exists() and self.path.stat().st_size > 0:
+            segments = self.segments()
+            number = int(segments[-1].name.rsplit(".", 1)[1]) + 1 if segments else 1
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.{number}"))
+        self.__open_file()
+        return self.segments()
+
+    def __remove(self, segments: list[Path]):
+        for path in segments:
+            path.unlink(missing_ok=True)
+
+
+def resolve(
+    future: asyncio.Future,
+    loop: asyncio.AbstractEventLoop,
+    result: Any,
+    error: Optional[BaseException],
+):
+    """
+    Set the outcome of a future from the writer thread
+    """
+
+    def set_outcome():
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(set_outcome)
@@ -1,20 +1,67 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.modules.category.category_model import CategoryModule
+from app.modules.cart.cart_module import CartModule
+from app.modules.cart.cart_service import cart_store
+from app.modules.orders.orders_module import OrdersModule
+from app.modules.orders.orders_service import (
+    start_stock_reconcile,
+    stop_stock_reconcile,
+)
 from app.modules.products.products_model import ProductsModule
+from app.modules.products.products_service import (
+    start_category_items,
+    start_price_changes,
+    start_product_index,
+    stop_category_items,
+    stop_price_changes,
+    stop_product_index,
+)
 
 from app.modules.admin.admin_module import AdminModule
-from app.core.database import start_connection
+from app.modules.users.users_module import UsersModule
+from app.core import config
+from app.core.cache import start_catalog_refresh, stop_catalog_refresh
+from app.core.database import start_connection, close_connection, connection
+from app.core.migrations import run_migrations
+from app.core.security import password_executor
+from app.core.http_request import start_clients, close_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_connection()
+    if config.RUN_MIGRATIONS_ON_STARTUP:
+        async with connection() as database:
+            await run_migrations(database)
+    await cart_store.start()
+    await start_clients()
+    password_executor.start()
+    start_product_index()
+    start_category_items()
+    start_catalog_refresh()
+    start_price_changes()
+    start_stock_reconcile()
+    yield
+    await stop_stock_reconcile()
+    await stop_price_changes()
+    await stop_catalog_refresh()
+    await stop_category_items()
+    await stop_product_index()
+    password_executor.shutdown()
+    await close_clients()
+    await cart_store.stop()
+    await close_connection()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 AdminModule.register(app)
+UsersModule.register(app)
 ProductsModule.register(app)
 CategoryModule.register(app)
-
-
-@app.on_event("startup")
-async def startup_event():
-    start_connection()
+CartModule.register(app)
+OrdersModule.register(app)
 
 
 @app.get("/")
@@ -27,12 +74,13 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PATCH", "PUT", "HEAD", "OPTIONS"],
+    allow_methods=["GET", "POST", "PATCH", "PUT", "DELETE", "HEAD", "OPTIONS"],
     allow_headers=[
         "Access-Control-Allow-Headers",
         "Content-Type",
         "Authorization",
         "Access-Control-Allow-Origin",
         "Set-Cookie",
+        "Idempotency-Key",
     ],
 )
@@ -4,9 +4,21 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from app.modules.admin.admin_service import AdminService
 from app.modules.admin.admin_schema import UserBase
-from app.common.dependencies import get_refresh_token, get_current_admin_user
-from app.core.security import AuthUtils
+from app.modules.admin.admin_model import user_cache
+from app.common.dependencies import (
+    get_refresh_token,
+    get_current_admin_user,
+    token_claims_cache,
+)
+from app.core.security import AuthUtils, password_executor
 from app.core.crypto import TextCrypto
+from app.core.cache import catalog_cache
+from app.core.http_request import clients
+from app.core.resilience import breakers, retry_budget
+from app.core.database import get_pool_stats
+from app.modules.products.products_service import category_items, product_index
+from app.modules.cart.cart_service import cart_store
+from app.modules.orders.orders_service import stock_reservations
 from app.core import config
 
 
@@ -20,7 +32,7 @@ async def login_access(
     response: Response,
 ):
 
-    user: Optional[UserBase] = admin_service.get_active_user_by_form(
+    user: Optional[UserBase] = await admin_service.get_active_user_by_form(
         form_data=form_data
     )
 
@@ -95,10 +107,36 @@ async def get_family_info(
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
     crypt_data = TextCrypto(plain_text=data)
-    hashed = auth_utils.get_password_hash(data)
+    hashed = await auth_utils.get_password_hash(data)
     return {
         "data_text": data,
         "data_aes": str(crypt_data.encrypt_text()),
         "data_sha": str(crypt_data.hash_text()),
         "data_hash": str(hashed),
     }
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_stats(
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    """
+    Counters of the in-process caches and pools, used to size them
+    """
+    return {
+        "database_pool": get_pool_stats(),
+        "password_executor": password_executor.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "token_claims_cache": token_claims_cache.stats(),
+        "admin_user_cache": user_cache.stats(),
+        "search_index": product_index.stats(),
+        "category_items": category_items.stats(),
+        "cart_store": cart_store.stats(),
+        "stock_reservations": stock_reservations.stats(),
+        "single_flight": [client.flight.stats() for client in clients if client.flight],
+        "circuit_breakers": {
+            base_url: breaker.stats() for base_url, breaker in breakers.items()
+        },
+        "retry_budget": retry_budget.stats(),
+        "hedged_requests": sum(client.hedged for client in clients),
+    }
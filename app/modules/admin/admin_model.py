@@ -1,13 +1,34 @@
+from app.core import config
+from app.core.cache import TTLCache
 from app.core.crypto import TextCrypto
 from fastapi import HTTPException, status
-from app.core.database import get_database
+from app.core.database import connection
 from app.modules.admin.admin_schema import UserBase
 
+# admin users by uuid for the refresh route, the login reads the database
+user_cache = TTLCache(
+    ttl=config.ADMIN_USER_CACHE_TTL_SECONDS,
+    max_entries=config.ADMIN_USER_CACHE_MAX_ENTRIES,
+)
+
+
+def invalidate_user(user_uuid: str):
+    """
+    Drop the cached lookup of a user, call it after disabling the user or
+    changing its attempts or password
+    args:
+        user_uuid: str -> uuid of the user
+    """
+    user_cache.invalidate_tag(("user", user_uuid))
+
 
 class AdminModel:
-    def get_user_by_uuid(self, user_uuid: str):
-        database = get_database()
-        cursor = database.cursor()
+    async def get_user_by_uuid(self, user_uuid: str):
+        cache_key = ("sys_user_uuid", user_uuid)
+        user = user_cache.get(cache_key)
+        if user is not None:
+            return user
+
         query = """
             SELECT  sys_user_id,
                     sys_user_uuid,
@@ -26,9 +47,13 @@ class AdminModel:
         params = (user_uuid,)
 
         try:
-            cursor.execute(query, params)
-            print("Executed Query: " + cursor.query.decode("utf-8"))
-            user = cursor.fetchone()
+            async with connection() as database:
+                cursor = database.cursor()
+                await cursor.execute(query, params)
+                user = await cursor.fetchone()
+
+        except HTTPException:
+            raise
 
         except Exception as exc:
             raise HTTPException(
@@ -39,13 +64,19 @@ class AdminModel:
         if not user:
             return None
 
-        return UserBase.model_validate(user)
+        user = UserBase.model_validate(user)
+        user_cache.set(cache_key, user, tags=[("user", user.sys_user_uuid)])
+
+        return user
 
-    def get_user_by_username(self, username: str):
+    async def get_user_by_username(self, username: str):
+        """
+        Read a user for the login, always from the database since the password
+        hash, the attempts and the enabled flag decide it. The row read
+        replaces the cached lookup of the refresh route
+        """
         username_sha = TextCrypto(plain_text=username).hash_text()
 
-        database = get_database()
-        cursor = database.cursor()
         query = """
             SELECT  sys_user_id,
                     sys_user_uuid,
@@ -63,10 +94,15 @@ class AdminModel:
 
         params = (username_sha,)
 
+        # the connection goes back to the pool before the password is checked
         try:
-            cursor.execute(query, params)
-            print("Executed Query: " + cursor.query.decode("utf-8"))
-            user = cursor.fetchone()
+            async with connection() as database:
+                cursor = database.cursor()
+                await cursor.execute(query, params)
+                user = await cursor.fetchone()
+
+        except HTTPException:
+            raise
 
         except Exception as exc:
             raise HTTPException(
@@ -77,4 +113,15 @@ class AdminModel:
         if not user:
             return None
 
-        return UserBase.model_validate(user)
+        user = UserBase.model_validate(user)
+        if not user.sys_user_enabled:
+            invalidate_user(user.sys_user_uuid)
+            return None
+
+        user_cache.set(
+            ("sys_user_uuid", user.sys_user_uuid),
+            user,
+            tags=[("user", user.sys_user_uuid)],
+        )
+
+        return user
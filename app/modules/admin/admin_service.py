@@ -1,6 +1,7 @@
 from app.common import dependencies
-from app.core.crypto import TextCrypto
-from typing import Optional
+from app.core.crypto import crypto_service
+from typing import Annotated, Optional
+from fastapi import Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.modules.admin.admin_model import AdminModel
@@ -10,28 +11,26 @@ from app.core import config
 
 
 class AdminService:
-    def get_active_user_by_form(
+    def __init__(self, admin_model: Annotated[AdminModel, Depends(AdminModel)]):
+        self.__admin_model = admin_model
+
+    async def get_active_user_by_form(
         self,
         form_data: OAuth2PasswordRequestForm,
         auth_utils: AuthUtils = AuthUtils(),
-        admin_model: AdminModel = AdminModel(),
     ) -> Optional[UserBase]:
-        user: UserBase = auth_utils.authenticate_user(
+        user: UserBase = await auth_utils.authenticate_user(
             username=form_data.username,
             password=form_data.password,
-            auth_model=admin_model,
+            auth_model=self.__admin_model,
         )
         if not user:
             return None
 
         return user
 
-    def get_active_user_by_uuid(
-        self,
-        user_uuid: str,
-        admin_model: AdminModel = AdminModel(),
-    ) -> Optional[UserBase]:
-        user = admin_model.get_user_by_uuid(user_uuid=user_uuid)
+    async def get_active_user_by_uuid(self, user_uuid: str) -> Optional[UserBase]:
+        user = await self.__admin_model.get_user_by_uuid(user_uuid=user_uuid)
 
         if not user:
             return None
@@ -42,7 +41,7 @@ class AdminService:
         payload = {
             "sub": user.sys_user_uuid,
             "name": user.sys_user_email_aes,
-            "role": TextCrypto(plain_text=config.ADMIN_ROLE).encrypt_text(),
+            "role": crypto_service.encrypt_constant(config.ADMIN_ROLE),
         }
         access_token = dependencies.create_access_token(data=payload)
         refresh_token = dependencies.create_refresh_token(
@@ -57,7 +56,7 @@ class AdminService:
         payload = {
             "sub": user.sys_user_uuid,
             "name": user.sys_user_email_aes,
-            "role": TextCrypto(plain_text=config.ADMIN_ROLE).encrypt_text(),
+            "role": crypto_service.encrypt_constant(config.ADMIN_ROLE),
         }
         access_token = dependencies.create_access_token(data=payload)
 
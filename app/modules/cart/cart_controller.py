@@ -0,0 +1,61 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends
+
+from app.modules.cart.cart_schema import Cart, CartItemDTO, CartQuantityDTO
+from app.modules.cart.cart_service import CartService
+from app.common.dependencies import get_current_customer_user
+
+router = APIRouter()
+
+
+@router.get("/{cart_uuid}")
+async def get_cart(
+    cart_uuid: str,
+    cart_service: Annotated[CartService, Depends(CartService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+) -> Cart:
+    return await cart_service.get_cart(current_user, cart_uuid)
+
+
+@router.post("/{cart_uuid}/items")
+async def add_cart_item(
+    cart_uuid: str,
+    payload: CartItemDTO,
+    cart_service: Annotated[CartService, Depends(CartService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+) -> Cart:
+    return await cart_service.add_item(
+        current_user, cart_uuid, payload.item_uuid, payload.quantity
+    )
+
+
+@router.put("/{cart_uuid}/items/{item_uuid}")
+async def set_cart_item_quantity(
+    cart_uuid: str,
+    item_uuid: str,
+    payload: CartQuantityDTO,
+    cart_service: Annotated[CartService, Depends(CartService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+) -> Cart:
+    return await cart_service.set_quantity(
+        current_user, cart_uuid, item_uuid, payload.quantity
+    )
+
+
+@router.delete("/{cart_uuid}/items/{item_uuid}")
+async def remove_cart_item(
+    cart_uuid: str,
+    item_uuid: str,
+    cart_service: Annotated[CartService, Depends(CartService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+) -> Cart:
+    return await cart_service.remove_item(current_user, cart_uuid, item_uuid)
+
+
+@router.delete("/{cart_uuid}")
+async def clear_cart(
+    cart_uuid: str,
+    cart_service: Annotated[CartService, Depends(CartService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+) -> Cart:
+    return await cart_service.clear_cart(current_user, cart_uuid)
@@ -0,0 +1,141 @@
+from typing import Optional
+from app.core.database import connection, fetch_all
+
+
+class CartChanges:
+    """
+    Object of the changes of a cart not flushed to Postgres yet
+    """
+
+    def __init__(self):
+        self.cleared = False
+        # quantity by item_uuid, 0 deletes the line
+        self.items: dict[str, int] = {}
+
+    def set(self, item_uuid: str, quantity: int):
+        self.items[item_uuid] = quantity
+
+    def clear(self):
+        self.cleared = True
+        self.items.clear()
+
+    def merge(self, newer: "CartChanges"):
+        """
+        Apply newer changes on top of these ones
+        """
+        if newer.cleared:
+            self.clear()
+        self.items.update(newer.items)
+
+    def apply(self, items: dict[str, int]):
+        """
+        Apply the changes to the lines of a cart
+        args:
+            items: dict -> quantity by item_uuid, updated in place
+        """
+        if self.cleared:
+            items.clear()
+        for item_uuid, quantity in self.items.items():
+            if quantity > 0:
+                items[item_uuid] = quantity
+            else:
+                items.pop(item_uuid, None)
+
+
+class CartModel:
+    async def select_customer_cart(self, user_uuid: str) -> Optional[str]:
+        """
+        Read the cart of the customer of a user
+        args:
+            user_uuid: str -> uuid of the user
+        return:
+            str cart_uuid, None when the user has no enabled customer
+        """
+        query = """
+            SELECT  c.customer_cart_uuid
+            FROM store.sys_user u
+            JOIN store.customer c ON c.customer_id = u.customer_id
+            WHERE u.sys_user_uuid = %s
+            AND u.sys_user_enabled
+        """
+        rows = await fetch_all(query, (user_uuid,))
+        return rows[0]["customer_cart_uuid"] if rows else None
+
+    async def select_cart(self, cart_uuid: str) -> dict[str, int]:
+        """
+        Read the lines of a cart
+        args:
+            cart_uuid: str -> uuid of the cart
+        return:
+            dict with the quantity by item_uuid
+        """
+        query = """
+            SELECT  item_uuid,
+                    cart_item_quantity
+            FROM store.cart_item
+            WHERE cart_uuid = %s
+        """
+        rows = await fetch_all(query, (cart_uuid,))
+        return {row["item_uuid"]: row["cart_item_quantity"] for row in rows}
+
+    async def write_changes(self, changes: dict[str, CartChanges]):
+        """
+        Write the changes of many carts in one transaction, with one statement
+        per kind of change
+        args:
+            changes: dict -> changes by cart_uuid
+        """
+        cleared = [cart_uuid for cart_uuid, change in changes.items() if change.cleared]
+        lines = [
+            (cart_uuid, item_uuid, quantity)
+            for cart_uuid, change in changes.items()
+            for item_uuid, quantity in change.items.items()
+        ]
+        upserts = [line for line in lines if line[2] > 0]
+        deletes = [line for line in lines if line[2] <= 0]
+
+        async with connection() as database:
+            async with database.transaction():
+                cursor = database.cursor()
+
+                if cleared:
+                    await cursor.execute(
+                        "DELETE FROM store.cart_item WHERE cart_uuid = ANY(%s)",
+                        (cleared,),
+                    )
+
+                if deletes:
+                    await cursor.execute(
+                        """
+                            DELETE FROM store.cart_item c
+                            USING unnest(%s::varchar[], %s::varchar[])
+                                AS d(cart_uuid, item_uuid)
+                            WHERE c.cart_uuid = d.cart_uuid
+                            AND c.item_uuid = d.item_uuid
+                        """,
+                        (
+                            [line[0] for line in deletes],
+                            [line[1] for line in deletes],
+                        ),
+                    )
+
+                if upserts:
+                    await cursor.execute(
+                        """
+                            INSERT INTO store.cart_item (
+                                cart_uuid,
+                                item_uuid,
+                                cart_item_quantity
+                            )
+                            SELECT  *
+                            FROM unnest(%s::varchar[], %s::varchar[], %s::int[])
+                            ON CONFLICT (cart_uuid, item_uuid) DO UPDATE SET
+                                cart_item_quantity = EXCLUDED.cart_item_quantity,
+                                cart_item_updated_at = now()
+                        """,
+                        (
+                            [line[0] for line in upserts],
+                            [line[1] for line in upserts],
+                            [line[2] for line in upserts],
+                        ),
+                    )
@@ -0,0 +1,8 @@
+from fastapi import FastAPI
+from app.modules.cart import cart_controller
+
+
+class CartModule:
+    @staticmethod
+    def register(app: FastAPI):
+        app.include_router(cart_controller.router, prefix="/cart", tags=["Cart"])
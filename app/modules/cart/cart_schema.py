@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class CartItemDTO(BaseModel):
+    item_uuid: str
+    quantity: int = 1
+
+
+class CartQuantityDTO(BaseModel):
+    quantity: int
+
+
+class CartItem(BaseModel):
+    item_uuid: str
+    quantity: int
+    item_name: str | None = None
+    item_price: float | None = None
+
+
+class Cart(BaseModel):
+    cart_uuid: str
+    items: list[CartItem] = []
+    total_quantity: int = 0
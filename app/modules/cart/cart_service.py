@@ -0,0 +1,324 @@
+import asyncio
+import contextlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException, status
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.write_log import AppendLog
+from app.modules.cart.cart_model import CartChanges, CartModel
+from app.modules.cart.cart_schema import Cart, CartItem
+from app.modules.products.products_service import product_index
+
+logger = logging.getLogger(__name__)
+
+
+class CartStore:
+    """
+    In-process carts, the source of the cart reads and writes. Every write is
+    appended to a local log and queued, a background task flushes the queue
+    to Postgres in one transaction every CART_FLUSH_INTERVAL seconds or once
+    CART_FLUSH_MAX_WRITES writes are queued. On start the log left by a
+    crash is replayed and flushed
+    """
+
+    def __init__(self, model: CartModel, log: AppendLog, max_carts: int):
+        """
+        args:
+            model: CartModel -> Postgres access of the carts
+            log: AppendLog -> log of the writes not flushed yet
+            max_carts: int -> carts kept in memory, the least recently used
+                        carts without queued writes are dropped
+        """
+        self.model = model
+        self.log = log
+        self.max_carts = max_carts
+        self.__carts: OrderedDict[str, dict[str, int]] = OrderedDict()
+        self.__pending: dict[str, CartChanges] = {}
+        self.__flushing: dict[str, CartChanges] = {}
+        self.__pending_writes = 0
+        self.__flush_requested = asyncio.Event()
+        self.__flush_lock = asyncio.Lock()
+        self.__task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_writes = 0
+        self.failed_flushes = 0
+
+    async def start(self):
+        """
+        Replay the writes left in the log and start the background flushes
+        """
+        self.log.open()
+        for record in self.log.read():
+            self.__queue(record)
+        await self.flush()
+
+        if not self.__task:
+            self.__task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Stop the background flushes and flush the queued writes
+        """
+        if self.__task:
+            self.__task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__task
+            self.__task = None
+
+        await self.flush()
+        await self.log.close()
+
+    async def run(self):
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self.__flush_requested.wait(), config.CART_FLUSH_INTERVAL
+                )
+            self.__flush_requested.clear()
+            await self.flush()
+
+    async def get(self, cart_uuid: str) -> dict[str, int]:
+        """
+        Get the lines of a cart, read from Postgres the first time
+        args:
+            cart_uuid: str -> uuid of the cart
+        return:
+            dict with the quantity by item_uuid
+        """
+        items = self.__carts.get(cart_uuid)
+        if items is not None:
+            self.__carts.move_to_end(cart_uuid)
+            return items
+
+        # a flush may commit while the cart is read, its changes are kept too
+        unflushed = [self.__flushing.get(cart_uuid), self.__pending.get(cart_uuid)]
+        items = await self.model.select_cart(cart_uuid)
+        # another request loaded the cart while this one waited
+        if cart_uuid in self.__carts:
+            return await self.get(cart_uuid)
+
+        # the writes not in Postgres yet go on top of the stored lines, every
+        # change sets an absolute quantity so applying one twice is harmless
+        unflushed += [self.__flushing.get(cart_uuid), self.__pending.get(cart_uuid)]
+        for changes in unflushed:
+            if changes is not None:
+                changes.apply(items)
+
+        self.__carts[cart_uuid] = items
+        self.__evict()
+        return items
+
+    async def set_quantity(self, cart_uuid: str, item_uuid: str, quantity: int):
+        """
+        Set the quantity of a line, 0 removes it
+        """
+        items = await self.get(cart_uuid)
+        if quantity > 0:
+            items[item_uuid] = quantity
+        else:
+            items.pop(item_uuid, None)
+        await self.__write(["set", cart_uuid, item_uuid, quantity])
+
+    async def clear(self, cart_uuid: str):
+        items = await self.get(cart_uuid)
+        items.clear()
+        await self.__write(["clear", cart_uuid])
+
+    async def __write(self, record: list):
+        # queued with the log record so a flush never rotates the record away
+        # before its change is in the batch
+        written = self.log.append(record)
+        self.__queue(record)
+        if self.__pending_writes >= config.CART_FLUSH_MAX_WRITES:
+            self.__flush_requested.set()
+        await written
+
+    def __queue(self, record: list):
+        changes = self.__pending.get(record[1])
+        if changes is None:
+            changes = self.__pending[record[1]] = CartChanges()
+        if record[0] == "clear":
+            changes.clear()
+        else:
+            changes.set(record[2], record[3])
+        self.__pending_writes += 1
+
+    async def flush(self):
+        """
+        Write the queued changes to Postgres in one transaction, on failure
+        they are queued again under the newer ones and the log is kept
+        """
+        async with self.__flush_lock:
+            if not self.__pending:
+                return
+
+            rotated = self.log.rotate()
+            batch, writes = self.__pending, self.__pending_writes
+            self.__pending, self.__pending_writes = {}, 0
+            self.__flushing = batch
+
+            try:
+                segments = await rotated
+                await self.model.write_changes(batch)
+            except Exception as exc:
+                self.failed_flushes += 1
+                for cart_uuid, newer in self.__pending.items():
+                    batch.setdefault(cart_uuid, CartChanges()).merge(newer)
+                self.__pending = batch
+                self.__pending_writes += writes
+                logger.warning("Cart flush failed: %s", exc)
+                return
+            finally:
+                self.__flushing = {}
+
+            await self.log.remove(segments)
+            self.flushes += 1
+            self.flushed_writes += writes
+
+    def __evict(self):
+        if len(self.__carts) <= self.max_carts:
+            return
+        for cart_uuid in list(self.__carts):
+            if cart_uuid in self.__pending or cart_uuid in self.__flushing:
+                continue
+            del self.__carts[cart_uuid]
+            if len(self.__carts) <= self.max_carts:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "carts": len(self.__carts),
+            "pending_carts": len(self.__pending),
+            "pending_writes": self.__pending_writes,
+            "flushes": self.flushes,
+            "flushed_writes": self.flushed_writes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+cart_store = CartStore(
+    model=CartModel(),
+    log=AppendLog(config.CART_LOG_PATH, fsync=config.CART_LOG_FSYNC),
+    max_carts=config.CART_MAX_CARTS,
+)
+# cart_uuid of the customer by user_uuid
+cart_owners = TTLCache(
+    ttl=config.CART_OWNER_CACHE_TTL_SECONDS, max_entries=config.CART_MAX_CARTS
+)
+
+
+class CartService:
+    async def get_cart(self, current_user: dict, cart_uuid: str) -> Cart:
+        """
+        Get a cart with the name and price of its indexed items
+        args:
+            current_user: dict -> claims of the user owning the cart
+            cart_uuid: str -> uuid of the cart
+        return:
+            Cart with its lines
+        """
+        await self.check_cart_owner(current_user, cart_uuid)
+        items = await cart_store.get(cart_uuid)
+
+        lines = []
+        for item_uuid, quantity in items.items():
+            product = product_index.get(item_uuid) or {}
+            lines.append(
+                CartItem(
+                    item_uuid=item_uuid,
+                    quantity=quantity,
+                    item_name=product.get("item_name"),
+                    item_price=product.get("item_price"),
+                )
+            )
+        return Cart(
+            cart_uuid=cart_uuid,
+            items=lines,
+            total_quantity=sum(items.values()),
+        )
+
+    async def add_item(
+        self, current_user: dict, cart_uuid: str, item_uuid: str, quantity: int
+    ) -> Cart:
+        if quantity < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Quantity must be at least 1",
+            )
+        await self.check_cart_owner(current_user, cart_uuid)
+        items = await cart_store.get(cart_uuid)
+        return await self.set_quantity(
+            current_user, cart_uuid, item_uuid, items.get(item_uuid, 0) + quantity
+        )
+
+    async def set_quantity(
+        self, current_user: dict, cart_uuid: str, item_uuid: str, quantity: int
+    ) -> Cart:
+        """
+        Set the quantity of an item in a cart, 0 removes it
+        """
+        await self.check_cart_owner(current_user, cart_uuid)
+        if len(item_uuid) > 45:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Item not valid",
+            )
+        if quantity < 0 or quantity > config.CART_MAX_ITEM_QUANTITY:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Quantity must be between 0 and {config.CART_MAX_ITEM_QUANTITY}",
+            )
+
+        items = await cart_store.get(cart_uuid)
+        if quantity and item_uuid not in items and len(items) >= config.CART_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"A cart holds at most {config.CART_MAX_ITEMS} items",
+            )
+
+        await cart_store.set_quantity(cart_uuid, item_uuid, quantity)
+        return await self.get_cart(current_user, cart_uuid)
+
+    async def remove_item(
+        self, current_user: dict, cart_uuid: str, item_uuid: str
+    ) -> Cart:
+        return await self.set_quantity(current_user, cart_uuid, item_uuid, 0)
+
+    async def clear_cart(self, current_user: dict, cart_uuid: str) -> Cart:
+        await self.check_cart_owner(current_user, cart_uuid)
+        await cart_store.clear(cart_uuid)
+        return Cart(cart_uuid=cart_uuid)
+
+    async def check_cart_owner(self, current_user: dict, cart_uuid: str):
+        """
+        Check a cart is the cart of the customer of the user, the cart of a
+        user is cached so the cart routes do not wait on Postgres
+        args:
+            current_user: dict -> claims of the user
+            cart_uuid: str -> uuid of the cart
+        raise:
+            HTTPException 404 when the cart is not the cart of the user
+        """
+        self.check_cart_uuid(cart_uuid)
+        user_uuid = current_user["user_uuid"]
+        owned = cart_owners.get(user_uuid)
+        if owned is None:
+            owned = await cart_store.model.select_customer_cart(user_uuid)
+            if owned:
+                cart_owners.set(user_uuid, owned)
+
+        if owned != cart_uuid:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cart not found",
+            )
+
+    def check_cart_uuid(self, cart_uuid: str):
+        if not cart_uuid or len(cart_uuid) > 45:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cart not valid",
+            )
@@ -1,46 +1,90 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 
 from app.modules.category.category_schema import CategoryDTO, NewCategoryDTO
+from app.modules.category.category_service import CategoryService
 from app.modules.admin.admin_schema import UserBase
-from app.modules.admin.admin_model import AdminModel
 from app.common.dependencies import get_current_admin_user
-from app.core import config
-from app.core.http_request import Client
+from app.common.utils import check_batch_size
 
 router = APIRouter()
-adminModel = AdminModel()
-
-client: Client = Client(base_url=config.PRODUCT_API, timeout=50.0)
 
 
 @router.get("/")
-async def get_all_category():
-    return client.get(path="/category")
+async def get_all_category(
+    request: Request,
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
+):
+    categories = await category_service.get_all_categories()
+    return categories.response(request)
+
+
+@router.get("/counts")
+async def get_category_counts(
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
+):
+    return await category_service.get_category_counts()
 
 
 # Need to add Admin JWT Authentication
 @router.post("/")
 async def create_category(
     payload: NewCategoryDTO,
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
     body = payload.model_dump(exclude_none=True)
-    return client.post(path="/category", json=body)
+    return await category_service.create_category(body)
 
 
 @router.patch("/")
 async def update_category(
     payload: CategoryDTO,
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
     body = payload.model_dump(exclude_none=True)
-    return client.patch(path="/category", json=body)
+    return await category_service.update_category(body)
 
 
 @router.delete("/")
 async def delete_category(
     category_uuid: str,
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    return await category_service.delete_category(category_uuid)
+
+
+@router.post("/batch")
+async def create_categories(
+    payload: list[NewCategoryDTO],
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    check_batch_size(payload)
+    return await category_service.create_categories(
+        [category.model_dump(exclude_none=True) for category in payload]
+    )
+
+
+@router.patch("/batch")
+async def update_categories(
+    payload: list[CategoryDTO],
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    check_batch_size(payload)
+    return await category_service.update_categories(
+        [category.model_dump(exclude_none=True) for category in payload]
+    )
+
+
+@router.delete("/batch")
+async def delete_categories(
+    category_uuid: Annotated[list[str], Query()],
+    category_service: Annotated[CategoryService, Depends(CategoryService)],
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
-    return client.delete(path="/category", params={"category_uuid": category_uuid})
+    check_batch_size(category_uuid)
+    return await category_service.delete_categories(category_uuid)
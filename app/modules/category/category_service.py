@@ -0,0 +1,168 @@
+from typing import Iterable
+
+from app.common.utils import batch_results, gather_limited
+from app.core import config
+from app.core.cache import catalog_cache, collect_tags, make_key
+from app.core.database import fetch_all
+from app.core.http_request import Client, RawResponse
+from app.modules.products.products_service import (
+    CATALOG_TAG_FIELDS,
+    NATIVE_SOURCE,
+    category_items,
+    encode_json,
+    get_category_counts,
+    product_index,
+)
+
+client: Client = Client(base_url=config.PRODUCT_API, timeout=config.PRODUCT_API_TIMEOUT)
+
+CATEGORY_PATH = "/category"
+CATEGORY_LIST_TAG = ("list", CATEGORY_PATH)
+
+
+class CategoryService:
+    async def get_all_categories(self) -> RawResponse:
+        async def load() -> tuple[RawResponse, set]:
+            if config.CATALOG_CATEGORY_SOURCE == NATIVE_SOURCE:
+                categories = encode_json(await self.select_categories())
+            else:
+                categories = await client.get_raw(
+                    path=CATEGORY_PATH, timeout=config.PRODUCT_API_READ_TIMEOUT
+                )
+
+            tags = collect_tags(categories.content, CATALOG_TAG_FIELDS)
+            tags.add(CATEGORY_LIST_TAG)
+            return categories, tags
+
+        return await catalog_cache.get_or_load(make_key(CATEGORY_PATH), load)
+
+    async def get_category_counts(self) -> dict[str, int]:
+        """
+        Number of items of every category, for the storefront facets
+        return:
+            dict with the count by category_uuid
+        """
+        return await get_category_counts()
+
+    async def select_categories(self) -> list[dict]:
+        """
+        Read every category from Postgres
+        return:
+            list of categories ordered by name
+        """
+        query = """
+            SELECT  category_uuid,
+                    category_name
+            FROM store.category
+            ORDER BY category_name
+        """
+        return await fetch_all(query)
+
+    async def create_category(self, body: dict, invalidate: bool = True) -> dict:
+        category = await client.post(
+            path=CATEGORY_PATH, json=body, timeout=config.PRODUCT_API_WRITE_TIMEOUT
+        )
+        if invalidate:
+            catalog_cache.invalidate_tag(CATEGORY_LIST_TAG)
+        created = {**body, **category} if isinstance(category, dict) else body
+        if created.get("category_uuid") and created.get("category_name"):
+            product_index.set_category(
+                created["category_uuid"], created["category_name"]
+            )
+            if category_items.loaded:
+                category_items.replace(created["category_uuid"], [])
+
+        return category
+
+    async def update_category(self, body: dict, invalidate: bool = True) -> dict:
+        category = await client.patch(
+            path=CATEGORY_PATH, json=body, timeout=config.PRODUCT_API_WRITE_TIMEOUT
+        )
+        # products embedding or filtered by the category are tagged with its uuid
+        if invalidate:
+            catalog_cache.invalidate_tag(CATEGORY_LIST_TAG)
+            catalog_cache.invalidate_tag(("category_uuid", body.get("category_uuid")))
+        # products are searchable by the name of their categories
+        if body.get("category_uuid") and body.get("category_name"):
+            product_index.set_category(body["category_uuid"], body["category_name"])
+
+        return category
+
+    async def delete_category(
+        self, category_uuid: str, invalidate: bool = True
+    ) -> dict:
+        category = await client.delete(
+            path=CATEGORY_PATH,
+            params={"category_uuid": category_uuid},
+            timeout=config.PRODUCT_API_WRITE_TIMEOUT,
+        )
+        if invalidate:
+            catalog_cache.invalidate_tag(CATEGORY_LIST_TAG)
+            catalog_cache.invalidate_tag(("category_uuid", category_uuid))
+        product_index.set_category(category_uuid, None)
+        category_items.remove(category_uuid)
+
+        return category
+
+    async def create_categories(self, bodies: list[dict]) -> list[dict]:
+        """
+        Create categories on the upstream with bounded concurrency
+        return:
+            per item status, in the order of the bodies
+        """
+        outcomes = await gather_limited(
+            lambda body: self.create_category(body, invalidate=False),
+            bodies,
+            config.BATCH_CONCURRENCY,
+        )
+        if any(not isinstance(outcome, Exception) for outcome in outcomes):
+            catalog_cache.invalidate_tag(CATEGORY_LIST_TAG)
+
+        return batch_results(outcomes)
+
+    async def update_categories(self, bodies: list[dict]) -> list[dict]:
+        """
+        Update categories on the upstream with bounded concurrency
+        return:
+            per item status, in the order of the bodies
+        """
+        outcomes = await gather_limited(
+            lambda body: self.update_category(body, invalidate=False),
+            bodies,
+            config.BATCH_CONCURRENCY,
+        )
+        self.invalidate_categories(
+            body.get("category_uuid")
+            for body, outcome in zip(bodies, outcomes)
+            if not isinstance(outcome, Exception)
+        )
+
+        return batch_results(outcomes)
+
+    async def delete_categories(self, category_uuids: list[str]) -> list[dict]:
+        """
+        Delete categories on the upstream with bounded concurrency
+        return:
+            per item status, in the order of the uuids
+        """
+        outcomes = await gather_limited(
+            lambda category_uuid: self.delete_category(category_uuid, invalidate=False),
+            category_uuids,
+            config.BATCH_CONCURRENCY,
+        )
+        self.invalidate_categories(
+            category_uuid
+            for category_uuid, outcome in zip(category_uuids, outcomes)
+            if not isinstance(outcome, Exception)
+        )
+
+        return batch_results(outcomes)
+
+    def invalidate_categories(self, category_uuids: Iterable[str]):
+        category_uuids = list(category_uuids)
+        if not category_uuids:
+            return
+
+        catalog_cache.invalidate_tag(CATEGORY_LIST_TAG)
+        for category_uuid in category_uuids:
+            catalog_cache.invalidate_tag(("category_uuid", category_uuid))
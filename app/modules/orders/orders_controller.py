@@ -0,0 +1,41 @@
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Header, status
+
+from app.modules.orders.orders_schema import (
+    Order,
+    OrderDTO,
+    Reservation,
+    ReservationDTO,
+)
+from app.modules.orders.orders_service import OrdersService, ReservationsService
+from app.common.dependencies import get_current_customer_user
+
+router = APIRouter()
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def place_order(
+    payload: OrderDTO,
+    orders_service: Annotated[OrdersService, Depends(OrdersService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+    idempotency_key: Annotated[Optional[str], Header(alias="Idempotency-Key")] = None,
+) -> Order:
+    return await orders_service.place_order(current_user, payload, idempotency_key)
+
+
+@router.post("/reservation", status_code=status.HTTP_201_CREATED)
+async def reserve_items(
+    payload: ReservationDTO,
+    reservations_service: Annotated[ReservationsService, Depends(ReservationsService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+) -> Reservation:
+    return await reservations_service.reserve(current_user, payload)
+
+
+@router.delete("/reservation/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def release_reservation(
+    reservation_id: str,
+    reservations_service: Annotated[ReservationsService, Depends(ReservationsService)],
+    current_user: Annotated[dict, Depends(get_current_customer_user)],
+):
+    await reservations_service.release(current_user, reservation_id)
@@ -0,0 +1,399 @@
+from typing import Annotated, Optional
+from psycopg import AsyncConnection
+from psycopg.errors import DeadlockDetected, SerializationFailure
+from psycopg.types.json import Jsonb
+from fastapi import Depends, HTTPException, status
+from app.core import config
+from app.core.database import fetch_all, get_database
+
+
+class OrdersModel:
+    def __init__(self, database: Annotated[AsyncConnection, Depends(get_database)]):
+        self.__database = database
+
+    async def get_checkout(
+        self, user_uuid: str, card_uuid: str, payment_method_uuid: str
+    ) -> Optional[dict]:
+        """
+        Resolve the ids an order is stored with, read before the order
+        transaction so it stays short
+        args:
+            user_uuid: str -> sys_user_uuid of the customer placing the order,
+                        the sub of the tokens of /user/auth/login
+            card_uuid: str -> uuid of a card of the customer
+            payment_method_uuid: str -> uuid of the payment method
+        return:
+            dict with the customer, card, payment method and first order status
+            ids, None when the customer does not own the card
+        """
+        cursor = self.__database.cursor()
+        query = """
+            SELECT  u.customer_id,
+                    cd.card_id,
+                    pm.payment_method_id,
+                    (
+                        SELECT  os.order_status_id
+                        FROM store.order_status os
+                        ORDER BY os.order_status_step_number
+                        LIMIT 1
+                    ) AS order_status_id
+            FROM store.sys_user u
+            JOIN store.card cd ON cd.customer_id = u.customer_id
+            JOIN store.payment_method pm ON pm.payment_method_uuid = %(payment_method_uuid)s
+            WHERE u.sys_user_uuid = %(user_uuid)s
+            AND u.sys_user_enabled
+            AND cd.card_uuid = %(card_uuid)s
+        """
+        params = {
+            "user_uuid": user_uuid,
+            "card_uuid": card_uuid,
+            "payment_method_uuid": payment_method_uuid,
+        }
+
+        try:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+        except Exception as exc:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="DB is not responding",
+            ) from exc
+
+    async def get_idempotency_key(
+        self, user_uuid: str, idempotency_key: str
+    ) -> Optional[dict]:
+        cursor = self.__database.cursor()
+        query = """
+            SELECT  request_hash,
+                    response
+            FROM store.idempotency_key
+            WHERE user_uuid = %s AND idempotency_key = %s
+        """
+        try:
+            await cursor.execute(query, (user_uuid, idempotency_key))
+            return await cursor.fetchone()
+
+        except Exception as exc:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="DB is not responding",
+            ) from exc
+
+    async def place_order(
+        self,
+        order_uuid: int,
+        checkout: dict,
+        lines: list[tuple[str, int]],
+        idempotency: Optional[tuple[str, str, str]] = None,
+        reserved: bool = False,
+    ) -> Optional[dict]:
+        """
+        Store an order in one transaction: one set based stock update, one
+        multi-row insert of the order lines and one of the purchase history.
+        Without a reservation the rows of the items are locked first and the
+        update checks the stock left less the lines not applied yet
+        args:
+            order_uuid: int -> numeric uuid of the order
+            checkout: dict -> ids returned by get_checkout
+            lines: list -> (item_uuid, quantity) with unique item_uuids
+            idempotency: tuple -> (user_uuid, idempotency_key, request_hash)
+            reserved: bool -> the stock is held by a reservation, the lines are
+                        stored without the stock update and apply_orders
+                        takes it from the items later, the item rows are not
+                        locked
+        return:
+            dict with the order, None when another request already holds the
+            idempotency key
+        raise:
+            HTTPException 409 when an item is missing or short of stock, the
+            transaction is retried on deadlocks
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self.__insert_order(
+                    order_uuid, checkout, lines, idempotency, reserved
+                )
+
+            except HTTPException:
+                raise
+
+            except (DeadlockDetected, SerializationFailure) as exc:
+                attempt += 1
+                if attempt > config.ORDER_TRANSACTION_RETRIES:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="DB is not responding",
+                    ) from exc
+
+            except Exception as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="DB is not responding",
+                ) from exc
+
+    async def __insert_order(
+        self,
+        order_uuid: int,
+        checkout: dict,
+        lines: list[tuple[str, int]],
+        idempotency: Optional[tuple[str, str, str]],
+        reserved: bool,
+    ) -> Optional[dict]:
+        async with self.__database.transaction():
+            cursor = self.__database.cursor()
+
+            if idempotency:
+                # waits for a concurrent request with the same key to finish
+                await cursor.execute(
+                    """
+                        INSERT INTO store.idempotency_key (
+                            user_uuid,
+                            idempotency_key,
+                            request_hash
+                        )
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        RETURNING user_uuid
+                    """,
+                    idempotency,
+                )
+                if await cursor.fetchone() is None:
+                    return None
+
+            item_uuids = [line[0] for line in lines]
+            quantities = [line[1] for line in lines]
+
+            if reserved:
+                # the reservation counts hold the stock, the rows are read
+                # without a lock and a count out of date is stopped by the
+                # floor of apply_orders and the item_quantity check
+                await cursor.execute(
+                    """
+                        SELECT  i.item_id,
+                                i.item_uuid,
+                                i.item_price,
+                                o.quantity
+                        FROM store.item i
+                        JOIN unnest(%s::varchar[], %s::int[]) AS o(item_uuid, quantity)
+                            ON o.item_uuid = i.item_uuid
+                        WHERE i.item_quantity >= o.quantity
+                    """,
+                    (item_uuids, quantities),
+                )
+            else:
+                # the update reads the orders committed before the lock, a
+                # statement sees the rows committed when it starts
+                await cursor.execute(
+                    """
+                        SELECT  item_id
+                        FROM store.item
+                        WHERE item_uuid = ANY(%s)
+                        ORDER BY item_id
+                        FOR NO KEY UPDATE
+                    """,
+                    (item_uuids,),
+                )
+                await cursor.execute(
+                    """
+                        UPDATE store.item i
+                        SET item_quantity = i.item_quantity - o.quantity,
+                            item_updated_at = now()
+                        FROM unnest(%s::varchar[], %s::int[]) AS o(item_uuid, quantity)
+                        WHERE i.item_uuid = o.item_uuid
+                        AND i.item_quantity - coalesce(
+                            (
+                                SELECT  sum(p.order_item_quantity)
+                                FROM store.orders p
+                                WHERE p.item_id = i.item_id
+                                AND NOT p.order_stock_applied
+                            ),
+                            0
+                        ) >= o.quantity
+                        RETURNING i.item_id, i.item_uuid, i.item_price, o.quantity
+                    """,
+                    (item_uuids, quantities),
+                )
+            updated = await cursor.fetchall()
+
+            if len(updated) < len(lines):
+                found = {row["item_uuid"] for row in updated}
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={
+                        "message": "Items out of stock",
+                        "item_uuids": [
+                            line[0] for line in lines if line[0] not in found
+                        ],
+                    },
+                )
+
+            for row in updated:
+                row["amount"] = row["item_price"] * row["quantity"]
+
+            await cursor.execute(
+                """
+                    INSERT INTO store.orders (
+                        order_uuid,
+                        order_created_at,
+                        order_updated_at,
+                        order_total_amount,
+                        order_item_quantity,
+                        order_stock_applied,
+                        item_id,
+                        customer_id,
+                        order_status_id,
+                        card_id,
+                        payment_method_id
+                    )
+                    SELECT  %(order_uuid)s,
+                            now(),
+                            now(),
+                            l.amount,
+                            l.quantity,
+                            %(stock_applied)s,
+                            l.item_id,
+                            %(customer_id)s,
+                            %(order_status_id)s,
+                            %(card_id)s,
+                            %(payment_method_id)s
+                    FROM unnest(
+                        %(item_ids)s::int[],
+                        %(amounts)s::varchar[],
+                        %(quantities)s::int[]
+                    ) AS l(item_id, amount, quantity)
+                    RETURNING order_created_at
+                """,
+                {
+                    "order_uuid": order_uuid,
+                    "stock_applied": not reserved,
+                    "customer_id": checkout["customer_id"],
+                    "order_status_id": checkout["order_status_id"],
+                    "card_id": checkout["card_id"],
+                    "payment_method_id": checkout["payment_method_id"],
+                    "item_ids": [row["item_id"] for row in updated],
+                    "amounts": [str(row["amount"]) for row in updated],
+                    "quantities": [row["quantity"] for row in updated],
+                },
+            )
+            created_at = (await cursor.fetchall())[0]["order_created_at"]
+
+            await cursor.execute(
+                """
+                    INSERT INTO store.customers_items (
+                        customer_id,
+                        item_id,
+                        customers_items_purchase_date
+                    )
+                    SELECT  %s,
+                            item_id,
+                            now()
+                    FROM unnest(%s::int[]) AS p(item_id)
+                    ON CONFLICT (customer_id, item_id) DO UPDATE SET
+                        customers_items_purchase_date = EXCLUDED.customers_items_purchase_date
+                """,
+                (checkout["customer_id"], [row["item_id"] for row in updated]),
+            )
+
+            order = {
+                "order_uuid": str(order_uuid),
+                "items": [
+                    {
+                        "item_uuid": row["item_uuid"],
+                        "quantity": row["quantity"],
+                        "amount": str(row["amount"]),
+                    }
+                    for row in updated
+                ],
+                "total_amount": str(sum(row["amount"] for row in updated)),
+                "created_at": created_at.isoformat(),
+            }
+
+            if idempotency:
+                await cursor.execute(
+                    """
+                        UPDATE store.idempotency_key
+                        SET response = %s
+                        WHERE user_uuid = %s AND idempotency_key = %s
+                    """,
+                    (Jsonb(order), idempotency[0], idempotency[1]),
+                )
+
+        return order
+
+
+class StockModel:
+    async def select_stock(self, item_uuids: list[str]) -> dict[str, int]:
+        """
+        Read the stock left of items, less the lines of the orders not
+        applied to the items yet
+        args:
+            item_uuids: list -> uuids of the items
+        return:
+            dict with the stock by item_uuid, missing items are left out
+        """
+        query = """
+            SELECT  i.item_uuid,
+                    i.item_quantity - coalesce(
+                        (
+                            SELECT  sum(o.order_item_quantity)
+                            FROM store.orders o
+                            WHERE o.item_id = i.item_id
+                            AND NOT o.order_stock_applied
+                        ),
+                        0
+                    ) AS item_quantity
+            FROM store.item i
+            WHERE i.item_uuid = ANY(%s)
+        """
+        rows = await fetch_all(query, (item_uuids,))
+        return {row["item_uuid"]: row["item_quantity"] for row in rows}
+
+    async def apply_orders(self) -> tuple[list[str], list[str]]:
+        """
+        Take the lines of the orders placed on reservations from the stock of
+        their items, with one statement for every pending line. An item short
+        of its pending lines is left as it is and its lines stay pending
+        return:
+            tuple with the item_uuids updated and the ones short of stock
+        """
+        query = """
+            WITH pending AS (
+                SELECT  order_id,
+                        item_id,
+                        order_item_quantity
+                FROM store.orders
+                WHERE NOT order_stock_applied
+                FOR UPDATE
+            ), sold AS (
+                SELECT  item_id,
+                        sum(order_item_quantity) AS quantity
+                FROM pending
+                GROUP BY item_id
+            ), applied AS (
+                UPDATE store.item i
+                SET item_quantity = i.item_quantity - s.quantity,
+                    item_updated_at = now()
+                FROM sold s
+                WHERE i.item_id = s.item_id
+                AND i.item_quantity >= s.quantity
+                RETURNING i.item_id, i.item_uuid
+            ), marked AS (
+                UPDATE store.orders o
+                SET order_stock_applied = true
+                FROM pending p
+                JOIN applied a ON a.item_id = p.item_id
+                WHERE o.order_id = p.order_id
+            )
+            SELECT  i.item_uuid,
+                    a.item_id IS NOT NULL AS applied
+            FROM sold s
+            JOIN store.item i ON i.item_id = s.item_id
+            LEFT JOIN applied a ON a.item_id = s.item_id
+        """
+        rows = await fetch_all(query)
+        return (
+            [row["item_uuid"] for row in rows if row["applied"]],
+            [row["item_uuid"] for row in rows if not row["applied"]],
+        )
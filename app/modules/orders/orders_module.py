@@ -0,0 +1,8 @@
+from fastapi import FastAPI
+from app.modules.orders import orders_controller
+
+
+class OrdersModule:
+    @staticmethod
+    def register(app: FastAPI):
+        app.include_router(orders_controller.router, prefix="/order", tags=["Order"])
@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class OrderItemDTO(BaseModel):
+    item_uuid: str
+    quantity: int = 1
+
+
+class OrderDTO(BaseModel):
+    card_uuid: str
+    payment_method_uuid: str
+    items: list[OrderItemDTO] = []
+    cart_uuid: str | None = None
+    reservation_id: str | None = None
+
+
+class ReservationDTO(BaseModel):
+    items: list[OrderItemDTO] = []
+    cart_uuid: str | None = None
+
+
+class OrderLine(BaseModel):
+    item_uuid: str
+    quantity: int
+    amount: str
+
+
+class Order(BaseModel):
+    order_uuid: str
+    items: list[OrderLine]
+    total_amount: str
+    created_at: datetime
+
+
+class Reservation(BaseModel):
+    reservation_id: str
+    items: list[OrderItemDTO]
+    expires_at: datetime
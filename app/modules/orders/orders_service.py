@@ -0,0 +1,291 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Optional
+from fastapi import Depends, HTTPException, status
+
+from app.core import config
+from app.core.cache import catalog_cache
+from app.core.reservations import Reservation as StockReservation
+from app.core.reservations import ReservationEngine
+from app.modules.cart.cart_service import CartService, cart_store
+from app.modules.orders.orders_model import OrdersModel, StockModel
+from app.modules.orders.orders_schema import (
+    Order,
+    OrderDTO,
+    OrderItemDTO,
+    Reservation,
+    ReservationDTO,
+)
+
+logger = logging.getLogger(__name__)
+
+stock_model = StockModel()
+stock_reservations = ReservationEngine(
+    loader=stock_model.select_stock,
+    shards=config.RESERVATION_SHARDS,
+    ttl=config.RESERVATION_TTL,
+)
+stock_reconcile_task: Optional[asyncio.Task] = None
+
+
+async def reconcile_stock():
+    """
+    Release the expired reservations, take the orders placed on reservations
+    from the stock of their items in one batch and read the counts again
+    """
+    stock_reservations.expire()
+    applied, short = await stock_model.apply_orders()
+    for item_uuid in applied:
+        catalog_cache.invalidate_tag(("item_uuid", item_uuid))
+    if short:
+        logger.warning("Orders placed over the stock of items: %s", short)
+    if config.RESERVATION_ENABLED:
+        await stock_reservations.refresh()
+
+
+async def run_stock_reconcile():
+    while True:
+        try:
+            await reconcile_stock()
+        except Exception as exc:
+            logger.warning("Stock not reconciled: %s", exc)
+        await asyncio.sleep(config.RESERVATION_RECONCILE_INTERVAL)
+
+
+def start_stock_reconcile():
+    """
+    Start the background task reconciling the reservations with Postgres
+    """
+    global stock_reconcile_task
+    if config.RESERVATION_RECONCILE_INTERVAL > 0 and not stock_reconcile_task:
+        stock_reconcile_task = asyncio.create_task(run_stock_reconcile())
+
+
+async def stop_stock_reconcile():
+    global stock_reconcile_task
+    if stock_reconcile_task:
+        stock_reconcile_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await stock_reconcile_task
+        stock_reconcile_task = None
+
+        with contextlib.suppress(Exception):
+            await stock_model.apply_orders()
+
+
+class ReservationsService:
+    async def reserve(self, current_user: dict, payload: ReservationDTO) -> Reservation:
+        """
+        Hold the stock of some lines or of the lines of a cart until they are
+        ordered, released or RESERVATION_TTL seconds pass
+        args:
+            current_user: dict -> claims of the user holding the reservation
+            payload: ReservationDTO -> lines or cart_uuid to reserve
+        return:
+            Reservation with its id and expiry
+        """
+        if not config.RESERVATION_ENABLED:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Reservations are disabled",
+            )
+        lines = await self.get_lines(current_user, payload.items, payload.cart_uuid)
+        reservation = await stock_reservations.reserve(current_user["user_uuid"], lines)
+        return Reservation(
+            reservation_id=reservation.reservation_id,
+            items=[
+                OrderItemDTO(item_uuid=item_uuid, quantity=quantity)
+                for item_uuid, quantity in lines
+            ],
+            expires_at=datetime.now(timezone.utc)
+            + timedelta(seconds=reservation.expires_at - time.monotonic()),
+        )
+
+    async def release(self, current_user: dict, reservation_id: str):
+        reservation = stock_reservations.get(reservation_id, current_user["user_uuid"])
+        if reservation.committing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Reservation is already being ordered",
+            )
+        stock_reservations.release(reservation)
+
+    async def get_lines(
+        self,
+        current_user: dict,
+        items: list[OrderItemDTO],
+        cart_uuid: Optional[str] = None,
+    ) -> list[tuple[str, int]]:
+        """
+        Get the lines of an order, sorted and with one line per item
+        args:
+            current_user: dict -> claims of the user owning the cart
+            items: list -> lines of the order
+            cart_uuid: str -> cart read when there are no lines
+        return:
+            list of (item_uuid, quantity)
+        """
+        if cart_uuid:
+            await CartService().check_cart_owner(current_user, cart_uuid)
+
+        if items:
+            lines = [(item.item_uuid, item.quantity) for item in items]
+        elif cart_uuid:
+            lines = list((await cart_store.get(cart_uuid)).items())
+        else:
+            lines = []
+
+        quantities: dict[str, int] = {}
+        for item_uuid, quantity in lines:
+            if len(item_uuid) > 45 or quantity < 1:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Item not valid",
+                )
+            quantities[item_uuid] = quantities.get(item_uuid, 0) + quantity
+
+        if not quantities:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The order has no items",
+            )
+        if len(quantities) > config.ORDER_MAX_LINES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"An order holds at most {config.ORDER_MAX_LINES} items",
+            )
+        if max(quantities.values()) > config.ORDER_MAX_ITEM_QUANTITY:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Quantity must be at most {config.ORDER_MAX_ITEM_QUANTITY}",
+            )
+
+        return sorted(quantities.items())
+
+
+class OrdersService:
+    def __init__(self, orders_model: Annotated[OrdersModel, Depends(OrdersModel)]):
+        self.orders_model = orders_model
+
+    async def place_order(
+        self,
+        current_user: dict,
+        order: OrderDTO,
+        idempotency_key: Optional[str] = None,
+    ) -> Order:
+        """
+        Place an order from a reservation, its lines or the lines of a cart
+        args:
+            current_user: dict -> claims of the user placing the order
+            order: OrderDTO -> card, payment method and lines of the order
+            idempotency_key: str -> key of the request, a retry with the same
+                            key gets the stored order back
+        return:
+            Order with its lines and total amount
+        """
+        user_uuid = current_user["user_uuid"]
+
+        idempotency = None
+        if idempotency_key:
+            if len(idempotency_key) > 128:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Idempotency-Key not valid",
+                )
+            request_hash = hashlib.sha256(order.model_dump_json().encode()).hexdigest()
+            stored = await self.get_stored_order(
+                user_uuid, idempotency_key, request_hash
+            )
+            if stored:
+                return stored
+            idempotency = (user_uuid, idempotency_key, request_hash)
+
+        if order.reservation_id:
+            # the cart of the order is cleared once the order is placed
+            if order.cart_uuid:
+                await CartService().check_cart_owner(current_user, order.cart_uuid)
+            reservation = stock_reservations.begin_commit(
+                order.reservation_id, user_uuid
+            )
+            lines = sorted(reservation.lines.items())
+        else:
+            lines = await ReservationsService().get_lines(
+                current_user, order.items, order.cart_uuid
+            )
+            reservation = None
+            if config.RESERVATION_ENABLED:
+                reservation = await stock_reservations.reserve(user_uuid, lines)
+                reservation.committing = True
+
+        try:
+            checkout = await self.orders_model.get_checkout(
+                user_uuid, order.card_uuid, order.payment_method_uuid
+            )
+            if not checkout:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Card or payment method not found",
+                )
+
+            placed = await self.orders_model.place_order(
+                uuid.uuid4().int,
+                checkout,
+                lines,
+                idempotency,
+                reserved=reservation is not None,
+            )
+
+        except BaseException:
+            self.abort(order, reservation)
+            raise
+
+        if placed is None:
+            # a request with the same key committed while this one waited
+            self.abort(order, reservation)
+            stored = await self.get_stored_order(*idempotency)
+            if stored:
+                return stored
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is in progress",
+            )
+
+        if reservation is not None:
+            stock_reservations.commit(reservation)
+        else:
+            for item_uuid, _ in lines:
+                catalog_cache.invalidate_tag(("item_uuid", item_uuid))
+        if order.cart_uuid:
+            await cart_store.clear(order.cart_uuid)
+
+        return Order.model_validate(placed)
+
+    def abort(self, order: OrderDTO, reservation: Optional[StockReservation]):
+        """
+        Give back the stock held for an order that was not placed, a
+        reservation made by the buyer stays held for another try
+        """
+        if reservation is None:
+            return
+        if order.reservation_id:
+            reservation.committing = False
+        else:
+            stock_reservations.release(reservation)
+
+    async def get_stored_order(
+        self, user_uuid: str, idempotency_key: str, request_hash: str
+    ) -> Optional[Order]:
+        stored = await self.orders_model.get_idempotency_key(user_uuid, idempotency_key)
+        if not stored or stored["response"] is None:
+            return None
+        if stored["request_hash"] != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was used with another request",
+            )
+        return Order.model_validate(stored["response"])
@@ -1,66 +1,203 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, Query, Request, UploadFile, status
+from fastapi.responses import StreamingResponse
 
-from app.modules.products.products_schema import ProductDTO, UpdateProductDTO
+from app.modules.products.products_schema import (
+    ImportJob,
+    ProductDTO,
+    UpdateProductDTO,
+)
+from app.modules.products.products_service import ProductsService, encode_json
 from app.modules.admin.admin_schema import UserBase
-from app.modules.admin.admin_model import AdminModel
 from app.common.dependencies import get_current_admin_user
-from app.core import config
-from app.core.http_request import Client
+from app.common.utils import check_batch_size
 
 router = APIRouter()
-adminModel = AdminModel()
 
-client: Client = Client(base_url=config.PRODUCT_API, timeout=50.0)
+
+def product_body(payload: ProductDTO) -> dict:
+    body = payload.model_dump(exclude_none=True)
+    if payload.item_price_off_until_date:
+        body["item_price_off_until_date"] = str(payload.item_price_off_until_date)
+    return body
 
 
 @router.get("/all")
 async def get_all_product(
-    page: int = None, quantity: int = None, category_uuid: str = None
+    request: Request,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    page: int = None,
+    quantity: int = None,
+    category_uuid: str = None,
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: str = None,
+    min_price: float = None,
+    max_price: float = None,
+    sort: Literal["price_asc", "price_desc"] = None,
 ):
-    return client.get(
-        path="/product/all",
-        params={"page": page, "quantity": quantity, "category_uuid": category_uuid},
+    """
+    Page of products with their effective_price. min_price, max_price and
+    sort apply to the items of the requested page only, not to the whole
+    catalog: a filtered page may hold fewer items than quantity or none while
+    later pages still match, and the price order is not kept across pages.
+    Cursor pages are always read from Postgres, offset pages from the source
+    set in CATALOG_PRODUCT_ALL_SOURCE
+    """
+    filters = {"min_price": min_price, "max_price": max_price, "sort": sort}
+    if pagination == "cursor" or cursor:
+        products = await products_service.get_products_page(
+            cursor=cursor, quantity=quantity, category_uuid=category_uuid, **filters
+        )
+    else:
+        products = await products_service.get_all_products(
+            page=page, quantity=quantity, category_uuid=category_uuid, **filters
+        )
+
+    # the cached body is sent as it is, without decoding it again, or as a 304
+    # when the client already has it
+    return products.response(request)
+
+
+@router.get("/search")
+async def search_products(
+    request: Request,
+    q: str,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    category_uuid: str = None,
+    limit: int = None,
+):
+    """
+    Search the products by name or category name, prefixes and typos match too
+    """
+    products = products_service.search_products(
+        query=q, category_uuid=category_uuid, limit=limit
     )
+    return encode_json(products).response(request)
+
+
+@router.get("/batch")
+async def get_products_batch(
+    request: Request,
+    item_uuid: Annotated[list[str], Query()],
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+):
+    check_batch_size(item_uuid)
+    products = await products_service.get_products_by_uuid(item_uuid)
+    return encode_json(products).response(request)
+
 
 @router.get("/")
 async def get_single_product(
-    item_uuid: str = None
+    request: Request,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    item_uuid: str = None,
+):
+    product = await products_service.get_product(item_uuid=item_uuid)
+    return product.response(request)
+
+
+@router.get("/export")
+async def export_products(
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+    updated_since: datetime = None,
+    compress: bool = False,
 ):
-    return client.get(
-        path="/product",
-        params={"item_uuid": item_uuid},
+    """
+    Stream the full catalog as NDJSON, one product per line
+    """
+    headers = {"Content-Encoding": "gzip"} if compress else None
+    return StreamingResponse(
+        products_service.export_products(
+            updated_since=updated_since, compress=compress
+        ),
+        media_type="application/x-ndjson",
+        headers=headers,
     )
 
 
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_products(
+    file: UploadFile,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+    file_format: Literal["csv", "ndjson"] = "csv",
+) -> ImportJob:
+    """
+    Bulk load products from a CSV or NDJSON file validated against ProductDTO,
+    with optional item_uuid and category_uuids (";" separated in CSV) columns
+    """
+    content = await file.read()
+    return products_service.start_import(content=content, file_format=file_format)
+
+
+@router.get("/import/{job_id}")
+async def get_import_job(
+    job_id: str,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+) -> ImportJob:
+    return products_service.get_import_job(job_id)
+
+
 # Need to add Admin JWT Authentication
 @router.post("/")
 async def create_product(
     payload: ProductDTO,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
-    body = payload.model_dump(exclude_none=True)
-    if payload.item_price_off_until_date:
-        body["item_price_off_until_date"] = str(payload.item_price_off_until_date)
-
-    return client.post(path="/product", json=body)
+    return await products_service.create_product(product_body(payload))
 
 
 @router.patch("/")
 async def update_product(
     payload: UpdateProductDTO,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
-    body = payload.model_dump(exclude_none=True)
-    print(body)
-    if payload.item_price_off_until_date:
-        body["item_price_off_until_date"] = str(payload.item_price_off_until_date)
-    return client.patch(path="/product", json=body)
+    return await products_service.update_product(product_body(payload))
 
 
 @router.delete("/")
 async def delete_product(
     item_uuid: str,
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    return await products_service.delete_product(item_uuid)
+
+
+@router.post("/batch")
+async def create_products(
+    payload: list[ProductDTO],
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    check_batch_size(payload)
+    return await products_service.create_products(
+        [product_body(product) for product in payload]
+    )
+
+
+@router.patch("/batch")
+async def update_products(
+    payload: list[UpdateProductDTO],
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
+    current_user: Annotated[UserBase, Depends(get_current_admin_user)],
+):
+    check_batch_size(payload)
+    return await products_service.update_products(
+        [product_body(product) for product in payload]
+    )
+
+
+@router.delete("/batch")
+async def delete_products(
+    item_uuid: Annotated[list[str], Query()],
+    products_service: Annotated[ProductsService, Depends(ProductsService)],
     current_user: Annotated[UserBase, Depends(get_current_admin_user)],
 ):
-    return client.delete(path="/product", params={"item_uuid": item_uuid})
+    check_batch_size(item_uuid)
+    return await products_service.delete_products(item_uuid)
@@ -16,3 +16,26 @@ class UpdateProductDTO(ProductDTO):
     item_name: str | None = None
     item_price: float | None = None
     item_quantity: int | None = None
+
+
+class ProductImportDTO(ProductDTO):
+    item_uuid: str | None = None
+    category_uuids: list[str] = []
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportJob(BaseModel):
+    job_id: str
+    status: str = "pending"
+    rows_total: int = 0
+    rows_processed: int = 0
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    rows_failed: int = 0
+    errors: list[ImportRowError] = []
+    created_at: datetime
+    finished_at: datetime | None = None
@@ -0,0 +1,1233 @@
+import asyncio
+import base64
+import contextlib
+import csv
+import io
+import json
+import logging
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Iterable, Optional
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from app.common.utils import batch_results, gather_limited
+from app.core import config
+from app.core.cache import catalog_cache, collect_tags, make_key
+from app.core.database import connection, fetch_all
+from app.core.http_request import Client, RawResponse
+from app.core.membership import MembershipIndex
+from app.core.pricing import apply_effective_prices, page_items
+from app.core.search import SearchIndex
+from app.core.timer_wheel import TimerWheel
+from app.modules.products.products_schema import (
+    ImportJob,
+    ImportRowError,
+    ProductImportDTO,
+)
+
+logger = logging.getLogger(__name__)
+
+client: Client = Client(base_url=config.PRODUCT_API, timeout=config.PRODUCT_API_TIMEOUT)
+
+ALL_PRODUCTS_PATH = "/product/all"
+PRODUCT_PATH = "/product"
+PRODUCT_LIST_TAG = ("list", ALL_PRODUCTS_PATH)
+CATALOG_TAG_FIELDS = ("item_uuid", "category_uuid")
+NATIVE_SOURCE = "native"
+
+# categories are aggregated per item through the (item_id, category_id) primary key
+PRODUCT_COLUMNS = """
+    i.item_uuid,
+    i.item_name,
+    i.item_price,
+    i.item_price_off,
+    i.item_image_url,
+    i.item_price_off_until_date,
+    i.item_created_at,
+    i.item_updated_at,
+    i.item_quantity,
+    COALESCE(
+        (
+            SELECT  json_agg(
+                        json_build_object(
+                            'category_uuid', c.category_uuid,
+                            'category_name', c.category_name
+                        )
+                        ORDER BY c.category_name
+                    )
+            FROM store.item_has_category ihc
+            JOIN store.category c ON c.category_id = ihc.category_id
+            WHERE ihc.item_id = i.item_id
+        ),
+        '[]'
+    ) AS categories
+"""
+
+
+def encode_cursor(item_created_at: datetime, item_id: int) -> str:
+    """
+    Build the opaque cursor pointing after an item
+    args:
+        item_created_at: datetime -> creation date of the last item of the page
+        item_id: int -> id of the last item of the page
+    return:
+        str url safe cursor
+    """
+    position = json.dumps([item_created_at.isoformat(), item_id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Read the position of an opaque cursor
+    args:
+        cursor: str -> cursor returned as next_cursor
+    return:
+        tuple with the creation date and the id of the last item seen
+    """
+    try:
+        item_created_at, item_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(item_created_at), int(item_id)
+
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor not valid.",
+        ) from exc
+
+
+# in-memory search over the item names and their category names
+product_index = SearchIndex(fuzzy_threshold=config.SEARCH_FUZZY_THRESHOLD)
+product_index_task: Optional[asyncio.Task] = None
+# product fields kept in the index and returned by the searches
+SEARCH_FIELDS = (
+    "item_uuid",
+    "item_name",
+    "item_price",
+    "item_price_off",
+    "item_image_url",
+)
+
+
+def index_product(product: dict, category_uuids: Optional[Iterable[str]] = None):
+    """
+    Add or refresh a product in the search index, the fields missing from a
+    partial update keep their indexed value
+    args:
+        product: dict -> product or update body with its item_uuid
+        category_uuids: Iterable[str] -> categories, None to read them from the
+                        product or keep the indexed ones
+    """
+    item_uuid = product.get("item_uuid")
+    if not item_uuid:
+        return
+
+    document = dict(product_index.get(item_uuid) or {})
+    document.update(
+        (field, product[field]) for field in SEARCH_FIELDS if field in product
+    )
+    if not document.get("item_name"):
+        return
+
+    if category_uuids is None and isinstance(product.get("categories"), list):
+        category_uuids = [
+            category["category_uuid"]
+            for category in product["categories"]
+            if isinstance(category, dict) and category.get("category_uuid")
+        ]
+    if category_uuids is None:
+        category_uuids = product_index.get_categories(item_uuid)
+
+    product_index.add(item_uuid, document["item_name"], category_uuids, document)
+
+
+async def load_product_index():
+    """
+    Build the search index from Postgres, streaming the items from a
+    server-side cursor
+    """
+    categories = await fetch_all(
+        "SELECT category_uuid, category_name FROM store.category"
+    )
+    for category in categories:
+        product_index.category_names[category["category_uuid"]] = category[
+            "category_name"
+        ]
+
+    query = f"""
+        SELECT  {", ".join("i." + field for field in SEARCH_FIELDS)},
+                ARRAY(
+                    SELECT  c.category_uuid
+                    FROM store.item_has_category ihc
+                    JOIN store.category c ON c.category_id = ihc.category_id
+                    WHERE ihc.item_id = i.item_id
+                ) AS category_uuids
+        FROM store.item i
+    """
+    async with connection() as database:
+        async with database.transaction():
+            cursor = database.cursor(name="search_index")
+            await cursor.execute(query)
+
+            with product_index.bulk_load():
+                while rows := await cursor.fetchmany(config.SEARCH_INDEX_BATCH_SIZE):
+                    for row in rows:
+                        index_product(row, category_uuids=row.pop("category_uuids"))
+                    # let other requests run between batches
+                    await asyncio.sleep(0)
+
+            await cursor.close()
+
+
+async def build_product_index():
+    try:
+        await load_product_index()
+    except Exception as exc:
+        logger.warning("Search index not loaded: %s", exc)
+
+
+def start_product_index():
+    """
+    Build the search index in the background, searches answer with the items
+    indexed so far until it finishes
+    """
+    global product_index_task
+    if config.SEARCH_INDEX_ENABLED and not product_index_task:
+        product_index_task = asyncio.create_task(build_product_index())
+
+
+async def stop_product_index():
+    global product_index_task
+    if product_index_task:
+        product_index_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await product_index_task
+        product_index_task = None
+
+
+# sorted item_ids per category_uuid, pages of a category without a join
+category_items = MembershipIndex()
+category_items_lock = asyncio.Lock()
+category_items_task: Optional[asyncio.Task] = None
+
+
+async def load_category_items():
+    """
+    Read the members of every category from Postgres
+    """
+    query = """
+        SELECT  c.category_uuid,
+                ARRAY(
+                    SELECT  ihc.item_id
+                    FROM store.item_has_category ihc
+                    WHERE ihc.category_id = c.category_id
+                    ORDER BY ihc.item_id
+                ) AS item_ids
+        FROM store.category c
+    """
+    rows = await fetch_all(query)
+
+    for category_uuid in set(category_items.counts()) - {
+        row["category_uuid"] for row in rows
+    }:
+        category_items.remove(category_uuid)
+    for row in rows:
+        category_items.replace(row["category_uuid"], row["item_ids"])
+    category_items.loaded = True
+
+
+async def load_category(category_uuid: str):
+    """
+    Read the members of one category from Postgres
+    """
+    query = """
+        SELECT  ihc.item_id
+        FROM store.item_has_category ihc
+        JOIN store.category c ON c.category_id = ihc.category_id
+        WHERE c.category_uuid = %s
+    """
+    rows = await fetch_all(query, (category_uuid,))
+    category_items.replace(category_uuid, (row["item_id"] for row in rows))
+
+
+async def refresh_category_items(category_uuid: Optional[str] = None):
+    """
+    Reload the membership index when it was never loaded or expired, and the
+    categories marked stale by the writes
+    args:
+        category_uuid: str -> only this stale category, None for all of them
+    """
+    async with category_items_lock:
+        if not category_items.loaded:
+            await load_category_items()
+            return
+
+        stale = category_items.stale()
+        if category_uuid:
+            stale &= {category_uuid}
+        for stale_uuid in stale:
+            await load_category(stale_uuid)
+
+
+async def get_category_counts() -> dict[str, int]:
+    """
+    Count the items of every category from the membership index
+    return:
+        dict with the number of items by category_uuid
+    """
+    if not category_items.loaded or category_items.stale():
+        await refresh_category_items()
+    return category_items.counts()
+
+
+def mark_categories_stale(category_uuids: Iterable[str]):
+    if category_items.loaded:
+        for category_uuid in category_uuids:
+            category_items.mark_stale(category_uuid)
+
+
+async def expire_category_items():
+    """
+    Reload the whole membership index every CATEGORY_ITEMS_REFRESH_INTERVAL,
+    catching the writes made outside this app
+    """
+    while True:
+        await asyncio.sleep(config.CATEGORY_ITEMS_REFRESH_INTERVAL)
+        category_items.expire()
+
+
+def start_category_items():
+    global category_items_task
+    if config.CATEGORY_ITEMS_REFRESH_INTERVAL > 0 and not category_items_task:
+        category_items_task = asyncio.create_task(expire_category_items())
+
+
+async def stop_category_items():
+    global category_items_task
+    if category_items_task:
+        category_items_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await category_items_task
+        category_items_task = None
+
+
+# listing pages are tagged with the day their first discount ends and dropped
+# from the cache when that day starts
+price_changes = TimerWheel(tick=config.PRICE_TIMER_TICK, slots=config.PRICE_TIMER_SLOTS)
+price_changes_task: Optional[asyncio.Task] = None
+PRICE_SORTS = {"price_asc": False, "price_desc": True}
+
+
+def price_change_tags(items: list[dict]) -> set:
+    """
+    Set the effective_price of the items of a page and schedule the
+    invalidation of the pages holding them when one of their prices changes
+    args:
+        items: list -> products of the page, updated in place
+    return:
+        set with the tag of the day the first discount ends, empty when none ends
+    """
+    next_change = apply_effective_prices(items, date.today(), config.PRICE_OFF_MODE)
+    if next_change is None:
+        return set()
+
+    tag = ("price_change", next_change.isoformat())
+    price_changes.schedule(
+        datetime.combine(next_change, datetime.min.time()).timestamp(), tag
+    )
+    return {tag}
+
+
+async def expire_price_changes():
+    while True:
+        await asyncio.sleep(config.PRICE_TIMER_TICK)
+        for tag in price_changes.advance(datetime.now().timestamp()):
+            catalog_cache.invalidate_tag(tag)
+
+
+def start_price_changes():
+    global price_changes_task
+    if not price_changes_task:
+        price_changes_task = asyncio.create_task(expire_price_changes())
+
+
+async def stop_price_changes():
+    global price_changes_task
+    if price_changes_task:
+        price_changes_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await price_changes_task
+        price_changes_task = None
+
+
+# latest import jobs by id, the oldest are dropped past CATALOG_IMPORT_MAX_JOBS
+import_jobs: OrderedDict[str, ImportJob] = OrderedDict()
+# references to the running imports, asyncio only keeps weak ones
+import_tasks: set[asyncio.Task] = set()
+
+IMPORT_COLUMNS = (
+    "row_number",
+    "item_uuid",
+    "item_name",
+    "item_price",
+    "item_quantity",
+    "item_image_url",
+    "item_price_off",
+    "item_price_off_until_date",
+    "category_uuids",
+)
+IMPORT_TYPES = (
+    "int4",
+    "varchar",
+    "varchar",
+    "numeric",
+    "int4",
+    "varchar",
+    "numeric",
+    "date",
+    "text[]",
+)
+
+
+def parse_import_rows(content: bytes, file_format: str) -> list[dict]:
+    """
+    Read the rows of a CSV or NDJSON import file
+    args:
+        content: bytes -> file content in UTF-8
+        file_format: str -> "csv" or "ndjson"
+    return:
+        list of raw rows, CSV category_uuids are split by ";"
+    """
+    text = content.decode("utf-8-sig")
+
+    if file_format == "ndjson":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        row = {name: value for name, value in row.items() if value not in ("", None)}
+        category_uuids = row.pop("category_uuids", "")
+        row["category_uuids"] = [
+            category_uuid.strip()
+            for category_uuid in category_uuids.split(";")
+            if category_uuid.strip()
+        ]
+        rows.append(row)
+    return rows
+
+
+def encode_value(value):
+    """
+    JSON encoder for the column types json.dumps does not know
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_json(payload) -> RawResponse:
+    """
+    Serialize a payload read from Postgres once, so the cached bytes are sent
+    as they are
+    """
+    return RawResponse(content=json.dumps(payload, default=encode_value).encode())
+
+
+class ProductsService:
+    async def get_all_products(
+        self,
+        page: Optional[int] = None,
+        quantity: Optional[int] = None,
+        category_uuid: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> RawResponse:
+        params = {"page": page, "quantity": quantity, "category_uuid": category_uuid}
+
+        async def load() -> tuple[RawResponse, set]:
+            if config.CATALOG_PRODUCT_ALL_SOURCE == NATIVE_SOURCE:
+                products = await self.select_products(
+                    page=page, quantity=quantity, category_uuid=category_uuid
+                )
+                return self.price_page(products, category_uuid)
+
+            products = await client.get_raw(
+                path=ALL_PRODUCTS_PATH,
+                params=params,
+                timeout=config.PRODUCT_API_READ_TIMEOUT,
+            )
+            return self.price_page(products.json(), category_uuid, products.headers)
+
+        # expired pages are served stale while they are refreshed
+        page = await catalog_cache.get_or_load(
+            make_key(ALL_PRODUCTS_PATH, params), load
+        )
+        return self.filter_products_page(page, min_price, max_price, sort)
+
+    async def get_products_page(
+        self,
+        cursor: Optional[str] = None,
+        quantity: Optional[int] = None,
+        category_uuid: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> RawResponse:
+        """
+        Keyset page of products read from Postgres, the cost of a page does
+        not grow with its depth and inserted items do not shift the pages.
+        The upstream API only pages by offset, so cursor pages are read from
+        Postgres whatever CATALOG_PRODUCT_ALL_SOURCE says
+        args:
+            cursor: str -> next_cursor of the previous page, None for the first
+            quantity: int -> products per page
+            category_uuid: str -> only products of this category
+            min_price: float -> lowest effective_price kept in the page
+            max_price: float -> highest effective_price kept in the page
+            sort: str -> price_asc or price_desc to sort the page, the
+                    cursor still follows the keyset order
+        return:
+            JSON with the items and the next_cursor, None on the last page
+        """
+        params = {
+            "cursor": cursor or "",
+            "quantity": quantity,
+            "category_uuid": category_uuid,
+        }
+
+        async def load() -> tuple[RawResponse, set]:
+            page = await self.select_products_after(
+                cursor=cursor, quantity=quantity, category_uuid=category_uuid
+            )
+            return self.price_page(page, category_uuid)
+
+        page = await catalog_cache.get_or_load(
+            make_key(ALL_PRODUCTS_PATH, params), load
+        )
+        return self.filter_products_page(page, min_price, max_price, sort)
+
+    def filter_products_page(
+        self,
+        page: RawResponse,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> RawResponse:
+        """
+        Keep the items of a cached page within a range of effective prices and
+        sort them by it, in memory on the current page. The filters apply to
+        the items of one page: a page may come back with fewer items or none,
+        and the order is not kept across pages
+        args:
+            page: RawResponse -> cached page of get_all_products or
+                    get_products_page
+            min_price: float -> lowest effective_price kept
+            max_price: float -> highest effective_price kept
+            sort: str -> price_asc or price_desc, the items without a price
+                    go last
+        return:
+            JSON of the page with the items kept
+        """
+        if min_price is None and max_price is None and sort is None:
+            return page
+
+        payload = page.json()
+        items = page_items(payload)
+        if items is None:
+            return page
+
+        if min_price is not None or max_price is not None:
+            items = [
+                item
+                for item in items
+                if item["effective_price"] is not None
+                and (min_price is None or item["effective_price"] >= min_price)
+                and (max_price is None or item["effective_price"] <= max_price)
+            ]
+        if sort:
+            priced = [item for item in items if item["effective_price"] is not None]
+            priced.sort(
+                key=lambda item: item["effective_price"], reverse=PRICE_SORTS[sort]
+            )
+            items = priced + [item for item in items if item["effective_price"] is None]
+
+        if isinstance(payload, dict):
+            payload["items"] = items
+        else:
+            payload = items
+        return encode_json(payload)
+
+    def price_page(
+        self, payload, category_uuid: Optional[str], headers: Optional[dict] = None
+    ) -> tuple[RawResponse, set]:
+        """
+        Add the effective_price of the items of a listing page, computed once
+        for the whole page when it is cached
+        args:
+            payload: list | dict -> page of products
+            category_uuid: str -> category of the page
+            headers: dict -> headers of the upstream response kept on the page
+        return:
+            tuple with the JSON of the page and its tags
+        """
+        items = page_items(payload)
+        tags = price_change_tags(items) if items is not None else set()
+        products = encode_json(payload)
+        if headers:
+            products.headers = headers
+        return products, self.list_tags(products, category_uuid) | tags
+
+    def list_tags(self, products: RawResponse, category_uuid: Optional[str]) -> set:
+        tags = collect_tags(products.content, CATALOG_TAG_FIELDS)
+        tags.add(PRODUCT_LIST_TAG)
+        if category_uuid:
+            tags.add(("category_uuid", category_uuid))
+        return tags
+
+    async def get_product(self, item_uuid: Optional[str] = None) -> RawResponse:
+        params = {"item_uuid": item_uuid}
+
+        async def load() -> tuple[RawResponse, set]:
+            if config.CATALOG_PRODUCT_SOURCE == NATIVE_SOURCE:
+                product = encode_json(await self.select_product(item_uuid=item_uuid))
+            else:
+                product = await client.get_raw(
+                    path=PRODUCT_PATH,
+                    params=params,
+                    timeout=config.PRODUCT_API_READ_TIMEOUT,
+                )
+            return product, self.product_tags(item_uuid, product)
+
+        return await catalog_cache.get_or_load(make_key(PRODUCT_PATH, params), load)
+
+    def product_tags(self, item_uuid: Optional[str], product: RawResponse) -> set:
+        tags = collect_tags(product.content, CATALOG_TAG_FIELDS)
+        if item_uuid:
+            tags.add(("item_uuid", item_uuid))
+        return tags
+
+    def cache_product(self, item_uuid: Optional[str], product: RawResponse):
+        catalog_cache.set(
+            make_key(PRODUCT_PATH, {"item_uuid": item_uuid}),
+            product,
+            tags=self.product_tags(item_uuid, product),
+        )
+
+    async def get_products_by_uuid(self, item_uuids: list[str]) -> list[dict]:
+        """
+        Look up many products at once, repeated uuids are fetched once, cached
+        products are served from the cache and the rest are fetched together
+        args:
+            item_uuids: list[str] -> uuids of the products
+        return:
+            per uuid status with the product or the error, in the input order
+        """
+        unique_uuids = list(dict.fromkeys(item_uuids))
+        found: dict[str, dict] = {}
+        for item_uuid in unique_uuids:
+            product = catalog_cache.get(
+                make_key(PRODUCT_PATH, {"item_uuid": item_uuid})
+            )
+            if product is not None:
+                found[item_uuid] = product.json()
+        pending = [item_uuid for item_uuid in unique_uuids if item_uuid not in found]
+
+        errors: dict[str, Exception] = {}
+        if pending and config.CATALOG_PRODUCT_SOURCE == NATIVE_SOURCE:
+            for product in await self.select_products_by_uuid(pending):
+                found[product["item_uuid"]] = product
+                self.cache_product(product["item_uuid"], encode_json(product))
+        elif pending:
+            outcomes = await gather_limited(
+                self.get_product, pending, config.BATCH_CONCURRENCY
+            )
+            for item_uuid, outcome in zip(pending, outcomes):
+                if isinstance(outcome, Exception):
+                    errors[item_uuid] = outcome
+                else:
+                    found[item_uuid] = outcome.json()
+
+        not_found = HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
+        results = batch_results(
+            [
+                (
+                    found[item_uuid]
+                    if item_uuid in found
+                    else errors.get(item_uuid, not_found)
+                )
+                for item_uuid in item_uuids
+            ]
+        )
+        for item_uuid, result in zip(item_uuids, results):
+            result["item_uuid"] = item_uuid
+
+        return results
+
+    def search_products(
+        self,
+        query: str,
+        category_uuid: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """
+        Search the products by the words of their name or of their categories,
+        accepting prefixes and typos
+        args:
+            query: str -> words to search
+            category_uuid: str -> only products of this category
+            limit: int -> max products returned
+        return:
+            list of products from the best match to the worst
+        """
+        limit = min(limit or config.SEARCH_RESULTS_LIMIT, config.SEARCH_MAX_RESULTS)
+        products = []
+        for document in product_index.search(query, category_uuid, limit):
+            product = dict(document)
+            product["categories"] = [
+                {
+                    "category_uuid": category_uuid,
+                    "category_name": product_index.category_names.get(category_uuid),
+                }
+                for category_uuid in product_index.get_categories(document["item_uuid"])
+            ]
+            products.append(product)
+        apply_effective_prices(products, date.today(), config.PRICE_OFF_MODE)
+        return products
+
+    async def select_products(
+        self,
+        page: Optional[int] = None,
+        quantity: Optional[int] = None,
+        category_uuid: Optional[str] = None,
+    ) -> list[dict]:
+        """
+        Read a page of products from Postgres, ordered by item_id
+        args:
+            page: int -> page number starting at 1
+            quantity: int -> products per page
+            category_uuid: str -> only products of this category
+        return:
+            list of products with their categories
+        """
+        quantity = min(
+            quantity or config.CATALOG_PAGE_SIZE, config.CATALOG_MAX_PAGE_SIZE
+        )
+        offset = (max(page or 1, 1) - 1) * quantity
+
+        params = {
+            "category_uuid": category_uuid,
+            "quantity": quantity,
+            "offset": offset,
+        }
+
+        # the page of item_ids comes from the membership index, no join needed
+        if category_uuid and config.CATEGORY_ITEMS_ENABLED:
+            if category_items.is_stale(category_uuid):
+                await refresh_category_items(category_uuid)
+            item_ids = category_items.page(category_uuid, offset, quantity)
+            if not item_ids:
+                return []
+
+            query = f"""
+                SELECT  {PRODUCT_COLUMNS}
+                FROM store.item i
+                WHERE i.item_id = ANY(%s)
+                ORDER BY i.item_id
+            """
+            return await fetch_all(query, (item_ids,))
+
+        # separate statements so each one keeps an index-backed plan when prepared
+        if category_uuid:
+            query = f"""
+                SELECT  {PRODUCT_COLUMNS}
+                FROM store.item i
+                JOIN store.item_has_category ihc ON ihc.item_id = i.item_id
+                JOIN store.category c ON c.category_id = ihc.category_id
+                WHERE c.category_uuid = %(category_uuid)s
+                ORDER BY i.item_id
+                LIMIT %(quantity)s OFFSET %(offset)s
+            """
+        else:
+            query = f"""
+                SELECT  {PRODUCT_COLUMNS}
+                FROM store.item i
+                ORDER BY i.item_id
+                LIMIT %(quantity)s OFFSET %(offset)s
+            """
+
+        return await fetch_all(query, params)
+
+    async def select_products_after(
+        self,
+        cursor: Optional[str] = None,
+        quantity: Optional[int] = None,
+        category_uuid: Optional[str] = None,
+    ) -> dict:
+        """
+        Read the products after a cursor from Postgres, ordered by
+        (item_created_at, item_id)
+        args:
+            cursor: str -> next_cursor of the previous page, None for the first
+            quantity: int -> products per page
+            category_uuid: str -> only products of this category
+        return:
+            dict with the items and the next_cursor
+        """
+        quantity = min(
+            quantity or config.CATALOG_PAGE_SIZE, config.CATALOG_MAX_PAGE_SIZE
+        )
+        params = {"category_uuid": category_uuid, "quantity": quantity + 1}
+
+        conditions = []
+        if cursor:
+            params["created_at"], params["item_id"] = decode_cursor(cursor)
+            conditions.append(
+                "(i.item_created_at, i.item_id) > (%(created_at)s, %(item_id)s)"
+            )
+        joins = ""
+        if category_uuid:
+            joins = """
+                JOIN store.item_has_category ihc ON ihc.item_id = i.item_id
+                JOIN store.category c ON c.category_id = ihc.category_id
+            """
+            conditions.append("c.category_uuid = %(category_uuid)s")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # one extra row tells if there is a next page
+        query = f"""
+            SELECT  i.item_id AS cursor_item_id,
+                    {PRODUCT_COLUMNS}
+            FROM store.item i
+            {joins}
+            {where}
+            ORDER BY i.item_created_at, i.item_id
+            LIMIT %(quantity)s
+        """
+        items = await fetch_all(query, params)
+
+        next_cursor = None
+        if len(items) > quantity:
+            items = items[:quantity]
+            next_cursor = encode_cursor(
+                items[-1]["item_created_at"], items[-1]["cursor_item_id"]
+            )
+        for item in items:
+            del item["cursor_item_id"]
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def select_products_by_uuid(self, item_uuids: list[str]) -> list[dict]:
+        """
+        Read many products from Postgres in one query
+        args:
+            item_uuids: list[str] -> uuids of the products
+        return:
+            list of the products found, in no particular order
+        """
+        query = f"""
+            SELECT  {PRODUCT_COLUMNS}
+            FROM store.item i
+            WHERE i.item_uuid = ANY(%s)
+        """
+        return await fetch_all(query, (item_uuids,))
+
+    async def select_product(self, item_uuid: Optional[str] = None) -> dict:
+        """
+        Read one product from Postgres by its uuid
+        args:
+            item_uuid: str -> uuid of the product
+        return:
+            product with its categories
+        """
+        query = f"""
+            SELECT  {PRODUCT_COLUMNS}
+            FROM store.item i
+            WHERE i.item_uuid = %s
+        """
+        products = await fetch_all(query, (item_uuid,))
+
+        if not products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found",
+            )
+
+        return products[0]
+
+    async def export_products(
+        self, updated_since: Optional[datetime] = None, compress: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream every product as NDJSON from a server-side cursor, only one batch
+        of rows is held in memory at a time
+        args:
+            updated_since: datetime -> only products updated after this date
+            compress: bool -> gzip the stream
+        return:
+            async iterator of NDJSON chunks
+        """
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+        where = "WHERE i.item_updated_at > %(updated_since)s" if updated_since else ""
+        query = f"""
+            SELECT  {PRODUCT_COLUMNS}
+            FROM store.item i
+            {where}
+            ORDER BY i.item_id
+        """
+
+        async with connection() as database:
+            # named cursors live inside a transaction
+            async with database.transaction():
+                cursor = database.cursor(name="catalog_export")
+                await cursor.execute(query, {"updated_since": updated_since})
+
+                while rows := await cursor.fetchmany(config.CATALOG_EXPORT_BATCH_SIZE):
+                    chunk = "".join(
+                        json.dumps(row, default=encode_value) + "\n" for row in rows
+                    ).encode()
+                    if compressor:
+                        chunk = compressor.compress(chunk)
+                    if chunk:
+                        yield chunk
+
+                await cursor.close()
+
+        if compressor:
+            yield compressor.flush()
+
+    def start_import(self, content: bytes, file_format: str) -> ImportJob:
+        """
+        Register an import job and run it in the background
+        args:
+            content: bytes -> CSV or NDJSON file content
+            file_format: str -> "csv" or "ndjson"
+        return:
+            the pending job, poll get_import_job for its progress
+        """
+        job = ImportJob(job_id=str(uuid.uuid4()), created_at=datetime.now(timezone.utc))
+        import_jobs[job.job_id] = job
+        while len(import_jobs) > config.CATALOG_IMPORT_MAX_JOBS:
+            import_jobs.popitem(last=False)
+
+        task = asyncio.create_task(self.import_products(job, content, file_format))
+        import_tasks.add(task)
+        task.add_done_callback(import_tasks.discard)
+        return job
+
+    def get_import_job(self, job_id: str) -> ImportJob:
+        job = import_jobs.get(job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Import job not found",
+            )
+        return job
+
+    async def import_products(self, job: ImportJob, content: bytes, file_format: str):
+        """
+        Validate the rows against ProductDTO and load them chunk by chunk,
+        every chunk is one transaction doing a COPY into a staging table and a
+        set based upsert into store.item and store.item_has_category
+        args:
+            job: ImportJob -> job updated with the progress
+            content: bytes -> CSV or NDJSON file content
+            file_format: str -> "csv" or "ndjson"
+        """
+        job.status = "running"
+        try:
+            rows = parse_import_rows(content, file_format)
+        except Exception as exc:
+            job.status = "failed"
+            self.add_import_error(job, 0, f"File not valid: {exc}")
+            job.finished_at = datetime.now(timezone.utc)
+            return
+
+        job.rows_total = len(rows)
+        imported_uuids = set()
+
+        for start in range(0, len(rows), config.CATALOG_IMPORT_CHUNK_SIZE):
+            chunk = rows[start : start + config.CATALOG_IMPORT_CHUNK_SIZE]
+            records = self.validate_import_chunk(job, chunk, first_row=start + 1)
+
+            if records:
+                try:
+                    await self.copy_import_chunk(job, records)
+                    imported_uuids.update(record[1] for record in records)
+                    self.index_import_chunk(records)
+                    mark_categories_stale(
+                        category_uuid
+                        for record in records
+                        for category_uuid in record[-1]
+                    )
+                except Exception as exc:
+                    for record in records:
+                        self.add_import_error(job, record[0], str(exc))
+
+            job.rows_processed += len(chunk)
+            # let other requests run between chunks
+            await asyncio.sleep(0)
+
+        catalog_cache.invalidate_tag(PRODUCT_LIST_TAG)
+        for item_uuid in imported_uuids:
+            catalog_cache.invalidate_tag(("item_uuid", item_uuid))
+
+        job.status = "finished"
+        job.finished_at = datetime.now(timezone.utc)
+
+    def validate_import_chunk(
+        self, job: ImportJob, chunk: list[dict], first_row: int
+    ) -> list[tuple]:
+        """
+        Validate a chunk of raw rows
+        return:
+            list of records in IMPORT_COLUMNS order, one per valid item_uuid
+        """
+        records: dict[str, tuple] = {}
+        for row_number, row in enumerate(chunk, start=first_row):
+            try:
+                product = ProductImportDTO.model_validate(row)
+            except ValidationError as exc:
+                error = "; ".join(
+                    f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+                    for detail in exc.errors()
+                )
+                self.add_import_error(job, row_number, error)
+                continue
+
+            item_uuid = product.item_uuid or str(uuid.uuid4())
+            if item_uuid in records:
+                # an upsert can not touch the same row twice in one statement
+                self.add_import_error(
+                    job, records[item_uuid][0], "Replaced by a later row"
+                )
+            until_date = product.item_price_off_until_date
+            records[item_uuid] = (
+                row_number,
+                item_uuid,
+                product.item_name,
+                product.item_price,
+                product.item_quantity,
+                product.item_image_url,
+                product.item_price_off,
+                until_date.date() if until_date else None,
+                product.category_uuids,
+            )
+        return list(records.values())
+
+    async def copy_import_chunk(self, job: ImportJob, records: list[tuple]):
+        async with connection() as database:
+            async with database.transaction():
+                cursor = database.cursor()
+                await cursor.execute("""
+                    CREATE TEMP TABLE item_import (
+                        row_number integer,
+                        item_uuid character varying(45),
+                        item_name character varying(45),
+                        item_price numeric,
+                        item_quantity integer,
+                        item_image_url character varying(45),
+                        item_price_off numeric,
+                        item_price_off_until_date date,
+                        category_uuids text[]
+                    ) ON COMMIT DROP
+                """)
+
+                async with cursor.copy(
+                    f"COPY item_import ({', '.join(IMPORT_COLUMNS)}) FROM STDIN"
+                ) as copy:
+                    copy.set_types(IMPORT_TYPES)
+                    for record in records:
+                        await copy.write_row(record)
+
+                await cursor.execute("""
+                    INSERT INTO store.item (
+                        item_uuid,
+                        item_name,
+                        item_price,
+                        item_quantity,
+                        item_image_url,
+                        item_price_off,
+                        item_price_off_until_date,
+                        item_created_at,
+                        item_updated_at
+                    )
+                    SELECT  item_uuid,
+                            item_name,
+                            item_price,
+                            item_quantity,
+                            item_image_url,
+                            item_price_off,
+                            item_price_off_until_date,
+                            now(),
+                            now()
+                    FROM item_import
+                    ON CONFLICT (item_uuid) DO UPDATE SET
+                        item_name = EXCLUDED.item_name,
+                        item_price = EXCLUDED.item_price,
+                        item_quantity = EXCLUDED.item_quantity,
+                        item_image_url = EXCLUDED.item_image_url,
+                        item_price_off = EXCLUDED.item_price_off,
+                        item_price_off_until_date = EXCLUDED.item_price_off_until_date,
+                        item_updated_at = now()
+                    RETURNING (xmax = 0) AS inserted
+                """)
+                upserted = await cursor.fetchall()
+                inserted = sum(1 for row in upserted if row["inserted"])
+
+                await cursor.execute("""
+                    SELECT  s.row_number,
+                            u.category_uuid
+                    FROM item_import s
+                    CROSS JOIN LATERAL unnest(s.category_uuids) AS u(category_uuid)
+                    LEFT JOIN store.category c ON c.category_uuid = u.category_uuid
+                    WHERE c.category_id IS NULL
+                """)
+                missing_categories = await cursor.fetchall()
+
+                await cursor.execute("""
+                    INSERT INTO store.item_has_category (item_id, category_id)
+                    SELECT  i.item_id,
+                            c.category_id
+                    FROM item_import s
+                    CROSS JOIN LATERAL unnest(s.category_uuids) AS u(category_uuid)
+                    JOIN store.item i ON i.item_uuid = s.item_uuid
+                    JOIN store.category c ON c.category_uuid = u.category_uuid
+                    ON CONFLICT DO NOTHING
+                """)
+
+        job.rows_inserted += inserted
+        job.rows_updated += len(upserted) - inserted
+        for row in missing_categories:
+            self.add_import_error(
+                job,
+                row["row_number"],
+                f"Category {row['category_uuid']} not found, item imported without it",
+                failed=False,
+            )
+
+    def index_import_chunk(self, records: list[tuple]):
+        """
+        Refresh the imported items in the search index, the import only adds
+        categories so the indexed ones are kept
+        """
+        for record in records:
+            product = dict(zip(IMPORT_COLUMNS, record))
+            category_uuids = set(product_index.get_categories(product["item_uuid"]))
+            category_uuids.update(
+                category_uuid
+                for category_uuid in product["category_uuids"]
+                if category_uuid in product_index.category_names
+            )
+            index_product(product, category_uuids=category_uuids)
+
+    def add_import_error(
+        self, job: ImportJob, row: int, error: str, failed: bool = True
+    ):
+        if failed:
+            job.rows_failed += 1
+        if len(job.errors) < config.CATALOG_IMPORT_MAX_ERRORS:
+            job.errors.append(ImportRowError(row=row, error=error))
+
+    async def create_product(self, body: dict, invalidate: bool = True) -> dict:
+        product = await client.post(
+            path=PRODUCT_PATH, json=body, timeout=config.PRODUCT_API_WRITE_TIMEOUT
+        )
+        # a new item shifts every listing page, single items are unaffected
+        if invalidate:
+            catalog_cache.invalidate_tag(PRODUCT_LIST_TAG)
+        if isinstance(product, dict):
+            index_product({**body, **product})
+
+        return product
+
+    async def update_product(self, body: dict, invalidate: bool = True) -> dict:
+        product = await client.patch(
+            path=PRODUCT_PATH, json=body, timeout=config.PRODUCT_API_WRITE_TIMEOUT
+        )
+        if invalidate:
+            catalog_cache.invalidate_tag(("item_uuid", body.get("item_uuid")))
+        index_product(body)
+
+        return product
+
+    async def delete_product(self, item_uuid: str, invalidate: bool = True) -> dict:
+        product = await client.delete(
+            path=PRODUCT_PATH,
+            params={"item_uuid": item_uuid},
+            timeout=config.PRODUCT_API_WRITE_TIMEOUT,
+        )
+        # removing an item shifts every listing page after it
+        if invalidate:
+            catalog_cache.invalidate_tag(("item_uuid", item_uuid))
+            catalog_cache.invalidate_tag(PRODUCT_LIST_TAG)
+        if product_index.get(item_uuid):
+            mark_categories_stale(product_index.get_categories(item_uuid))
+        else:
+            # the categories of the item are unknown
+            category_items.expire()
+        product_index.remove(item_uuid)
+
+        return product
+
+    async def create_products(self, bodies: list[dict]) -> list[dict]:
+        """
+        Create products on the upstream with bounded concurrency
+        return:
+            per item status, in the order of the bodies
+        """
+        outcomes = await gather_limited(
+            lambda body: self.create_product(body, invalidate=False),
+            bodies,
+            config.BATCH_CONCURRENCY,
+        )
+        if any(not isinstance(outcome, Exception) for outcome in outcomes):
+            catalog_cache.invalidate_tag(PRODUCT_LIST_TAG)
+
+        return batch_results(outcomes)
+
+    async def update_products(self, bodies: list[dict]) -> list[dict]:
+        """
+        Update products on the upstream with bounded concurrency
+        return:
+            per item status, in the order of the bodies
+        """
+        outcomes = await gather_limited(
+            lambda body: self.update_product(body, invalidate=False),
+            bodies,
+            config.BATCH_CONCURRENCY,
+        )
+        for body, outcome in zip(bodies, outcomes):
+            if not isinstance(outcome, Exception):
+                catalog_cache.invalidate_tag(("item_uuid", body.get("item_uuid")))
+
+        return batch_results(outcomes)
+
+    async def delete_products(self, item_uuids: list[str]) -> list[dict]:
+        """
+        Delete products on the upstream with bounded concurrency
+        return:
+            per item status, in the order of the uuids
+        """
+        outcomes = await gather_limited(
+            lambda item_uuid: self.delete_product(item_uuid, invalidate=False),
+            item_uuids,
+            config.BATCH_CONCURRENCY,
+        )
+        deleted = False
+        for item_uuid, outcome in zip(item_uuids, outcomes):
+            if not isinstance(outcome, Exception):
+                catalog_cache.invalidate_tag(("item_uuid", item_uuid))
+                deleted = True
+        if deleted:
+            catalog_cache.invalidate_tag(PRODUCT_LIST_TAG)
+
+        return batch_results(outcomes)
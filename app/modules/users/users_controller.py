@@ -0,0 +1,74 @@
+from typing import Annotated, Optional
+from fastapi import APIRouter, status, Depends, HTTPException, Response
+from fastapi.security import OAuth2PasswordRequestForm
+
+from app.modules.users.users_service import UsersService
+from app.modules.users.users_schema import UserBase
+from app.common.dependencies import get_refresh_customer_user
+from app.core import config
+
+router = APIRouter()
+
+
+def set_token_cookie(response: Response, name: str, token: str, max_age: int):
+    response.set_cookie(
+        name,
+        token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        expires=config.REFRESH_TOKEN_EXPIRE_MINUTES * 100,
+        max_age=max_age,
+    )
+
+
+@router.post("/auth/login", status_code=status.HTTP_200_OK)
+async def login_access(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    users_service: Annotated[UsersService, Depends(UsersService)],
+    response: Response,
+):
+    """
+    Log in a customer, its tokens open the cart and order routes
+    """
+    user: Optional[UserBase] = await users_service.get_active_user_by_form(
+        form_data=form_data
+    )
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+        )
+
+    access_token, refresh_token = users_service.generate_tokens(user)
+    set_token_cookie(
+        response,
+        "Authorization",
+        access_token,
+        config.ACCESS_TOKEN_EXPIRE_MINUTES * 100,
+    )
+    set_token_cookie(
+        response, "Refresh", refresh_token, config.REFRESH_TOKEN_EXPIRE_MINUTES * 100
+    )
+
+    return {"access_token": access_token, "refresh_token": refresh_token}
+
+
+@router.get("/auth/refresh", status_code=status.HTTP_200_OK)
+async def refresh_session(
+    users_service: Annotated[UsersService, Depends(UsersService)],
+    current_user: Annotated[UserBase, Depends(get_refresh_customer_user)],
+    response: Response,
+):
+    new_access_token = users_service.generate_access_token_only(user=current_user)
+
+    response.delete_cookie("Authorization", httponly=True)
+    set_token_cookie(
+        response,
+        "Authorization",
+        new_access_token,
+        config.ACCESS_TOKEN_EXPIRE_MINUTES * 100,
+    )
+
+    return {"access_token": new_access_token}
@@ -0,0 +1,67 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from app.core.crypto import TextCrypto
+from app.core.database import connection
+from app.modules.users.users_schema import UserBase
+
+USER_COLUMNS = """
+    sys_user_id,
+    sys_user_uuid,
+    sys_user_email_aes,
+    sys_user_email_sha,
+    sys_user_password,
+    sys_user_created_at,
+    sys_user_updated_at,
+    sys_user_attempts,
+    sys_user_last_attempt,
+    sys_user_enabled,
+    customer_id
+"""
+
+
+class UsersModel:
+    """
+    Users of the customers, the principals of the cart and order routes
+    """
+
+    async def get_user_by_uuid(self, user_uuid: str) -> Optional[UserBase]:
+        query = f"""
+            SELECT  {USER_COLUMNS}
+            FROM store.sys_user
+            WHERE sys_user_uuid = %s AND sys_user_enabled
+        """
+        return await self.select_user(query, (user_uuid,))
+
+    async def get_user_by_username(self, username: str) -> Optional[UserBase]:
+        username_sha = TextCrypto(plain_text=username).hash_text()
+        query = f"""
+            SELECT  {USER_COLUMNS}
+            FROM store.sys_user
+            WHERE sys_user_email_sha = %s AND sys_user_enabled
+        """
+        return await self.select_user(query, (username_sha,))
+
+    async def select_user(self, query: str, params: tuple) -> Optional[UserBase]:
+        """
+        Read one user, the connection goes back to the pool before the
+        password is checked
+        """
+        try:
+            async with connection() as database:
+                cursor = database.cursor()
+                await cursor.execute(query, params)
+                user = await cursor.fetchone()
+
+        except HTTPException:
+            raise
+
+        except Exception as exc:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="DB is not responding",
+            ) from exc
+
+        if not user:
+            return None
+
+        return UserBase.model_validate(user)
@@ -0,0 +1,10 @@
+from fastapi import FastAPI
+from app.modules.users import users_controller
+
+
+class UsersModule:
+    @staticmethod
+    def register(app: FastAPI):
+        app.include_router(
+            users_controller.router, prefix="/user", tags=["User", "Security"]
+        )
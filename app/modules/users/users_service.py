@@ -0,0 +1,48 @@
+from app.common import dependencies
+from app.core.crypto import crypto_service
+from typing import Annotated, Optional
+from fastapi import Depends
+from fastapi.security import OAuth2PasswordRequestForm
+
+from app.modules.users.users_model import UsersModel
+from app.modules.users.users_schema import UserBase
+from app.core.security import AuthUtils
+from app.core import config
+
+
+class UsersService:
+    def __init__(self, users_model: Annotated[UsersModel, Depends(UsersModel)]):
+        self.__users_model = users_model
+
+    async def get_active_user_by_form(
+        self,
+        form_data: OAuth2PasswordRequestForm,
+        auth_utils: AuthUtils = AuthUtils(),
+    ) -> Optional[UserBase]:
+        return await auth_utils.authenticate_user(
+            username=form_data.username,
+            password=form_data.password,
+            auth_model=self.__users_model,
+        )
+
+    def generate_tokens(self, user: UserBase, dependencies=dependencies):
+        access_token = self.generate_access_token_only(user, dependencies)
+        refresh_token = dependencies.create_refresh_token(
+            data={"sub": user.sys_user_uuid}
+        )
+
+        return access_token, refresh_token
+
+    def generate_access_token_only(
+        self, user: UserBase, dependencies=dependencies
+    ) -> str:
+        """
+        Access token of a customer user, its sub is the sys_user_uuid the cart
+        and order routes resolve the customer with
+        """
+        payload = {
+            "sub": user.sys_user_uuid,
+            "name": user.sys_user_email_aes,
+            "role": crypto_service.encrypt_constant(config.USER_ROLE),
+        }
+        return dependencies.create_access_token(data=payload)
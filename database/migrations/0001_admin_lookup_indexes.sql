@@ -0,0 +1,14 @@
+/* Lookup indexes for the admin and user login and refresh queries */
+CREATE UNIQUE INDEX IF NOT EXISTS sys_admin_user_email_sha_key
+    ON store.sys_admin_user (sys_user_email_sha);
+
+CREATE UNIQUE INDEX IF NOT EXISTS sys_admin_user_uuid_enabled_key
+    ON store.sys_admin_user (sys_user_uuid)
+    WHERE sys_user_enabled;
+
+CREATE UNIQUE INDEX IF NOT EXISTS sys_user_email_sha_key
+    ON store.sys_user (sys_user_email_sha);
+
+CREATE UNIQUE INDEX IF NOT EXISTS sys_user_uuid_enabled_key
+    ON store.sys_user (sys_user_uuid)
+    WHERE sys_user_enabled;
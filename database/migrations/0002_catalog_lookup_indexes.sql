@@ -0,0 +1,16 @@
+/* Lookup indexes for the catalog and customer uuids */
+CREATE UNIQUE INDEX IF NOT EXISTS item_uuid_key
+    ON store.item (item_uuid);
+
+CREATE UNIQUE INDEX IF NOT EXISTS category_uuid_key
+    ON store.category (category_uuid);
+
+CREATE UNIQUE INDEX IF NOT EXISTS customer_uuid_key
+    ON store.customer (customer_uuid);
+
+CREATE INDEX IF NOT EXISTS customer_name_sha_idx
+    ON store.customer (customer_name_sha);
+
+/* item_has_category primary key (item_id, category_id) already covers item_id */
+CREATE INDEX IF NOT EXISTS item_has_category_category_idx
+    ON store.item_has_category (category_id, item_id);
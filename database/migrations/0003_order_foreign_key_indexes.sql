@@ -0,0 +1,19 @@
+/* Indexes for the foreign keys of orders and purchase history */
+CREATE INDEX IF NOT EXISTS orders_item_idx
+    ON store.orders (item_id);
+
+CREATE INDEX IF NOT EXISTS orders_customer_idx
+    ON store.orders (customer_id);
+
+CREATE INDEX IF NOT EXISTS orders_order_status_idx
+    ON store.orders (order_status_id);
+
+CREATE INDEX IF NOT EXISTS orders_card_idx
+    ON store.orders (card_id, customer_id);
+
+CREATE INDEX IF NOT EXISTS orders_payment_method_idx
+    ON store.orders (payment_method_id);
+
+/* customers_items primary key (customer_id, item_id) already covers customer_id */
+CREATE INDEX IF NOT EXISTS customers_items_item_idx
+    ON store.customers_items (item_id);
@@ -0,0 +1,3 @@
+/* Keyset pagination of the catalog by creation date */
+CREATE INDEX IF NOT EXISTS item_created_at_id_idx
+    ON store.item (item_created_at, item_id);
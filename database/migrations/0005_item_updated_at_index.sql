@@ -0,0 +1,3 @@
+/* Incremental catalog exports by update date */
+CREATE INDEX IF NOT EXISTS item_updated_at_idx
+    ON store.item (item_updated_at);
@@ -0,0 +1,9 @@
+/* Cart lines written behind by the in-process cart store */
+CREATE TABLE IF NOT EXISTS store.cart_item
+(
+    cart_uuid character varying(45) COLLATE pg_catalog."default" NOT NULL,
+    item_uuid character varying(45) COLLATE pg_catalog."default" NOT NULL,
+    cart_item_quantity integer NOT NULL,
+    cart_item_updated_at timestamp without time zone NOT NULL DEFAULT now(),
+    CONSTRAINT cart_item_pkey PRIMARY KEY (cart_uuid, item_uuid)
+);
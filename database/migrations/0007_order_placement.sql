@@ -0,0 +1,16 @@
+/* Quantity of every order line and the stored results of idempotent order requests */
+ALTER TABLE store.orders
+    ADD COLUMN IF NOT EXISTS order_item_quantity integer NOT NULL DEFAULT 1;
+
+CREATE INDEX IF NOT EXISTS orders_order_uuid_idx
+    ON store.orders (order_uuid);
+
+CREATE TABLE IF NOT EXISTS store.idempotency_key
+(
+    idempotency_key character varying(128) COLLATE pg_catalog."default" NOT NULL,
+    user_uuid character varying(45) COLLATE pg_catalog."default" NOT NULL,
+    request_hash character varying(64) COLLATE pg_catalog."default" NOT NULL,
+    response jsonb,
+    created_at timestamp without time zone NOT NULL DEFAULT now(),
+    CONSTRAINT idempotency_key_pkey PRIMARY KEY (user_uuid, idempotency_key)
+);
@@ -0,0 +1,7 @@
+/* Order lines placed on reservations whose stock is not taken from the items yet */
+ALTER TABLE store.orders
+    ADD COLUMN IF NOT EXISTS order_stock_applied boolean NOT NULL DEFAULT true;
+
+CREATE INDEX IF NOT EXISTS orders_stock_pending_idx
+    ON store.orders (item_id)
+    WHERE NOT order_stock_applied;
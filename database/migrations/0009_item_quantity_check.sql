@@ -0,0 +1,3 @@
+/* The stock of an item never goes below zero, whatever path takes it */
+ALTER TABLE store.item
+    ADD CONSTRAINT item_quantity_not_negative CHECK (item_quantity >= 0);
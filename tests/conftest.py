@@ -0,0 +1,46 @@
+import base64
+import itertools
+import os
+import tempfile
+
+import httpx
+import pytest
+
+# app.core.config reads these at import, the tests never reach the services
+os.environ.setdefault("DATABASE_URI", "postgresql://store@localhost/store")
+os.environ.setdefault("API_PRODUCT_URI", "http://upstream.test")
+os.environ.setdefault("CRYPTO_AES_SECRET_KEY", base64.b64encode(b"k" * 32).decode())
+os.environ.setdefault("CRYPTO_VI_SECRET_KEY", base64.b64encode(b"i" * 16).decode())
+os.environ.setdefault("JWT_ISSUER", "store-api-ux")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_SECRET_KEY", "access")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "15")
+os.environ.setdefault("JWT_REFRESH_TOKEN_SECRET_KEY", "refresh")
+os.environ.setdefault("JWT_REFRESH_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("JWT_VERIFY_TOKEN_SECRET_KEY", "verify")
+os.environ.setdefault("JWT_VERIFY_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("JWT_ADMIN_ROLE", "admin")
+os.environ.setdefault("JWT_USER_ROLE", "user")
+os.environ.setdefault("CART_LOG_PATH", os.path.join(tempfile.mkdtemp(), "cart.log"))
+
+from app.core.http_request import Client  # noqa: E402
+
+upstream_ids = itertools.count()
+
+
+@pytest.fixture
+def make_client():
+    """
+    Build a Client whose upstream is a stand-in handler, every client gets its
+    own base_url so it does not share a circuit breaker with the others
+    """
+
+    def make(handler, **kwargs) -> Client:
+        base_url = f"http://upstream-{next(upstream_ids)}.test"
+        client = Client(base_url=base_url, timeout=5, **kwargs)
+        client._Client__client = httpx.AsyncClient(
+            base_url=base_url, transport=httpx.MockTransport(handler)
+        )
+        return client
+
+    return make
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import random
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.common.utils import batch_results, check_batch_size, gather_limited
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.membership import MembershipIndex
+from app.core.search import SearchIndex
+from app.modules.products import products_service
+from app.modules.products.products_service import PRODUCT_LIST_TAG, ProductsService
+
+MISSING = {"item-1", "item-4"}
+
+
+def test_gather_limited_keeps_the_order_under_the_limit():
+    running = 0
+    most_running = 0
+    randomizer = random.Random(3)
+    delays = [randomizer.random() / 100 for _ in range(30)]
+
+    async def work(index: int) -> int:
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(delays[index])
+        running -= 1
+        if index % 7 == 0:
+            raise ValueError(index)
+        return index * 2
+
+    outcomes = asyncio.run(gather_limited(work, range(30), limit=4))
+
+    assert most_running == 4
+    for index, outcome in enumerate(outcomes):
+        if index % 7 == 0:
+            assert isinstance(outcome, ValueError)
+        else:
+            assert outcome == index * 2
+
+
+def test_batch_results_reports_every_item():
+    outcomes = [
+        {"item_uuid": "a"},
+        HTTPException(status_code=404, detail="Product not found"),
+        RuntimeError("connection reset"),
+        None,
+    ]
+
+    assert batch_results(outcomes) == [
+        {"index": 0, "status_code": 200, "result": {"item_uuid": "a"}},
+        {"index": 1, "status_code": 404, "detail": "Product not found"},
+        # the message of an unexpected error is not sent to the client
+        {"index": 2, "status_code": 500, "detail": "Unexpected error"},
+        {"index": 3, "status_code": 200, "result": None},
+    ]
+
+
+def test_batch_bigger_than_the_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_ITEMS", 3)
+    check_batch_size([1, 2, 3])
+
+    with pytest.raises(HTTPException) as error:
+        check_batch_size([1, 2, 3, 4])
+    assert error.value.status_code == 413
+
+
+@pytest.fixture
+def catalog(make_client, monkeypatch):
+    """
+    Upstream answering product writes, the items of MISSING do not exist
+    """
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        if request.method == "DELETE":
+            item_uuid = request.url.params["item_uuid"]
+        else:
+            item_uuid = json.loads(request.content)["item_uuid"]
+        calls.append((request.method, item_uuid))
+        if item_uuid in MISSING:
+            return httpx.Response(404, json={"detail": f"{item_uuid} not found"})
+        return httpx.Response(200, json={"item_uuid": item_uuid})
+
+    cache = TTLCache(ttl=60, max_entries=100)
+    for index in range(6):
+        cache.set(f"item-{index}", index, tags={("item_uuid", f"item-{index}")})
+    cache.set("page", "page", tags={PRODUCT_LIST_TAG})
+
+    monkeypatch.setattr(products_service, "client", make_client(upstream))
+    monkeypatch.setattr(products_service, "catalog_cache", cache)
+    monkeypatch.setattr(products_service, "product_index", SearchIndex())
+    monkeypatch.setattr(products_service, "category_items", MembershipIndex())
+    monkeypatch.setattr(config, "BATCH_CONCURRENCY", 2)
+    return cache, calls
+
+
+def test_update_batch_with_missing_items(catalog):
+    cache, calls = catalog
+    bodies = [{"item_uuid": f"item-{index}", "item_price": 5} for index in range(6)]
+
+    results = asyncio.run(ProductsService().update_products(bodies))
+
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["status_code"] for result in results] == [
+        200,
+        404,
+        200,
+        200,
+        404,
+        200,
+    ]
+    assert results[1]["detail"] == {"detail": "item-1 not found"}
+    assert results[2]["result"] == {"item_uuid": "item-2"}
+    assert len(calls) == 6
+    # only the updated items are dropped from the cache, the pages stay
+    assert [cache.get(f"item-{index}") for index in range(6)] == [
+        None,
+        1,
+        None,
+        None,
+        4,
+        None,
+    ]
+    assert cache.get("page") == "page"
+
+
+def test_delete_batch_with_missing_items(catalog):
+    cache, calls = catalog
+    item_uuids = ["item-4", "item-0", "item-1"]
+
+    results = asyncio.run(ProductsService().delete_products(item_uuids))
+
+    assert [result["status_code"] for result in results] == [404, 200, 404]
+    assert cache.get("item-0") is None
+    assert cache.get("item-4") == 4
+    assert cache.get("page") is None
+
+
+def test_failed_batch_keeps_the_listing_pages(catalog):
+    cache, calls = catalog
+
+    results = asyncio.run(ProductsService().delete_products(sorted(MISSING)))
+
+    assert {result["status_code"] for result in results} == {404}
+    assert cache.get("page") == "page"
@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.modules.products import products_service
+from app.modules.products.products_service import (
+    NATIVE_SOURCE,
+    ProductsService,
+    encode_json,
+)
+
+STORED = {"item-a", "item-b", "item-c"}
+
+
+def make_product(item_uuid: str) -> dict:
+    return {"item_uuid": item_uuid, "item_name": item_uuid.title(), "categories": []}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = TTLCache(ttl=60, max_entries=100)
+    monkeypatch.setattr(products_service, "catalog_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def table(cache, monkeypatch):
+    """
+    Stand-in for select_products_by_uuid over the items of STORED
+    """
+    reads = []
+
+    async def select_products_by_uuid(item_uuids):
+        reads.append(list(item_uuids))
+        return [
+            make_product(item_uuid) for item_uuid in item_uuids if item_uuid in STORED
+        ]
+
+    monkeypatch.setattr(
+        ProductsService,
+        "select_products_by_uuid",
+        staticmethod(select_products_by_uuid),
+    )
+    monkeypatch.setattr(config, "CATALOG_PRODUCT_SOURCE", NATIVE_SOURCE)
+    return reads
+
+
+def lookup(item_uuids: list[str]) -> list[dict]:
+    return asyncio.run(ProductsService().get_products_by_uuid(item_uuids))
+
+
+def test_results_follow_the_input_order(table):
+    item_uuids = ["item-c", "item-x", "item-a", "item-c"]
+
+    results = lookup(item_uuids)
+
+    assert [result["item_uuid"] for result in results] == item_uuids
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert [result["status_code"] for result in results] == [200, 404, 200, 200]
+    assert results[0]["result"] == make_product("item-c")
+    assert results[1]["detail"] == "Product not found"
+    assert results[3]["result"] == results[0]["result"]
+
+
+def test_repeated_uuids_are_read_once_in_one_query(table):
+    lookup(["item-a", "item-b", "item-a", "item-b", "item-x"])
+
+    assert table == [["item-a", "item-b", "item-x"]]
+
+
+def test_cached_products_are_not_read_again(table, cache):
+    lookup(["item-a", "item-b"])
+    results = lookup(["item-b", "item-c", "item-a"])
+
+    # only the product missing from the cache reaches Postgres
+    assert table == [["item-a", "item-b"], ["item-c"]]
+    assert [result["result"]["item_uuid"] for result in results] == [
+        "item-b",
+        "item-c",
+        "item-a",
+    ]
+
+
+def test_cached_lookup_serves_the_single_product_route(table, cache):
+    lookup(["item-a"])
+
+    product = asyncio.run(ProductsService().get_product(item_uuid="item-a"))
+
+    assert product.json() == make_product("item-a")
+    assert table == [["item-a"]]
+
+
+def test_upstream_misses_and_errors_are_per_item(cache, make_client, monkeypatch):
+    requested = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        item_uuid = request.url.params["item_uuid"]
+        requested.append(item_uuid)
+        if item_uuid == "item-x":
+            return httpx.Response(404, json={"detail": "Product not found"})
+        if item_uuid == "item-bad":
+            return httpx.Response(422, json={"detail": "Invalid uuid"})
+        return httpx.Response(200, content=encode_json(make_product(item_uuid)).content)
+
+    monkeypatch.setattr(products_service, "client", make_client(upstream))
+    monkeypatch.setattr(config, "CATALOG_PRODUCT_SOURCE", "upstream")
+
+    results = lookup(["item-x", "item-a", "item-bad", "item-a"])
+
+    assert sorted(requested) == ["item-a", "item-bad", "item-x"]
+    assert [result["status_code"] for result in results] == [404, 200, 422, 200]
+    assert results[2]["detail"] == {"detail": "Invalid uuid"}
+    assert results[1]["result"] == make_product("item-a")
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.cache import TTLCache, make_key
+
+
+class Source:
+    """
+    Stand-in for the upstream, each load returns the current version of the
+    value after a delay
+    """
+
+    def __init__(self, tags=("product",), delay: float = 0.0):
+        self.version = 1
+        self.tags = set(tags)
+        self.delay = delay
+        self.loads = 0
+        self.error = None
+
+    async def __call__(self):
+        self.loads += 1
+        version = self.version
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"v{version}", self.tags
+
+
+def test_make_key_ignores_the_order_and_empty_params():
+    assert make_key("/product/all", {"page": 1, "quantity": 10}) == make_key(
+        "/product/all", {"quantity": 10, "page": 1, "category_uuid": None}
+    )
+    assert make_key("/product/all", {"page": 1}) != make_key(
+        "/product/all", {"page": 2}
+    )
+
+
+def test_hits_misses_and_lru_bound():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    # b is the least recently used
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_tag_removes_only_the_tagged_entries():
+    cache = TTLCache(ttl=60, max_entries=10)
+    cache.set("page", 1, tags={"list", ("item_uuid", "a")})
+    cache.set("item-a", 2, tags={("item_uuid", "a")})
+    cache.set("item-b", 3, tags={("item_uuid", "b")})
+
+    assert cache.invalidate_tag(("item_uuid", "a")) == 2
+    assert cache.get("page") is None
+    assert cache.get("item-a") is None
+    assert cache.get("item-b") == 3
+    assert cache.invalidate_tag("list") == 0
+
+
+def test_invalidation_during_a_load_drops_the_value():
+    cache = TTLCache(ttl=60, max_entries=10)
+    source = Source(delay=0.02)
+
+    async def scenario():
+        load = asyncio.create_task(cache.get_or_load("page", source))
+        await asyncio.sleep(0.01)
+        # the write lands while the old value is read
+        source.version = 2
+        cache.invalidate_tag("product")
+        first = await load
+        return first, await cache.get_or_load("page", source)
+
+    first, second = asyncio.run(scenario())
+
+    assert first == "v1"
+    assert second == "v2"
+    assert source.loads == 2
+
+
+def test_invalidation_of_another_tag_keeps_the_value():
+    cache = TTLCache(ttl=60, max_entries=10)
+    source = Source(delay=0.02)
+
+    async def scenario():
+        load = asyncio.create_task(cache.get_or_load("page", source))
+        await asyncio.sleep(0.01)
+        cache.invalidate_tag("category")
+        await load
+        return await cache.get_or_load("page", source)
+
+    assert asyncio.run(scenario()) == "v1"
+    assert source.loads == 1
+
+
+def test_clear_during_a_load_drops_the_value():
+    cache = TTLCache(ttl=60, max_entries=10)
+    source = Source(delay=0.02)
+
+    async def scenario():
+        load = asyncio.create_task(cache.get_or_load("page", source))
+        await asyncio.sleep(0.01)
+        cache.clear()
+        await load
+
+    asyncio.run(scenario())
+    assert cache.get("page") is None
+
+
+def test_expired_entry_is_served_stale_while_it_is_refreshed():
+    cache = TTLCache(ttl=0.02, max_entries=10, stale_while_revalidate=60)
+    source = Source()
+
+    async def scenario():
+        await cache.get_or_load("page", source)
+        await asyncio.sleep(0.03)
+        source.version = 2
+        stale = await cache.get_or_load("page", source)
+        await asyncio.sleep(0.01)
+        return stale, cache.get("page")
+
+    stale, refreshed = asyncio.run(scenario())
+
+    assert stale == "v1"
+    assert refreshed == "v2"
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_invalidation_during_a_refresh_drops_the_value():
+    cache = TTLCache(ttl=0.02, max_entries=10, stale_while_revalidate=60)
+    source = Source()
+
+    async def scenario():
+        await cache.get_or_load("page", source)
+        await asyncio.sleep(0.03)
+        source.delay = 0.02
+        await cache.get_or_load("page", source)
+        await asyncio.sleep(0.01)
+        cache.invalidate_tag("product")
+        await asyncio.sleep(0.02)
+
+    asyncio.run(scenario())
+    assert cache.get("page") is None
+    assert cache.stats()["refreshes"] == 0
+
+
+def test_stale_if_error_only_covers_server_errors():
+    cache = TTLCache(ttl=0.02, max_entries=10, stale_if_error=60)
+    source = Source()
+
+    async def scenario():
+        await cache.get_or_load("page", source)
+        await asyncio.sleep(0.03)
+        source.error = HTTPException(status_code=502, detail="Bad gateway")
+        stale = await cache.get_or_load("page", source)
+        source.error = HTTPException(status_code=404, detail="Not found")
+        with pytest.raises(HTTPException):
+            await cache.get_or_load("page", source)
+        return stale
+
+    assert asyncio.run(scenario()) == "v1"
+    assert cache.stats()["stale_errors"] == 1
+
+
+def test_hot_entries_are_refreshed_before_they_expire():
+    cache = TTLCache(ttl=60, max_entries=10, stale_while_revalidate=60)
+    hot, cold = Source(tags=("hot",)), Source(tags=("cold",))
+
+    async def scenario():
+        await cache.get_or_load("hot", hot)
+        await cache.get_or_load("cold", cold)
+        for _ in range(3):
+            cache.get("hot")
+        cache.get("cold")
+        hot.version = cold.version = 2
+
+        started = cache.refresh_hot(top=1, horizon=120)
+        await asyncio.sleep(0.01)
+        return started
+
+    assert asyncio.run(scenario()) == 1
+    assert cache.get("hot") == "v2"
+    assert cache.get("cold") == "v1"
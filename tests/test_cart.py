@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.write_log import AppendLog
+from app.modules.cart import cart_service
+from app.modules.cart.cart_service import CartService, CartStore, cart_owners
+from app.modules.orders.orders_schema import OrderItemDTO
+from app.modules.orders.orders_service import ReservationsService
+
+CARTS = {"user-a": "cart-a", "user-b": "cart-b"}
+
+
+class FakeCartModel:
+    """
+    Stand-in for CartModel, the customers own the carts of CARTS
+    """
+
+    def __init__(self):
+        self.owner_lookups = 0
+        self.written: list[dict] = []
+
+    async def select_customer_cart(self, user_uuid: str):
+        self.owner_lookups += 1
+        return CARTS.get(user_uuid)
+
+    async def select_cart(self, cart_uuid: str) -> dict:
+        return {}
+
+    async def write_changes(self, changes: dict):
+        self.written.append(changes)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = CartStore(
+        model=FakeCartModel(),
+        log=AppendLog(str(tmp_path / "cart.log")),
+        max_carts=100,
+    )
+    monkeypatch.setattr(cart_service, "cart_store", store)
+    monkeypatch.setattr("app.modules.orders.orders_service.cart_store", store)
+    cart_owners.clear()
+    yield store
+    cart_owners.clear()
+
+
+def user(user_uuid: str) -> dict:
+    return {"user_uuid": user_uuid, "username": user_uuid, "role": "user"}
+
+
+def run(store: CartStore, coroutine):
+    async def scenario():
+        store.log.open()
+        try:
+            return await coroutine
+        finally:
+            await store.log.close()
+
+    return asyncio.run(scenario())
+
+
+def test_owner_reads_and_writes_the_cart(store):
+    cart = run(
+        store, CartService().add_item(user("user-a"), "cart-a", "item-1", quantity=2)
+    )
+
+    assert cart.total_quantity == 2
+    assert list(store.log.read()) == [["set", "cart-a", "item-1", 2]]
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda service: service.get_cart(user("user-b"), "cart-a"),
+        lambda service: service.add_item(user("user-b"), "cart-a", "item-1", 1),
+        lambda service: service.set_quantity(user("user-b"), "cart-a", "item-1", 5),
+        lambda service: service.remove_item(user("user-b"), "cart-a", "item-1"),
+        lambda service: service.clear_cart(user("user-b"), "cart-a"),
+        lambda service: service.get_cart(user("admin"), "cart-a"),
+    ],
+)
+def test_cart_of_another_customer_is_not_found(store, call):
+    with pytest.raises(HTTPException) as error:
+        run(store, call(CartService()))
+
+    assert error.value.status_code == 404
+    assert list(store.log.read()) == []
+
+
+def test_cart_owner_is_cached(store):
+    async def scenario():
+        for quantity in range(1, 6):
+            await CartService().set_quantity(
+                user("user-a"), "cart-a", "item-1", quantity
+            )
+
+    run(store, scenario())
+
+    assert store.model.owner_lookups == 1
+
+
+def test_order_lines_are_not_read_from_another_cart(store):
+    async def scenario():
+        await CartService().add_item(user("user-a"), "cart-a", "item-1", 3)
+        return await ReservationsService().get_lines(user("user-b"), [], "cart-a")
+
+    with pytest.raises(HTTPException) as error:
+        run(store, scenario())
+
+    assert error.value.status_code == 404
+
+
+def test_order_with_lines_still_checks_the_cart(store):
+    items = [OrderItemDTO(item_uuid="item-1", quantity=1)]
+
+    with pytest.raises(HTTPException) as error:
+        run(store, ReservationsService().get_lines(user("user-b"), items, "cart-a"))
+
+    assert error.value.status_code == 404
+    assert run(
+        store, ReservationsService().get_lines(user("user-a"), items, "cart-a")
+    ) == [("item-1", 1)]
+
+
+def test_flush_failure_is_logged_and_queued_again(store, caplog):
+    async def fail(changes):
+        raise RuntimeError("DB is down")
+
+    store.model.write_changes = fail
+
+    async def scenario():
+        await CartService().add_item(user("user-a"), "cart-a", "item-1", 1)
+        await store.flush()
+        return store.stats()
+
+    stats = run(store, scenario())
+
+    assert stats["failed_flushes"] == 1
+    assert stats["pending_writes"] == 1
+    assert "Cart flush failed: DB is down" in caplog.text
+    # the record stays in the log until a flush commits
+    assert list(store.log.read()) == [["set", "cart-a", "item-1", 1]]
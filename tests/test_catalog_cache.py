@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.membership import MembershipIndex
+from app.core.search import SearchIndex
+from app.modules.category import category_service
+from app.modules.category.category_service import CategoryService
+from app.modules.products import products_service
+from app.modules.products.products_service import ProductsService
+
+HATS = {"category_uuid": "hats", "category_name": "Hats"}
+SHOES = {"category_uuid": "shoes", "category_name": "Shoes"}
+PRODUCTS = {
+    "item-1": {"item_uuid": "item-1", "item_name": "Cap", "categories": [HATS]},
+    "item-2": {"item_uuid": "item-2", "item_name": "Boot", "categories": [SHOES]},
+    "item-3": {"item_uuid": "item-3", "item_name": "Sock", "categories": []},
+}
+PAGES = {"1": ["item-1", "item-2"], "2": ["item-3"]}
+
+
+class Upstream:
+    """
+    Stand-in for the product API, writes on item-missing fail with a 404
+    """
+
+    def __init__(self):
+        self.reads: list[tuple] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        if request.method != "GET":
+            body = json.loads(request.content) if request.content else params
+            if "item-missing" in body.values():
+                return httpx.Response(404, json={"detail": "Not found"})
+            return httpx.Response(200, json=body)
+
+        self.reads.append((request.url.path, tuple(sorted(params.items()))))
+        if request.url.path == "/product/all":
+            if params.get("category_uuid"):
+                item_uuids = [
+                    item_uuid
+                    for item_uuid, product in PRODUCTS.items()
+                    if any(
+                        category["category_uuid"] == params["category_uuid"]
+                        for category in product["categories"]
+                    )
+                ]
+            else:
+                item_uuids = PAGES[params.get("page", "1")]
+            return httpx.Response(
+                200, json=[PRODUCTS[item_uuid] for item_uuid in item_uuids]
+            )
+        if request.url.path == "/product":
+            return httpx.Response(200, json=PRODUCTS[params["item_uuid"]])
+        return httpx.Response(200, json=[HATS, SHOES])
+
+
+@pytest.fixture
+def upstream(make_client, monkeypatch):
+    upstream = Upstream()
+    client = make_client(upstream)
+    cache = TTLCache(ttl=60, max_entries=100)
+    for module in (products_service, category_service):
+        monkeypatch.setattr(module, "client", client)
+        monkeypatch.setattr(module, "catalog_cache", cache)
+        monkeypatch.setattr(module, "product_index", SearchIndex())
+        monkeypatch.setattr(module, "category_items", MembershipIndex())
+    for name in ("CATALOG_PRODUCT_ALL_SOURCE", "CATALOG_PRODUCT_SOURCE"):
+        monkeypatch.setattr(config, name, "upstream")
+    monkeypatch.setattr(config, "CATALOG_CATEGORY_SOURCE", "upstream")
+    return upstream
+
+
+READS = {
+    "page 1": lambda: ProductsService().get_all_products(page=1),
+    "page 2": lambda: ProductsService().get_all_products(page=2),
+    "hats": lambda: ProductsService().get_all_products(category_uuid="hats"),
+    "item-1": lambda: ProductsService().get_product(item_uuid="item-1"),
+    "item-2": lambda: ProductsService().get_product(item_uuid="item-2"),
+    "categories": lambda: CategoryService().get_all_categories(),
+}
+
+
+def reread(upstream: Upstream, write=None) -> set[str]:
+    """
+    Read everything, run the write and read everything again
+    return:
+        names of the reads that reached the upstream after the write
+    """
+
+    async def scenario():
+        for read in READS.values():
+            await read()
+        if write:
+            await write()
+        reached = set()
+        for name, read in READS.items():
+            before = len(upstream.reads)
+            await read()
+            if len(upstream.reads) > before:
+                reached.add(name)
+        return reached
+
+    return asyncio.run(scenario())
+
+
+def test_repeated_reads_are_served_from_the_cache(upstream):
+    assert reread(upstream) == set()
+    assert len(upstream.reads) == len(READS)
+
+
+def test_update_invalidates_the_entries_holding_the_product(upstream):
+    reached = reread(
+        upstream,
+        lambda: ProductsService().update_product(
+            {"item_uuid": "item-1", "item_name": "Hat"}
+        ),
+    )
+
+    assert reached == {"page 1", "hats", "item-1"}
+
+
+def test_delete_invalidates_the_product_and_every_page(upstream):
+    reached = reread(upstream, lambda: ProductsService().delete_product("item-2"))
+
+    assert reached == {"page 1", "page 2", "hats", "item-2"}
+
+
+def test_create_invalidates_the_pages_only(upstream):
+    reached = reread(
+        upstream,
+        lambda: ProductsService().create_product(
+            {"item_uuid": "item-4", "item_name": "Scarf"}
+        ),
+    )
+
+    assert reached == {"page 1", "page 2", "hats"}
+
+
+def test_category_update_invalidates_the_entries_holding_it(upstream):
+    reached = reread(
+        upstream,
+        lambda: CategoryService().update_category(
+            {"category_uuid": "hats", "category_name": "Caps"}
+        ),
+    )
+
+    assert reached == {"page 1", "hats", "item-1", "categories"}
+
+
+def test_category_delete_invalidates_the_entries_holding_it(upstream):
+    reached = reread(upstream, lambda: CategoryService().delete_category("shoes"))
+
+    assert reached == {"page 1", "item-2", "categories"}
+
+
+def test_failed_write_keeps_the_cache(upstream):
+    async def write():
+        with pytest.raises(HTTPException):
+            await ProductsService().update_product({"item_uuid": "item-missing"})
+        with pytest.raises(HTTPException):
+            await ProductsService().delete_product("item-missing")
+
+    assert reread(upstream, write) == set()
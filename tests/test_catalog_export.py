@@ -0,0 +1,207 @@
+import asyncio
+import contextlib
+import gzip
+import json
+import os
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from app.core import config
+from app.modules.products import products_service
+from app.modules.products.products_service import ProductsService, encode_value
+
+# rows of the export benchmark, EXPORT_BENCHMARK_ROWS=1000000 for a full run
+BENCHMARK_ROWS = int(os.environ.get("EXPORT_BENCHMARK_ROWS", 20000))
+
+
+class ServerCursor:
+    """
+    Stand-in for a named cursor, it counts the rows handed out
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.fetched = 0
+        self.query = None
+        self.params = None
+
+    async def execute(self, query, params):
+        self.query = query
+        self.params = params
+
+    async def fetchmany(self, size: int) -> list[dict]:
+        rows = self.rows[self.fetched : self.fetched + size]
+        self.fetched += len(rows)
+        return rows
+
+    async def close(self):
+        pass
+
+
+class Database:
+    def __init__(self, cursor: ServerCursor):
+        self.server_cursor = cursor
+
+    def cursor(self, name=None):
+        assert name, "the export reads through a server-side cursor"
+        return self.server_cursor
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+def make_rows(count: int) -> list[dict]:
+    return [
+        {
+            "item_uuid": f"item-{item_id}",
+            "item_name": f'Item "{item_id}"\nline',
+            "item_price": Decimal("10.50"),
+            "item_updated_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+            "categories": [],
+        }
+        for item_id in range(count)
+    ]
+
+
+def use_rows(monkeypatch, rows: list[dict], batch_size: int = 10) -> ServerCursor:
+    cursor = ServerCursor(rows)
+
+    @contextlib.asynccontextmanager
+    async def connection():
+        yield Database(cursor)
+
+    monkeypatch.setattr(products_service, "connection", connection)
+    monkeypatch.setattr(config, "CATALOG_EXPORT_BATCH_SIZE", batch_size)
+    return cursor
+
+
+async def collect(stream) -> list[bytes]:
+    return [chunk async for chunk in stream]
+
+
+def test_export_is_one_json_object_per_line(monkeypatch):
+    use_rows(monkeypatch, make_rows(25))
+
+    chunks = asyncio.run(collect(ProductsService().export_products()))
+    body = b"".join(chunks)
+
+    # a batch is sent as one chunk that ends on a line break
+    assert len(chunks) == 3
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    lines = body.decode().split("\n")
+    assert lines.pop() == ""
+    products = [json.loads(line) for line in lines]
+    assert [product["item_uuid"] for product in products] == [
+        f"item-{item_id}" for item_id in range(25)
+    ]
+    assert products[0]["item_name"] == 'Item "0"\nline'
+    assert products[0]["item_price"] == 10.5
+    assert products[0]["item_updated_at"] == "2026-01-01T00:00:00+00:00"
+
+
+def test_export_reads_one_batch_at_a_time(monkeypatch):
+    cursor = use_rows(monkeypatch, make_rows(1000))
+
+    async def first_chunk():
+        stream = ProductsService().export_products()
+        chunk = await anext(stream)
+        fetched = cursor.fetched
+        await stream.aclose()
+        return chunk, fetched
+
+    chunk, fetched = asyncio.run(first_chunk())
+
+    assert fetched == 10
+    assert chunk.count(b"\n") == 10
+
+
+def test_gzip_export_decompresses_to_the_plain_export(monkeypatch):
+    use_rows(monkeypatch, make_rows(25))
+    plain = b"".join(asyncio.run(collect(ProductsService().export_products())))
+
+    use_rows(monkeypatch, make_rows(25))
+    chunks = asyncio.run(collect(ProductsService().export_products(compress=True)))
+
+    assert gzip.decompress(b"".join(chunks)) == plain
+
+    # the stream is read as it arrives, every chunk feeds the same decoder
+    decoder = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    streamed = b"".join(decoder.decompress(chunk) for chunk in chunks)
+    assert streamed + decoder.flush() == plain
+    assert decoder.eof
+
+
+def test_empty_gzip_export_is_a_valid_stream(monkeypatch):
+    use_rows(monkeypatch, [])
+
+    chunks = asyncio.run(collect(ProductsService().export_products(compress=True)))
+
+    assert gzip.decompress(b"".join(chunks)) == b""
+
+
+def test_updated_since_filters_in_the_query(monkeypatch):
+    cursor = use_rows(monkeypatch, [])
+    updated_since = datetime(2026, 5, 1, tzinfo=timezone.utc)
+
+    asyncio.run(collect(ProductsService().export_products()))
+    assert "item_updated_at >" not in cursor.query
+
+    asyncio.run(collect(ProductsService().export_products(updated_since=updated_since)))
+    assert "WHERE i.item_updated_at > %(updated_since)s" in cursor.query
+    assert cursor.params == {"updated_since": updated_since}
+
+
+async def drain(stream) -> int:
+    """
+    Read a stream as a client would, without keeping the chunks
+    """
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+    return size
+
+
+def test_export_benchmark(monkeypatch):
+    """
+    Rows per second and peak memory of the streamed export against one JSON
+    document built from every row, the database is left out of the timings
+    """
+    rows = make_rows(BENCHMARK_ROWS)
+
+    def buffered():
+        return len(json.dumps(rows, default=encode_value).encode())
+
+    def streamed(compress: bool):
+        use_rows(monkeypatch, rows, batch_size=1000)
+        return asyncio.run(drain(ProductsService().export_products(compress=compress)))
+
+    results = {}
+    for name, export in {
+        "buffered": buffered,
+        "ndjson": lambda: streamed(False),
+        "ndjson gzip": lambda: streamed(True),
+    }.items():
+        started = time.perf_counter()
+        size = export()
+        elapsed = time.perf_counter() - started
+        # traced apart, tracemalloc slows the encoding down
+        tracemalloc.start()
+        export()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (elapsed, peak, size)
+
+    print(
+        f"\nexport of {BENCHMARK_ROWS} rows: "
+        + ", ".join(
+            f"{name} {BENCHMARK_ROWS / elapsed:.0f} rows/s "
+            f"peak {peak / 2**20:.1f}MiB {size / 2**20:.1f}MiB sent"
+            for name, (elapsed, peak, size) in results.items()
+        )
+    )
+    # only one batch of rows is encoded at a time
+    assert results["ndjson"][1] < results["buffered"][1]
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core import config
+from app.modules.products.products_schema import ImportJob
+from app.modules.products.products_service import ProductsService
+
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+
+
+@pytest.fixture
+def existing_items():
+    """
+    Items already in the migrated database of TEST_DATABASE_URI, the items
+    of the key are removed after the test
+    """
+    if not TEST_DATABASE_URI:
+        pytest.skip("TEST_DATABASE_URI is not set")
+
+    from psycopg import OperationalError
+
+    from app.core.database import (
+        close_connection,
+        connection,
+        fetch_all,
+        start_connection,
+    )
+    from app.core.migrations import run_migrations
+
+    key = uuid.uuid4().hex[:12]
+    item_uuids = [f"old-{index}-{key}" for index in range(2)]
+
+    async def setup():
+        await start_connection(TEST_DATABASE_URI)
+        async with connection() as database:
+            await run_migrations(database)
+        await fetch_all(
+            """
+                INSERT INTO store.item (
+                    item_uuid, item_name, item_price, item_created_at,
+                    item_updated_at, item_quantity
+                )
+                SELECT  item_uuid, 'Old item', 1, '2020-01-01', '2020-01-01', 1
+                FROM unnest(%s::varchar[]) AS i(item_uuid)
+                RETURNING item_id
+            """,
+            (item_uuids,),
+        )
+
+    async def teardown():
+        await fetch_all(
+            "DELETE FROM store.item WHERE item_uuid LIKE %s RETURNING 1",
+            (f"%-{key}",),
+        )
+        await close_connection()
+
+    try:
+        asyncio.run(setup())
+    except (OperationalError, RuntimeError) as exc:
+        pytest.skip("database not available: " + str(exc))
+
+    yield key, item_uuids
+    asyncio.run(teardown())
+
+
+def test_import_inserts_new_items_and_updates_existing_ones(
+    existing_items, monkeypatch
+):
+    from app.core.database import fetch_all
+
+    key, old_uuids = existing_items
+    new_uuids = [f"new-{index}-{key}" for index in range(3)]
+    monkeypatch.setattr(config, "CATALOG_IMPORT_CHUNK_SIZE", 2)
+    rows = [
+        {
+            "item_uuid": item_uuid,
+            "item_name": "Imported",
+            "item_price": 9.5,
+            "item_quantity": 4,
+        }
+        for item_uuid in new_uuids + old_uuids
+    ]
+    content = "\n".join(json.dumps(row) for row in rows).encode()
+    job = ImportJob(job_id=key, created_at=datetime.now(timezone.utc))
+
+    async def scenario():
+        await ProductsService().import_products(job, content, "ndjson")
+        return await fetch_all(
+            """
+                SELECT  item_uuid,
+                        item_name,
+                        item_quantity,
+                        item_created_at,
+                        item_updated_at
+                FROM store.item
+                WHERE item_uuid = ANY(%s)
+            """,
+            (new_uuids + old_uuids,),
+        )
+
+    items = {row["item_uuid"]: row for row in asyncio.run(scenario())}
+
+    assert job.status == "finished"
+    assert job.errors == []
+    assert (job.rows_inserted, job.rows_updated) == (3, 2)
+    assert set(items) == set(new_uuids + old_uuids)
+    assert {row["item_name"] for row in items.values()} == {"Imported"}
+    for item_uuid in old_uuids:
+        # an update keeps the creation date and moves the update date
+        assert items[item_uuid]["item_created_at"].year == 2020
+        assert items[item_uuid]["item_updated_at"].year > 2020
+    for item_uuid in new_uuids:
+        assert items[item_uuid]["item_created_at"] is not None
@@ -0,0 +1,132 @@
+import base64
+import os
+import timeit
+
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+
+from app.core import config
+from app.core.crypto import CryptoService, TextCrypto, crypto_service
+
+KEY = bytes(range(32))
+IV = bytes(range(100, 116))
+OTHER_IV = bytes(16)
+
+# operations per case of the benchmark
+BENCHMARK_OPS = int(os.environ.get("CRYPTO_BENCHMARK_OPS", 2000))
+
+TEXTS = [
+    "",
+    "a",
+    "admin",
+    "sixteen bytes!!!",
+    "admin@store.test",
+    "a much longer text spanning several AES blocks of the message",
+    "ñandú 🍰 unicode",
+]
+
+
+def reference_encrypt(plain_text: str, key: bytes = KEY, iv: bytes = IV) -> str:
+    """
+    TextCrypto.encrypt_text before the CryptoService, a new CBC cipher per call
+    """
+    aes_context = AES.new(key, AES.MODE_CBC, iv)
+    padded_text = pad(plain_text.encode(), AES.block_size)
+    return base64.b64encode(iv + aes_context.encrypt(padded_text)).decode()
+
+
+def reference_decrypt(encrypted_text: str, key: bytes = KEY) -> str:
+    encrypted_data = base64.b64decode(encrypted_text)
+    cipher = AES.new(key, AES.MODE_CBC, encrypted_data[:16])
+    return unpad(cipher.decrypt(encrypted_data[16:]), AES.block_size).decode()
+
+
+@pytest.mark.parametrize("plain_text", TEXTS)
+def test_ciphertext_matches_the_cbc_cipher(plain_text):
+    service = CryptoService(key=KEY, iv=IV)
+
+    assert service.encrypt(plain_text) == reference_encrypt(plain_text)
+    assert service.decrypt(reference_encrypt(plain_text)) == plain_text
+    assert reference_decrypt(service.encrypt(plain_text)) == plain_text
+
+
+@pytest.mark.parametrize("plain_text", TEXTS)
+def test_decrypts_texts_encrypted_with_another_iv(plain_text):
+    service = CryptoService(key=KEY, iv=IV)
+
+    encrypted_text = reference_encrypt(plain_text, iv=OTHER_IV)
+
+    assert service.decrypt(encrypted_text) == plain_text
+
+
+def test_fixed_vector():
+    service = CryptoService(key=KEY, iv=IV)
+
+    assert service.encrypt("admin@store.test") == (
+        reference_encrypt("admin@store.test")
+    )
+    # the IV leads the message and the padding adds a full block
+    encrypted_data = base64.b64decode(service.encrypt("sixteen bytes!!!"))
+    assert encrypted_data[:16] == IV
+    assert len(encrypted_data) == 48
+
+
+def test_text_crypto_uses_the_config_key():
+    encrypted_text = TextCrypto(plain_text="admin@store.test").encrypt_text()
+
+    assert encrypted_text == reference_encrypt(
+        "admin@store.test", key=config.AES_KEY, iv=config.AES_IV
+    )
+    assert TextCrypto(encrypted_text=encrypted_text).decrypt_text() == (
+        "admin@store.test"
+    )
+    assert crypto_service.encrypt_constant(config.ADMIN_ROLE) == reference_encrypt(
+        config.ADMIN_ROLE, key=config.AES_KEY, iv=config.AES_IV
+    )
+
+
+def test_block_misaligned_text_is_rejected():
+    service = CryptoService(key=KEY, iv=IV)
+    encrypted_text = base64.b64encode(IV + bytes(20)).decode()
+
+    with pytest.raises(ValueError):
+        service.decrypt(encrypted_text)
+
+
+def per_op(function) -> float:
+    return min(timeit.repeat(function, number=BENCHMARK_OPS, repeat=3)) / BENCHMARK_OPS
+
+
+def test_crypto_benchmark():
+    service = CryptoService(key=KEY, iv=IV)
+    email = "admin@store.test"
+    encrypted_email = reference_encrypt(email)
+
+    cases = {
+        "encrypt": (
+            lambda: reference_encrypt(email),
+            lambda: service.encrypt(email),
+        ),
+        "decrypt": (
+            lambda: reference_decrypt(encrypted_email),
+            lambda: service.decrypt(encrypted_email),
+        ),
+        "role": (
+            lambda: reference_encrypt("admin"),
+            lambda: service.encrypt_constant("admin"),
+        ),
+    }
+    results = {
+        name: (per_op(before), per_op(after)) for name, (before, after) in cases.items()
+    }
+
+    print(
+        "\ncrypto per op: "
+        + ", ".join(
+            f"{name} {before * 1e6:.1f}us -> {after * 1e6:.1f}us"
+            for name, (before, after) in results.items()
+        )
+    )
+    before, after = results["role"]
+    assert after < before
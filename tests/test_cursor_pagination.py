@@ -0,0 +1,239 @@
+import asyncio
+import os
+import string
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.modules.products import products_service
+from app.modules.products.products_service import (
+    ProductsService,
+    decode_cursor,
+    encode_cursor,
+)
+
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+STARTED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+# depth of the page compared with the first one in the Postgres benchmark
+BENCHMARK_PAGES = int(os.environ.get("CURSOR_BENCHMARK_PAGES", 10_000))
+BENCHMARK_PAGE_SIZE = 10
+
+
+class KeysetTable:
+    """
+    Stand-in for store.item answering the keyset query of select_products_after
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+
+    async def fetch_all(self, query: str, params: dict) -> list[dict]:
+        assert "ORDER BY i.item_created_at, i.item_id" in query
+        rows = sorted(
+            self.rows, key=lambda row: (row["item_created_at"], row["item_id"])
+        )
+        if "created_at" in params:
+            position = (params["created_at"], params["item_id"])
+            rows = [
+                row
+                for row in rows
+                if (row["item_created_at"], row["item_id"]) > position
+            ]
+        return [
+            {
+                "cursor_item_id": row["item_id"],
+                "item_uuid": row["item_uuid"],
+                "item_created_at": row["item_created_at"],
+            }
+            for row in rows[: params["quantity"]]
+        ]
+
+
+def make_row(item_id: int, created_at: datetime) -> dict:
+    return {
+        "item_id": item_id,
+        "item_uuid": f"item-{item_id}",
+        "item_created_at": created_at,
+    }
+
+
+def scroll(quantity: int, on_page=None) -> list[list[str]]:
+    """
+    Read every page following next_cursor
+    """
+    pages = []
+    cursor = None
+    while True:
+        page = asyncio.run(
+            ProductsService().select_products_after(cursor=cursor, quantity=quantity)
+        )
+        pages.append([item["item_uuid"] for item in page["items"]])
+        if on_page:
+            on_page(len(pages))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 891011, tzinfo=timezone.utc)
+    cursor = encode_cursor(created_at, 42)
+
+    assert decode_cursor(cursor) == (created_at, 42)
+    assert set(cursor) <= set(string.ascii_letters + string.digits + "-_=")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "bnVsbA==", "WzEsIDJd"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_follow_the_keyset_order(monkeypatch):
+    # items created in the same instant are told apart by their item_id
+    rows = [
+        make_row(item_id, STARTED_AT + timedelta(seconds=item_id // 3))
+        for item_id in range(1, 24)
+    ]
+    monkeypatch.setattr(products_service, "fetch_all", KeysetTable(rows).fetch_all)
+
+    pages = scroll(quantity=5)
+
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert sum(pages, []) == [f"item-{item_id}" for item_id in range(1, 24)]
+
+
+def test_inserts_mid_scroll_do_not_shift_the_pages(monkeypatch):
+    rows = [
+        make_row(item_id, STARTED_AT + timedelta(seconds=item_id))
+        for item_id in range(1, 21)
+    ]
+    table = KeysetTable(rows)
+    monkeypatch.setattr(products_service, "fetch_all", table.fetch_all)
+
+    def insert(page_number: int):
+        if page_number == 2:
+            # one item before the pages already read, one after them
+            table.rows.append(make_row(100, STARTED_AT))
+            table.rows.append(make_row(101, STARTED_AT + timedelta(days=1)))
+
+    pages = scroll(quantity=5, on_page=insert)
+    seen = sum(pages, [])
+
+    assert len(seen) == len(set(seen))
+    assert seen == [f"item-{item_id}" for item_id in range(1, 21)] + ["item-101"]
+
+
+@pytest.fixture
+def catalog():
+    """
+    CURSOR_BENCHMARK_PAGES pages of items in the migrated database of
+    TEST_DATABASE_URI, removed after the test
+    """
+    if not TEST_DATABASE_URI:
+        pytest.skip("TEST_DATABASE_URI is not set")
+
+    from psycopg import OperationalError
+
+    from app.core.database import (
+        close_connection,
+        connection,
+        fetch_all,
+        start_connection,
+    )
+    from app.core.migrations import run_migrations
+
+    key = uuid.uuid4().hex[:12]
+
+    async def setup():
+        await start_connection(TEST_DATABASE_URI)
+        async with connection() as database:
+            await run_migrations(database)
+        await fetch_all(
+            """
+                INSERT INTO store.item (
+                    item_uuid, item_name, item_price, item_created_at,
+                    item_updated_at, item_quantity
+                )
+                SELECT  'bench-' || n || '-' || %(key)s, 'Item', 1,
+                        now() - n * interval '1 second', now(), 1
+                FROM generate_series(1, %(items)s) AS n
+                RETURNING 1
+            """,
+            {"key": key, "items": BENCHMARK_PAGES * BENCHMARK_PAGE_SIZE},
+        )
+
+    async def teardown():
+        await fetch_all(
+            "DELETE FROM store.item WHERE item_uuid LIKE %s RETURNING 1",
+            (f"bench-%-{key}",),
+        )
+        await close_connection()
+
+    try:
+        asyncio.run(setup())
+    except (OperationalError, RuntimeError) as exc:
+        pytest.skip("database not available: " + str(exc))
+
+    yield key
+    asyncio.run(teardown())
+
+
+async def median_time(read, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await read()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[repeat // 2]
+
+
+def test_page_depth_benchmark(catalog):
+    from app.core.database import fetch_all
+
+    service = ProductsService()
+    quantity = BENCHMARK_PAGE_SIZE
+
+    async def scenario():
+        # the cursor ending the page before the deep one, read outside the timings
+        rows = await fetch_all(
+            """
+                SELECT  item_created_at, item_id
+                FROM store.item
+                ORDER BY item_created_at, item_id
+                OFFSET %s LIMIT 1
+            """,
+            ((BENCHMARK_PAGES - 1) * quantity - 1,),
+        )
+        deep_cursor = encode_cursor(rows[0]["item_created_at"], rows[0]["item_id"])
+        deep_page = await service.select_products_after(
+            cursor=deep_cursor, quantity=quantity
+        )
+
+        timings = {}
+        for name, read in {
+            "offset first": lambda: service.select_products(page=1, quantity=quantity),
+            "offset deep": lambda: service.select_products(
+                page=BENCHMARK_PAGES, quantity=quantity
+            ),
+            "cursor first": lambda: service.select_products_after(quantity=quantity),
+            "cursor deep": lambda: service.select_products_after(
+                cursor=deep_cursor, quantity=quantity
+            ),
+        }.items():
+            timings[name] = await median_time(read)
+        return deep_page, timings
+
+    deep_page, timings = asyncio.run(scenario())
+
+    print(
+        f"\npage 1 vs page {BENCHMARK_PAGES} of {quantity} items: "
+        + ", ".join(f"{name} {timing * 1000:.2f}ms" for name, timing in timings.items())
+    )
+    assert len(deep_page["items"]) == quantity
+    # the keyset page does not read the rows before it
+    assert timings["cursor deep"] < timings["offset deep"]
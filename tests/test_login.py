@@ -0,0 +1,220 @@
+import asyncio
+import contextlib
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+from app.core.security import AuthUtils, PasswordExecutor, check_password
+from app.modules.admin import admin_model
+from app.modules.admin.admin_model import AdminModel, user_cache
+
+# cheap enough for a test run, costly enough to show up on the event loop
+PASSWORD = "secret"
+HASHED_PASSWORD = bcrypt.using(rounds=10).hash(PASSWORD)
+STORM_LOGINS = 16
+
+
+def p99(samples: list[float]) -> float:
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * 0.99), len(samples) - 1)]
+
+
+async def tick_latencies(stop: asyncio.Event, interval: float = 0.001) -> list:
+    """
+    Stand-in for the other routes, how late the loop wakes a sleeping task
+    """
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append(time.perf_counter() - started - interval)
+    return latencies
+
+
+async def login_storm(verify) -> tuple[float, float]:
+    """
+    Run STORM_LOGINS password checks at once while the loop is measured
+    return:
+        logins per second and the p99 delay of the loop in seconds
+    """
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(tick_latencies(stop))
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(STORM_LOGINS)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    latencies = await ticker
+    assert all(results)
+    return STORM_LOGINS / elapsed, p99(latencies)
+
+
+def test_login_storm_keeps_the_loop_responsive():
+    started = time.perf_counter()
+    check_password(PASSWORD, HASHED_PASSWORD)
+    verify_cost = time.perf_counter() - started
+
+    async def inline():
+        # before: bcrypt ran on the event loop
+        return check_password(PASSWORD, HASHED_PASSWORD)
+
+    executor = PasswordExecutor(workers=2, max_queue=STORM_LOGINS)
+
+    async def pooled():
+        return await executor.run(check_password, PASSWORD, HASHED_PASSWORD)
+
+    try:
+        executor.start()
+        asyncio.run(pooled())  # the processes are up before the storm
+        before = asyncio.run(login_storm(inline))
+        after = asyncio.run(login_storm(pooled))
+    finally:
+        executor.shutdown()
+
+    print(
+        f"\nlogin storm: before {before[0]:.0f}/s p99 {before[1] * 1000:.1f}ms, "
+        f"after {after[0]:.0f}/s p99 {after[1] * 1000:.1f}ms"
+    )
+    assert before[1] >= verify_cost * 0.5
+    assert after[1] < verify_cost * 0.5
+
+
+def test_full_queue_is_rejected():
+    executor = PasswordExecutor(workers=1, max_queue=1)
+
+    async def storm():
+        return await asyncio.gather(
+            *(
+                executor.run(check_password, PASSWORD, HASHED_PASSWORD)
+                for _ in range(4)
+            ),
+            return_exceptions=True,
+        )
+
+    try:
+        results = asyncio.run(storm())
+    finally:
+        executor.shutdown()
+
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert results[:2] == [True, True]
+    assert len(rejected) == 2
+    assert rejected[0].status_code == 503
+    assert executor.rejected == 2
+
+
+class FakeCursor:
+    def __init__(self, row: dict):
+        self.row = row
+
+    async def execute(self, query, params):
+        self.query = query
+
+    async def fetchone(self):
+        if (
+            "sys_user_enabled = 'True'" in self.query
+            and not self.row["sys_user_enabled"]
+        ):
+            return None
+        return dict(self.row)
+
+
+class FakeDatabase:
+    def __init__(self, row: dict):
+        self.row = row
+
+    def cursor(self):
+        return FakeCursor(self.row)
+
+
+@pytest.fixture
+def admin_row(monkeypatch):
+    """
+    Row of store.sys_admin_user read by AdminModel, counting the connections
+    """
+    row = {
+        "sys_user_uuid": "u-1",
+        "sys_user_email_aes": "aes",
+        "sys_user_email_sha": "sha",
+        "sys_user_password": HASHED_PASSWORD,
+        "sys_user_attempts": 0,
+        "sys_user_enabled": True,
+    }
+    held = {"connections": 0, "acquired": 0}
+
+    @contextlib.asynccontextmanager
+    async def connection():
+        held["connections"] += 1
+        held["acquired"] += 1
+        try:
+            yield FakeDatabase(row)
+        finally:
+            held["connections"] -= 1
+
+    monkeypatch.setattr(admin_model, "connection", connection)
+    user_cache.clear()
+    yield row, held
+    user_cache.clear()
+
+
+async def login(password: str = PASSWORD):
+    return await AuthUtils().authenticate_user(
+        username="admin@store.test", password=password, auth_model=AdminModel()
+    )
+
+
+def test_login_releases_the_connection_before_the_password_check(
+    admin_row, monkeypatch
+):
+    _, held = admin_row
+
+    async def verify_password(self, plain_password, hashed_password):
+        assert held["connections"] == 0
+        return check_password(plain_password, hashed_password)
+
+    monkeypatch.setattr(AuthUtils, "verify_password", verify_password)
+
+    assert asyncio.run(login()).sys_user_uuid == "u-1"
+    assert held["acquired"] == 1
+
+    # the refresh finds the user the login read in the cache
+    for _ in range(3):
+        assert asyncio.run(AdminModel().get_user_by_uuid("u-1")) is not None
+    assert held["acquired"] == 1
+
+
+def test_login_reads_the_user_from_the_database(admin_row):
+    row, held = admin_row
+
+    assert asyncio.run(login()) is not None
+    # a password changed in the database is checked at once
+    row["sys_user_password"] = bcrypt.using(rounds=4).hash("changed")
+    assert asyncio.run(login()) is None
+    assert held["acquired"] == 2
+
+
+def test_disabled_user_is_dropped_from_the_cache(admin_row):
+    row, held = admin_row
+
+    assert asyncio.run(AdminModel().get_user_by_uuid("u-1")) is not None
+    row["sys_user_enabled"] = False
+
+    assert asyncio.run(login()) is None
+    # the refresh reads the user again and no longer finds it enabled
+    asyncio.run(AdminModel().get_user_by_uuid("u-1"))
+    assert held["acquired"] == 3
+    assert user_cache.get(("sys_user_uuid", "u-1")) is None
+
+
+def test_invalidate_user_drops_the_cached_lookup(admin_row):
+    _, held = admin_row
+
+    asyncio.run(AdminModel().get_user_by_uuid("u-1"))
+    admin_model.invalidate_user("u-1")
+    asyncio.run(AdminModel().get_user_by_uuid("u-1"))
+
+    assert held["acquired"] == 2
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+
+import pytest
+
+from app.core import config
+from app.core.membership import MembershipIndex
+from app.modules.products import products_service
+from app.modules.products.products_service import (
+    ProductsService,
+    get_category_counts,
+    mark_categories_stale,
+)
+
+# items of the benchmark index, MEMBERSHIP_BENCHMARK_ITEMS=1000000 for a full run
+BENCHMARK_ITEMS = int(os.environ.get("MEMBERSHIP_BENCHMARK_ITEMS", 100000))
+CATEGORIES = [f"category-{index}" for index in range(50)]
+
+
+def make_memberships(count: int, seed: int = 7) -> list[tuple[int, str]]:
+    """
+    (item_id, category_uuid) rows of store.item_has_category, two categories
+    per item
+    """
+    randomizer = random.Random(seed)
+    return [
+        (item_id, category_uuid)
+        for item_id in range(1, count + 1)
+        for category_uuid in randomizer.sample(CATEGORIES, k=2)
+    ]
+
+
+def build(memberships: list[tuple[int, str]]) -> MembershipIndex:
+    members: dict[str, list[int]] = {}
+    for item_id, category_uuid in memberships:
+        members.setdefault(category_uuid, []).append(item_id)
+    index = MembershipIndex()
+    for category_uuid, item_ids in members.items():
+        index.replace(category_uuid, item_ids)
+    index.loaded = True
+    return index
+
+
+def scan_page(memberships, category_uuid: str, offset: int, limit: int) -> list[int]:
+    """
+    Page of a category read the way the join does without an index on
+    category_id, every membership row is visited and the matches sorted
+    """
+    item_ids = sorted(
+        item_id for item_id, category in memberships if category == category_uuid
+    )
+    return item_ids[offset : offset + limit]
+
+
+class MembershipTable:
+    """
+    Stand-in for store.item_has_category answering the queries of the
+    membership index and the item reads of a page
+    """
+
+    def __init__(self, members: dict[str, list[int]]):
+        self.members = members
+        self.queries: list[str] = []
+
+    async def fetch_all(self, query: str, params=None) -> list[dict]:
+        if "ARRAY(" in query:
+            self.queries.append("all")
+            return [
+                {"category_uuid": category_uuid, "item_ids": sorted(item_ids)}
+                for category_uuid, item_ids in self.members.items()
+            ]
+        if "WHERE c.category_uuid = %s" in query:
+            self.queries.append(params[0])
+            return [{"item_id": item_id} for item_id in self.members.get(params[0], [])]
+        assert "JOIN store.item_has_category" not in query
+        self.queries.append("items")
+        return [{"item_id": item_id} for item_id in params[0]]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = MembershipTable({"shoes": [9, 3, 5, 1], "hats": [2, 5]})
+    monkeypatch.setattr(products_service, "fetch_all", table.fetch_all)
+    monkeypatch.setattr(products_service, "category_items", MembershipIndex())
+    monkeypatch.setattr(products_service, "category_items_lock", asyncio.Lock())
+    monkeypatch.setattr(config, "CATEGORY_ITEMS_ENABLED", True)
+    return table
+
+
+def read_page(category_uuid: str, page: int, quantity: int) -> list[int]:
+    items = asyncio.run(
+        ProductsService().select_products(
+            page=page, quantity=quantity, category_uuid=category_uuid
+        )
+    )
+    return [item["item_id"] for item in items]
+
+
+def test_members_are_kept_sorted():
+    index = MembershipIndex()
+    index.replace("shoes", [9, 3, 5, 1])
+
+    assert index.page("shoes", 1, 2) == [3, 5]
+    assert index.page("shoes", 3, 10) == [9]
+    assert index.page("shoes", 10, 10) == []
+    assert index.page("hats", 0, 10) == []
+    assert index.contains("shoes", 5)
+    assert not index.contains("shoes", 4)
+    assert not index.contains("hats", 5)
+    assert index.counts() == {"shoes": 4}
+
+
+def test_stale_groups_until_they_are_replaced():
+    index = MembershipIndex()
+    assert index.is_stale("shoes")
+
+    index.replace("shoes", [1])
+    index.loaded = True
+    index.mark_stale("shoes")
+    assert index.is_stale("shoes")
+    assert not index.is_stale("hats")
+
+    index.replace("shoes", [1, 2])
+    assert index.stale() == set()
+    index.expire()
+    assert index.is_stale("hats")
+
+
+def test_category_pages_come_from_the_index(table):
+    assert read_page("shoes", page=1, quantity=3) == [1, 3, 5]
+    assert read_page("shoes", page=2, quantity=3) == [9]
+    assert read_page("hats", page=1, quantity=3) == [2, 5]
+
+    # one load of every category, then only the items of the pages
+    assert table.queries == ["all", "items", "items", "items"]
+
+
+def test_page_past_the_end_reads_nothing(table):
+    assert read_page("shoes", page=5, quantity=3) == []
+    assert read_page("unknown", page=1, quantity=3) == []
+    assert table.queries == ["all"]
+
+
+def test_only_the_stale_category_is_reloaded(table):
+    read_page("shoes", page=1, quantity=10)
+
+    table.members["shoes"].append(4)
+    table.members["hats"].append(7)
+    mark_categories_stale(["shoes"])
+
+    assert read_page("shoes", page=1, quantity=10) == [1, 3, 4, 5, 9]
+    assert read_page("hats", page=1, quantity=10) == [2, 5]
+    assert table.queries == ["all", "items", "shoes", "items", "items"]
+
+
+def test_counts_come_with_the_index(table):
+    assert asyncio.run(get_category_counts()) == {"shoes": 4, "hats": 2}
+
+    del table.members["hats"]
+    products_service.category_items.expire()
+
+    assert asyncio.run(get_category_counts()) == {"shoes": 4}
+    assert table.queries == ["all", "all"]
+
+
+def p99(latencies: list[float]) -> float:
+    latencies.sort()
+    return latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+
+
+def test_membership_benchmark():
+    memberships = make_memberships(BENCHMARK_ITEMS)
+
+    started = time.process_time()
+    build(memberships)
+    build_seconds = time.process_time() - started
+
+    tracemalloc.start()
+    index = build(memberships)
+    index_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # the same members kept as Python lists of ints
+    tracemalloc.start()
+    lists = {key: index.get(key).tolist() for key in index.counts()}
+    list_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    randomizer = random.Random(11)
+    reads = []
+    for _ in range(500):
+        category_uuid = randomizer.choice(CATEGORIES)
+        size = index.counts()[category_uuid]
+        reads.append((category_uuid, randomizer.randrange(max(size - 20, 1)), 20))
+    index_latencies = []
+    for category_uuid, offset, limit in reads:
+        started = time.process_time()
+        index.page(category_uuid, offset, limit)
+        index_latencies.append(time.process_time() - started)
+    scan_latencies = []
+    for category_uuid, offset, limit in reads[:20]:
+        started = time.process_time()
+        scan_page(memberships, category_uuid, offset, limit)
+        scan_latencies.append(time.process_time() - started)
+
+    print(
+        f"\nmembership index of {BENCHMARK_ITEMS} items: build {build_seconds:.2f}s "
+        f"cpu, {index_memory / 2**20:.1f} MiB as arrays, "
+        f"{list_memory / 2**20:.1f} MiB as lists, "
+        f"page p99 {p99(index_latencies) * 1000:.3f}ms cpu, "
+        f"scanned page p99 {p99(scan_latencies) * 1000:.1f}ms cpu"
+    )
+    assert sum(index.counts().values()) == len(memberships)
+    assert index_memory < list_memory
+    assert lists["category-1"] == index.page("category-1", 0, BENCHMARK_ITEMS)
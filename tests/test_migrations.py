@@ -0,0 +1,170 @@
+import asyncio
+import contextlib
+import os
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from psycopg import AsyncConnection, OperationalError
+from psycopg.rows import dict_row
+
+from app.core import config
+from app.core.migrations import get_migrations, run_migrations
+from app.modules.admin import admin_model
+from app.modules.admin.admin_model import AdminModel
+from app.modules.cart import cart_model
+from app.modules.cart.cart_model import CartModel
+from app.modules.orders import orders_model
+from app.modules.orders.orders_model import OrdersModel, StockModel
+from app.modules.products import products_service
+from app.modules.products.products_service import (
+    ProductsService,
+    encode_cursor,
+    load_category,
+)
+from app.modules.users import users_model
+from app.modules.users.users_model import UsersModel
+
+# a database with the v1.0 restore applied, the checks migrate it first
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+
+# reference tables of a handful of rows, a seq scan is their cheapest plan
+SMALL_TABLES = {"order_status", "payment_method"}
+
+
+class Recorder:
+    """
+    Stand-in for the database keeping the queries the models run, every read
+    finds no row
+    """
+
+    def __init__(self):
+        self.queries: list[tuple] = []
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        yield self
+
+    def cursor(self, name=None):
+        return self
+
+    async def execute(self, query: str, params=None):
+        self.queries.append((query, params))
+
+    async def fetchone(self):
+        return None
+
+    async def fetchall(self) -> list:
+        return []
+
+    async def fetch_all(self, query: str, params=None) -> list:
+        await self.execute(query, params)
+        return []
+
+
+# the lookups of the login, refresh, catalog, cart and order routes, each one
+# runs the query of its model
+HOT_READS = {
+    "admin login": lambda database: AdminModel().get_user_by_username("admin"),
+    "admin refresh": lambda database: AdminModel().get_user_by_uuid("hot-reads"),
+    "user login": lambda database: UsersModel().get_user_by_username("user"),
+    "user refresh": lambda database: UsersModel().get_user_by_uuid("hot-reads"),
+    "product": lambda database: ProductsService().select_product("uuid"),
+    "products by uuid": lambda database: (
+        ProductsService().select_products_by_uuid(["uuid"])
+    ),
+    "items of a category": lambda database: ProductsService().select_products(
+        page=2, quantity=10, category_uuid="uuid"
+    ),
+    "keyset page": lambda database: ProductsService().select_products_after(
+        cursor=encode_cursor(datetime(2026, 1, 1, tzinfo=timezone.utc), 1),
+        quantity=10,
+        category_uuid="uuid",
+    ),
+    "category members": lambda database: load_category("uuid"),
+    "checkout": lambda database: OrdersModel(database).get_checkout(
+        "uuid", "card", "payment"
+    ),
+    "idempotency key": lambda database: OrdersModel(database).get_idempotency_key(
+        "uuid", "key"
+    ),
+    "stock of items": lambda database: StockModel().select_stock(["uuid"]),
+    "customer cart": lambda database: CartModel().select_customer_cart("uuid"),
+    "cart lines": lambda database: CartModel().select_cart("uuid"),
+}
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = Recorder()
+    for module in (admin_model, users_model, products_service):
+        monkeypatch.setattr(module, "connection", recorder.connection)
+    for module in (products_service, orders_model, cart_model):
+        monkeypatch.setattr(module, "fetch_all", recorder.fetch_all)
+    # the category pages read through the join, not the membership index
+    monkeypatch.setattr(config, "CATEGORY_ITEMS_ENABLED", False)
+    return recorder
+
+
+def record(name: str, recorder: Recorder) -> list[tuple]:
+    """
+    Run a hot read on the recorder
+    return:
+        list with the query and the params of every statement it ran
+    """
+
+    async def run():
+        with contextlib.suppress(HTTPException):
+            await HOT_READS[name](recorder)
+
+    asyncio.run(run())
+    return recorder.queries
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """
+    Get the tables read with a sequential scan by a plan and its subplans
+    """
+    tables = []
+    if plan.get("Node Type") == "Seq Scan":
+        tables.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        tables.extend(seq_scans(child))
+    return tables
+
+
+async def explain(query: str, params: tuple | dict) -> dict:
+    database = await AsyncConnection.connect(
+        TEST_DATABASE_URI, autocommit=True, row_factory=dict_row
+    )
+    async with database:
+        await run_migrations(database)
+        cursor = database.cursor()
+        # with seq scans priced out a seq scan is left only when no index fits,
+        # the same plan a large table gets
+        await cursor.execute("SET enable_seqscan = off")
+        await cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        return (await cursor.fetchone())["QUERY PLAN"][0]["Plan"]
+
+
+def test_migrations_are_numbered_once():
+    versions = [migration.version for migration in get_migrations()]
+    assert versions
+    assert len(versions) == len(set(versions))
+
+
+@pytest.mark.parametrize("name", sorted(HOT_READS))
+def test_hot_read_runs_one_query(name, recorder):
+    assert len(record(name, recorder)) == 1
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URI, reason="TEST_DATABASE_URI is not set")
+@pytest.mark.parametrize("name", sorted(HOT_READS))
+def test_hot_query_uses_an_index(name, recorder):
+    [(query, params)] = record(name, recorder)
+    try:
+        plan = asyncio.run(explain(query, params))
+    except OperationalError as exc:
+        pytest.skip("database not available: " + str(exc))
+
+    assert set(seq_scans(plan)) <= SMALL_TABLES, plan
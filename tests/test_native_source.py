@@ -0,0 +1,163 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.modules.category import category_service
+from app.modules.category.category_service import CategoryService
+from app.modules.products import products_service
+from app.modules.products.products_service import (
+    NATIVE_SOURCE,
+    ProductsService,
+    encode_value,
+)
+
+SOURCES = (
+    "CATALOG_PRODUCT_ALL_SOURCE",
+    "CATALOG_PRODUCT_SOURCE",
+    "CATALOG_CATEGORY_SOURCE",
+)
+CATEGORIES = [
+    {"category_uuid": "category-1", "category_name": "Hats"},
+    {"category_uuid": "category-2", "category_name": "Shoes"},
+]
+
+
+def make_item(index: int, price_off=None, until=None) -> dict:
+    """
+    Row of PRODUCT_COLUMNS as psycopg returns it
+    """
+    return {
+        "item_uuid": f"item-{index}",
+        "item_name": f"Item {index}",
+        "item_price": Decimal("19.99") * index,
+        "item_price_off": price_off,
+        "item_image_url": None,
+        "item_price_off_until_date": until,
+        "item_created_at": datetime(2026, 1, index, tzinfo=timezone.utc),
+        "item_updated_at": datetime(2026, 2, index, tzinfo=timezone.utc),
+        "item_quantity": index * 3,
+        "categories": CATEGORIES[: index % 3],
+    }
+
+
+ITEMS = [
+    make_item(1),
+    make_item(2, Decimal("15"), date.today() + timedelta(days=3)),
+    make_item(3, Decimal("50"), date.today() - timedelta(days=1)),
+    make_item(4, Decimal("10")),
+]
+
+
+def as_json(payload) -> bytes:
+    return json.dumps(payload, default=encode_value).encode()
+
+
+class Table:
+    """
+    Stand-in for the Postgres reads of the services
+    """
+
+    def __init__(self):
+        self.reads = 0
+
+    async def select_products(self, page=None, quantity=None, category_uuid=None):
+        self.reads += 1
+        return [dict(item) for item in ITEMS]
+
+    async def select_product(self, item_uuid=None):
+        self.reads += 1
+        return next(dict(item) for item in ITEMS if item["item_uuid"] == item_uuid)
+
+    async def select_categories(self):
+        self.reads += 1
+        return [dict(category) for category in CATEGORIES]
+
+
+@pytest.fixture
+def catalog(make_client, monkeypatch):
+    """
+    The same catalog in the upstream API and in Postgres, each read goes
+    through a fresh catalog cache
+    """
+    table = Table()
+    upstream_reads = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        upstream_reads.append(request.url.path)
+        if request.url.path == "/product/all":
+            return httpx.Response(200, content=as_json(ITEMS))
+        if request.url.path == "/product":
+            item_uuid = request.url.params["item_uuid"]
+            product = next(item for item in ITEMS if item["item_uuid"] == item_uuid)
+            return httpx.Response(200, content=as_json(product))
+        return httpx.Response(200, content=as_json(CATEGORIES))
+
+    client = make_client(upstream)
+    monkeypatch.setattr(products_service, "client", client)
+    monkeypatch.setattr(category_service, "client", client)
+    monkeypatch.setattr(ProductsService, "select_products", table.select_products)
+    monkeypatch.setattr(ProductsService, "select_product", table.select_product)
+    monkeypatch.setattr(CategoryService, "select_categories", table.select_categories)
+
+    def read(source: str) -> tuple[dict, TTLCache]:
+        cache = TTLCache(ttl=60, max_entries=100)
+        monkeypatch.setattr(products_service, "catalog_cache", cache)
+        monkeypatch.setattr(category_service, "catalog_cache", cache)
+        for name in SOURCES:
+            monkeypatch.setattr(config, name, source)
+
+        async def scenario():
+            products = ProductsService()
+            return {
+                "page": await products.get_all_products(page=1, quantity=10),
+                "product": await products.get_product(item_uuid="item-2"),
+                "categories": await CategoryService().get_all_categories(),
+            }
+
+        return asyncio.run(scenario()), cache
+
+    return read, table, upstream_reads
+
+
+def test_native_reads_match_the_upstream(catalog):
+    read, table, upstream_reads = catalog
+
+    upstream, _ = read("upstream")
+    native, _ = read(NATIVE_SOURCE)
+
+    assert len(upstream_reads) == 3
+    assert table.reads == 3
+    for name in ("page", "product", "categories"):
+        assert native[name].json() == upstream[name].json(), name
+
+    page = native["page"].json()
+    assert [item["effective_price"] for item in page] == [19.99, 33.98, 59.97, 71.96]
+    assert page[1]["categories"] == CATEGORIES[:2]
+    assert page[0]["item_created_at"] == "2026-01-01T00:00:00+00:00"
+
+
+@pytest.mark.parametrize(
+    "tag",
+    [
+        ("item_uuid", "item-2"),
+        ("category_uuid", "category-1"),
+    ],
+)
+def test_native_reads_are_invalidated_like_the_upstream_ones(catalog, tag):
+    read, _, _ = catalog
+
+    sizes = {}
+    for source in ("upstream", NATIVE_SOURCE):
+        _, cache = read(source)
+        before = cache.stats()["size"]
+        cache.invalidate_tag(tag)
+        sizes[source] = (before, cache.stats()["size"])
+
+    assert sizes["upstream"] == sizes[NATIVE_SOURCE]
+    assert sizes["upstream"][1] < sizes["upstream"][0]
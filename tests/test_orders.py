@@ -0,0 +1,452 @@
+import asyncio
+import os
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.common.dependencies import get_current_customer_user
+from app.core import config
+from app.core.reservations import ReservationEngine
+from app.modules.orders import orders_service
+from app.modules.orders.orders_schema import OrderDTO, OrderItemDTO
+from app.modules.orders.orders_service import OrdersService
+
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+HOT_ITEM = "hot-item"
+STOCK = 25
+BUYERS = 200
+# orders of the Postgres contention benchmark, all of them on one item
+CONTENTION_ORDERS = int(os.environ.get("ORDERS_BENCHMARK_ORDERS", 500))
+
+CHECKOUT = {
+    "customer_id": 1,
+    "card_id": 1,
+    "payment_method_id": 1,
+    "order_status_id": 1,
+}
+
+
+class FakeOrdersModel:
+    """
+    Stand-in for OrdersModel storing the orders placed on reservations
+    """
+
+    def __init__(self):
+        self.placed: list[list] = []
+
+    async def get_checkout(self, user_uuid, card_uuid, payment_method_uuid):
+        await asyncio.sleep(0)
+        return CHECKOUT
+
+    async def get_idempotency_key(self, user_uuid, idempotency_key):
+        return None
+
+    async def place_order(self, order_uuid, checkout, lines, idempotency, reserved):
+        assert reserved
+        await asyncio.sleep(0)
+        self.placed.append(lines)
+        return {
+            "order_uuid": str(order_uuid),
+            "items": [
+                {"item_uuid": item_uuid, "quantity": quantity, "amount": "1"}
+                for item_uuid, quantity in lines
+            ],
+            "total_amount": "1",
+            "created_at": "2026-01-01T00:00:00",
+        }
+
+
+def order(quantity: int = 1) -> OrderDTO:
+    return OrderDTO(
+        card_uuid="card",
+        payment_method_uuid="payment",
+        items=[OrderItemDTO(item_uuid=HOT_ITEM, quantity=quantity)],
+    )
+
+
+async def place_all(service: OrdersService, orders: list[OrderDTO]) -> list:
+    return await asyncio.gather(
+        *(
+            service.place_order({"user_uuid": f"user-{index}"}, payload)
+            for index, payload in enumerate(orders)
+        ),
+        return_exceptions=True,
+    )
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    async def select_stock(item_uuids):
+        await asyncio.sleep(0)
+        return {HOT_ITEM: STOCK} if HOT_ITEM in item_uuids else {}
+
+    engine = ReservationEngine(loader=select_stock, shards=4, ttl=60)
+    monkeypatch.setattr(orders_service, "stock_reservations", engine)
+    monkeypatch.setattr(config, "RESERVATION_ENABLED", True)
+    return engine
+
+
+def test_concurrent_orders_never_oversell_a_hot_item(engine):
+    model = FakeOrdersModel()
+    orders = [order(quantity=1 + index % 3) for index in range(BUYERS)]
+
+    results = asyncio.run(place_all(OrdersService(model), orders))
+
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert all(error.status_code == 409 for error in rejected)
+    sold = sum(quantity for lines in model.placed for _, quantity in lines)
+    assert len(model.placed) + len(rejected) == BUYERS
+    assert STOCK - 2 <= sold <= STOCK
+    assert engine.stats()["reservations"] == 0
+
+
+def test_failed_orders_give_the_stock_back(engine):
+    model = FakeOrdersModel()
+    calls = iter(range(BUYERS))
+
+    async def place_order(*args, **kwargs):
+        if next(calls) % 2:
+            raise HTTPException(status_code=503, detail="DB is not responding")
+        return await FakeOrdersModel.place_order(model, *args, **kwargs)
+
+    model.place_order = place_order
+    service = OrdersService(model)
+
+    async def scenario():
+        # waves of buyers until the stock not sold is gone
+        results = []
+        while not results or any(
+            not isinstance(result, HTTPException) or result.status_code == 503
+            for result in results[-BUYERS:]
+        ):
+            results += await place_all(service, [order()] * BUYERS)
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert sum(lines[0][1] for lines in model.placed) == STOCK
+    assert engine.shard(HOT_ITEM).available[HOT_ITEM] == 0
+    assert engine.shard(HOT_ITEM).held == {}
+    assert {
+        result.status_code for result in results if isinstance(result, HTTPException)
+    } == {409, 503}
+
+
+def test_only_customer_tokens_place_orders():
+    customer = {"user_uuid": "user", "username": "a", "role": config.USER_ROLE}
+    admin = {"user_uuid": "admin", "username": "b", "role": config.ADMIN_ROLE}
+
+    assert asyncio.run(get_current_customer_user(customer)) == customer
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_current_customer_user(admin))
+    assert error.value.status_code == 403
+
+
+@pytest.fixture
+def database():
+    """
+    A customer with a card and one hot item in the migrated database of
+    TEST_DATABASE_URI, removed after the test
+    """
+    if not TEST_DATABASE_URI:
+        pytest.skip("TEST_DATABASE_URI is not set")
+
+    from psycopg import OperationalError
+
+    from app.core.database import (
+        close_connection,
+        connection,
+        fetch_all,
+        start_connection,
+    )
+    from app.core.migrations import run_migrations
+
+    key = uuid.uuid4().hex[:12]
+    seed = {
+        "item_uuid": f"item-{key}",
+        "card_uuid": f"card-{key}",
+        "payment_method_uuid": f"pay-{key}",
+        "user_uuid": f"user-{key}",
+    }
+
+    async def setup():
+        await start_connection(TEST_DATABASE_URI)
+        async with connection() as database:
+            await run_migrations(database)
+        rows = await fetch_all(
+            """
+                WITH customer AS (
+                    INSERT INTO store.customer (
+                        customer_uuid, customer_name_sha, customer_name_aes,
+                        customer_dob, customer_created_at, customer_updated_at,
+                        customer_cart_uuid, customer_nit_aes, customer_nit_sha
+                    )
+                    VALUES (%(key)s, %(key)s, %(key)s, '2000-01-01', now(), now(),
+                            %(key)s, %(key)s, %(key)s)
+                    RETURNING customer_id
+                ), sys_user AS (
+                    INSERT INTO store.sys_user (
+                        sys_user_uuid, sys_user_email_aes, sys_user_email_sha,
+                        sys_user_password, sys_user_created_at,
+                        sys_user_updated_at, sys_user_attempts,
+                        sys_user_last_attempt, customer_id
+                    )
+                    SELECT  %(user_uuid)s, %(key)s, %(key)s, '', now(), now(), 0,
+                            now(), customer_id
+                    FROM customer
+                ), card AS (
+                    INSERT INTO store.card (
+                        card_uuid, card_number_aes, card_card_tail_number_aes,
+                        card_name_tag_aes, card_owner_name_aes,
+                        card_owner_address, customer_id, card_created_at,
+                        card_updated_at
+                    )
+                    SELECT  %(card_uuid)s, '', '', '', '', '', customer_id,
+                            now(), now()
+                    FROM customer
+                ), payment_method AS (
+                    INSERT INTO store.payment_method (
+                        payment_method_uuid, payment_method_name_aes
+                    )
+                    VALUES (%(payment_method_uuid)s, '')
+                ), item AS (
+                    INSERT INTO store.item (
+                        item_uuid, item_name, item_price, item_created_at,
+                        item_updated_at, item_quantity
+                    )
+                    VALUES (%(item_uuid)s, 'Hot item', 10, now(), now(), %(stock)s)
+                )
+                SELECT  customer_id,
+                        EXISTS (SELECT 1 FROM store.order_status) AS has_status
+                FROM customer
+            """,
+            {**seed, "key": key, "stock": STOCK},
+        )
+        if not rows[0]["has_status"]:
+            await fetch_all(
+                """
+                    INSERT INTO store.order_status (
+                        order_status_uuid, order_status_name, order_status_step_number
+                    )
+                    VALUES (%s, 'created', 1)
+                    RETURNING order_status_id
+                """,
+                (key,),
+            )
+        return rows[0]["customer_id"]
+
+    async def teardown(customer_id: int):
+        for query in (
+            "DELETE FROM store.customers_items WHERE customer_id = %(customer_id)s",
+            "DELETE FROM store.orders WHERE customer_id = %(customer_id)s",
+            "DELETE FROM store.card WHERE customer_id = %(customer_id)s",
+            "DELETE FROM store.sys_user WHERE customer_id = %(customer_id)s",
+            "DELETE FROM store.customer WHERE customer_id = %(customer_id)s",
+            "DELETE FROM store.item WHERE item_uuid = %(item_uuid)s",
+            """
+                DELETE FROM store.payment_method
+                WHERE payment_method_uuid = %(payment_method_uuid)s
+            """,
+        ):
+            await fetch_all(
+                query + " RETURNING 1", {**seed, "customer_id": customer_id}
+            )
+        await close_connection()
+
+    try:
+        customer_id = asyncio.run(setup())
+    except (OperationalError, RuntimeError) as exc:
+        pytest.skip("database not available: " + str(exc))
+
+    yield seed
+    asyncio.run(teardown(customer_id))
+
+
+async def order_storm(database: dict, buyers: int) -> tuple[list, list, float]:
+    """
+    Place one order of the hot item per buyer at the same time, each on its
+    own connection, and take the lines placed on reservations from the stock
+    return:
+        tuple with the results, the latency of each order and the seconds
+        the storm took
+    """
+    from app.core.database import connection
+    from app.modules.orders.orders_model import OrdersModel
+
+    payload = OrderDTO(
+        card_uuid=database["card_uuid"],
+        payment_method_uuid=database["payment_method_uuid"],
+        items=[OrderItemDTO(item_uuid=database["item_uuid"], quantity=1)],
+    )
+    latencies = []
+
+    async def buy():
+        started = time.perf_counter()
+        try:
+            async with connection() as db:
+                service = OrdersService(OrdersModel(db))
+                return await service.place_order(
+                    {"user_uuid": database["user_uuid"]}, payload
+                )
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(buy() for _ in range(buyers)), return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    await orders_service.stock_model.apply_orders()
+    return results, latencies, elapsed
+
+
+async def select_hot_item(database: dict) -> dict:
+    from app.core.database import fetch_all
+
+    rows = await fetch_all(
+        """
+            SELECT  i.item_quantity,
+                    (
+                        SELECT  coalesce(sum(o.order_item_quantity), 0)
+                        FROM store.orders o
+                        WHERE o.item_id = i.item_id
+                    ) AS sold,
+                    (
+                        SELECT  count(*)
+                        FROM store.orders o
+                        WHERE o.item_id = i.item_id
+                        AND NOT o.order_stock_applied
+                    ) AS pending
+            FROM store.item i
+            WHERE i.item_uuid = %s
+        """,
+        (database["item_uuid"],),
+    )
+    return rows[0]
+
+
+def use_reservations(monkeypatch, reserved: bool):
+    from app.modules.orders.orders_model import StockModel
+
+    monkeypatch.setattr(config, "RESERVATION_ENABLED", reserved)
+    engine = ReservationEngine(loader=StockModel().select_stock, shards=4, ttl=60)
+    monkeypatch.setattr(orders_service, "stock_reservations", engine)
+
+
+@pytest.mark.parametrize("reserved", [False, True])
+def test_concurrent_orders_never_oversell_in_postgres(database, monkeypatch, reserved):
+    use_reservations(monkeypatch, reserved)
+
+    async def scenario():
+        results, _, _ = await order_storm(database, STOCK * 4)
+        return results, await select_hot_item(database)
+
+    results, stock = asyncio.run(scenario())
+
+    placed = [result for result in results if not isinstance(result, Exception)]
+    errors = {
+        result.status_code for result in results if isinstance(result, HTTPException)
+    }
+    assert len(placed) == STOCK
+    assert errors <= {409, 503}
+    assert stock["item_quantity"] == 0
+    assert stock["sold"] == STOCK
+    assert sum(Decimal(order.total_amount) for order in placed) == 10 * STOCK
+
+
+@pytest.mark.parametrize("reserved", [False, True])
+def test_hot_item_contention_benchmark(database, monkeypatch, reserved):
+    from app.core.database import fetch_all
+
+    use_reservations(monkeypatch, reserved)
+
+    async def scenario():
+        await fetch_all(
+            """
+                UPDATE store.item
+                SET item_quantity = %s
+                WHERE item_uuid = %s
+                RETURNING item_id
+            """,
+            (CONTENTION_ORDERS, database["item_uuid"]),
+        )
+        storm = await order_storm(database, CONTENTION_ORDERS)
+        return storm, await select_hot_item(database)
+
+    (results, latencies, elapsed), stock = asyncio.run(scenario())
+
+    placed = [result for result in results if not isinstance(result, Exception)]
+    latencies.sort()
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    print(
+        f"\nhot item, {'reserved' if reserved else 'direct'}: "
+        f"{len(placed) / elapsed:.0f} orders/s p99 {p99 * 1000:.1f}ms, "
+        f"{len(results) - len(placed)} failed"
+    )
+    assert stock["item_quantity"] == CONTENTION_ORDERS - len(placed)
+    assert stock["sold"] == len(placed)
+
+
+def test_apply_orders_leaves_a_short_item_pending(database):
+    from app.core.database import fetch_all
+    from app.modules.orders.orders_model import StockModel
+
+    async def scenario():
+        # lines stored over the stock, as a reservation count out of date would
+        await fetch_all(
+            """
+                INSERT INTO store.orders (
+                    order_uuid, order_created_at, order_updated_at,
+                    order_total_amount, order_item_quantity, order_stock_applied,
+                    item_id, customer_id, order_status_id, card_id,
+                    payment_method_id
+                )
+                SELECT  1, now(), now(), '10', %s, false, i.item_id,
+                        cd.customer_id,
+                        (SELECT min(order_status_id) FROM store.order_status),
+                        cd.card_id, pm.payment_method_id
+                FROM store.item i, store.card cd, store.payment_method pm
+                WHERE i.item_uuid = %s
+                AND cd.card_uuid = %s
+                AND pm.payment_method_uuid = %s
+                RETURNING order_id
+            """,
+            (
+                STOCK + 1,
+                database["item_uuid"],
+                database["card_uuid"],
+                database["payment_method_uuid"],
+            ),
+        )
+        applied, short = await StockModel().apply_orders()
+        return applied, short, await select_hot_item(database)
+
+    applied, short, stock = asyncio.run(scenario())
+
+    assert database["item_uuid"] not in applied
+    assert database["item_uuid"] in short
+    assert stock["item_quantity"] == STOCK
+    assert stock["pending"] == 1
+
+
+def test_item_quantity_cannot_go_below_zero(database):
+    from psycopg.errors import CheckViolation
+
+    from app.core.database import connection
+
+    async def scenario():
+        async with connection() as db:
+            await db.execute(
+                """
+                    UPDATE store.item
+                    SET item_quantity = item_quantity - %s
+                    WHERE item_uuid = %s
+                """,
+                (STOCK + 1, database["item_uuid"]),
+            )
+
+    with pytest.raises(CheckViolation):
+        asyncio.run(scenario())
@@ -0,0 +1,201 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core import http_request
+from app.core.http_request import RawResponse
+
+# items of the benchmark page, PASSTHROUGH_BENCHMARK_ITEMS=100000 for a full run
+BENCHMARK_ITEMS = int(os.environ.get("PASSTHROUGH_BENCHMARK_ITEMS", 10000))
+BENCHMARK_REQUESTS = 5
+
+# key order and spacing a decode and re-encode would not keep
+PAGE = (
+    b'{"items":  [' + b",".join(b'{"z": 1, "a": "%d"}' % i for i in range(200)) + b"]}"
+)
+
+
+def make_request(**headers) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/product/all",
+            "query_string": b"",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_upstream_bytes_pass_through(make_client):
+    def upstream(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            content=gzip.compress(PAGE),
+            headers={
+                "content-type": "application/json; charset=utf-8",
+                "content-encoding": "gzip",
+                "cache-control": "max-age=30",
+                "set-cookie": "session=upstream",
+            },
+        )
+
+    client = make_client(upstream)
+    page = asyncio.run(client.get_raw("/product/all"))
+
+    assert page.content == PAGE
+    # httpx already decoded the body, its encoding and length are not forwarded
+    assert page.headers == {
+        "content-type": "application/json; charset=utf-8",
+        "cache-control": "max-age=30",
+    }
+    assert page.json()["items"][3] == {"z": 1, "a": "3"}
+
+
+def test_plain_response_with_etag():
+    page = RawResponse(PAGE)
+    response = page.response(make_request())
+
+    assert response.body == PAGE
+    assert response.headers["etag"] == page.etag()
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in response.headers
+
+
+def test_gzip_variant_is_negotiated_and_computed_once():
+    page = RawResponse(PAGE)
+    response = page.response(make_request(accept_encoding="gzip, deflate"))
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == PAGE
+    assert response.headers["etag"] == page.etag("gzip") != page.etag()
+    assert page.encoded("gzip") is page.encoded("gzip")
+
+
+@pytest.mark.parametrize(
+    "accept_encoding", ["", "identity", "gzip;q=0", "gzip; q=0.0, deflate"]
+)
+def test_plain_variant_when_gzip_is_not_accepted(accept_encoding):
+    response = RawResponse(PAGE).response(make_request(accept_encoding=accept_encoding))
+
+    assert response.body == PAGE
+    assert "content-encoding" not in response.headers
+
+
+def test_small_bodies_are_not_compressed():
+    small = json.dumps({"item_uuid": "1"}).encode()
+    response = RawResponse(small).response(make_request(accept_encoding="gzip"))
+
+    assert response.body == small
+    assert "content-encoding" not in response.headers
+
+
+def test_brotli_is_preferred_when_available():
+    if not http_request.BROTLI_AVAILABLE:
+        pytest.skip("brotli is not installed")
+    page = RawResponse(PAGE)
+
+    response = page.response(make_request(accept_encoding="gzip, br"))
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"] == page.etag("br")
+
+
+@pytest.mark.parametrize("encoding", [None, "gzip"])
+def test_not_modified_when_the_client_has_the_variant(encoding):
+    page = RawResponse(PAGE, headers={"content-type": "application/json"})
+    accept_encoding = encoding or "identity"
+
+    for if_none_match in (
+        page.etag(encoding),
+        "W/" + page.etag(encoding),
+        '"other", ' + page.etag(encoding),
+        "*",
+    ):
+        response = page.response(
+            make_request(accept_encoding=accept_encoding, if_none_match=if_none_match)
+        )
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == page.etag(encoding)
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert "content-type" not in response.headers
+
+
+def test_etag_of_another_variant_sends_the_body():
+    page = RawResponse(PAGE)
+
+    # the plain ETag does not validate the gzip representation
+    response = page.response(
+        make_request(accept_encoding="gzip", if_none_match=page.etag())
+    )
+
+    assert response.status_code == 200
+    assert gzip.decompress(response.body) == PAGE
+
+
+def test_passthrough_benchmark(make_client):
+    body = json.dumps(
+        [
+            {
+                "item_uuid": f"item-{index}",
+                "item_name": f"Item {index}",
+                "item_price": "10.50",
+                "categories": [{"category_uuid": "c", "category_name": "C"}],
+            }
+            for index in range(BENCHMARK_ITEMS)
+        ]
+    ).encode()
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, content=body, headers={"content-type": "application/json"}
+        )
+
+    client = make_client(upstream)
+    request = make_request()
+
+    async def decoded():
+        # the former path: parse, then jsonable_encoder and a new body
+        products = await client.get("/product/all")
+        return JSONResponse(content=jsonable_encoder(products))
+
+    async def passed_through():
+        page = await client.get_raw("/product/all")
+        return page.response(request)
+
+    results = {}
+    for name, read in {"decoded": decoded, "passthrough": passed_through}.items():
+        started = time.process_time()
+        for _ in range(BENCHMARK_REQUESTS):
+            response = asyncio.run(read())
+        cpu = (time.process_time() - started) / BENCHMARK_REQUESTS
+
+        tracemalloc.start()
+        asyncio.run(read())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (cpu, peak, len(response.body))
+
+    print(
+        f"\npage of {BENCHMARK_ITEMS} items ({len(body) / 2**20:.1f} MiB): "
+        + ", ".join(
+            f"{name} {cpu * 1000:.1f}ms cpu/request peak {peak / 2**20:.1f}MiB"
+            for name, (cpu, peak, _) in results.items()
+        )
+    )
+    assert results["passthrough"][2] == len(body)
+    assert results["passthrough"][0] < results["decoded"][0]
+    assert results["passthrough"][1] < results["decoded"][1]
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.modules.products import products_service
+from app.modules.products.products_service import NATIVE_SOURCE, ProductsService
+
+
+class ItemTable:
+    """
+    Stand-in for select_products, reads the current rows of store.item
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.reads = 0
+
+    async def select_products(self, page=None, quantity=None, **kwargs):
+        self.reads += 1
+        return [dict(row) for row in self.rows[:quantity]]
+
+
+def make_item(item_id: int, price: str) -> dict:
+    return {
+        "item_id": item_id,
+        "item_uuid": f"item-{item_id}",
+        "item_price": price,
+        "item_price_off": None,
+        "item_price_off_until_date": None,
+    }
+
+
+def item_uuids(products) -> list[str]:
+    return [item["item_uuid"] for item in products.json()]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = ItemTable([make_item(1, "10"), make_item(2, "30"), make_item(3, "5")])
+    monkeypatch.setattr(ProductsService, "select_products", table.select_products)
+    monkeypatch.setattr(config, "CATALOG_PRODUCT_ALL_SOURCE", NATIVE_SOURCE)
+    monkeypatch.setattr(
+        products_service, "catalog_cache", TTLCache(ttl=60, max_entries=100)
+    )
+    return table
+
+
+def test_filters_and_sorts_the_items_of_the_page(table):
+    products = asyncio.run(
+        ProductsService().get_all_products(
+            page=1, quantity=10, max_price=20, sort="price_asc"
+        )
+    )
+
+    assert item_uuids(products) == ["item-3", "item-1"]
+
+
+def test_refresh_filters_the_current_page(table):
+    cache = products_service.catalog_cache
+
+    async def scenario():
+        service = ProductsService()
+        first = await service.get_all_products(page=1, quantity=10, max_price=20)
+        await service.get_all_products(page=1, quantity=10, max_price=20)
+
+        table.rows[0]["item_price"] = "25"
+        table.rows.append(make_item(4, "12"))
+        # the page is refreshed, its filters are not cached apart
+        assert cache.refresh_hot(top=10, horizon=120) == 1
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        return first, await service.get_all_products(page=1, quantity=10, max_price=20)
+
+    first, refreshed = asyncio.run(scenario())
+
+    assert item_uuids(first) == ["item-1", "item-3"]
+    # filtered from the refreshed page and not from the one cached before
+    assert item_uuids(refreshed) == ["item-3", "item-4"]
+    assert table.reads == 2
+
+
+def test_filters_run_on_the_cached_page(table):
+    async def scenario():
+        service = ProductsService()
+        await service.get_all_products(page=1, quantity=10)
+        low = await service.get_all_products(page=1, quantity=10, max_price=20)
+        high = await service.get_all_products(page=1, quantity=10, min_price=20)
+        return low, high
+
+    low, high = asyncio.run(scenario())
+
+    assert item_uuids(low) == ["item-1", "item-3"]
+    assert item_uuids(high) == ["item-2"]
+    assert table.reads == 1
+
+
+def test_sort_keeps_the_items_without_a_price(table):
+    table.rows.insert(0, make_item(4, None))
+
+    products = asyncio.run(
+        ProductsService().get_all_products(page=1, quantity=10, sort="price_desc")
+    )
+
+    assert item_uuids(products) == ["item-2", "item-1", "item-3", "item-4"]
@@ -0,0 +1,254 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core import config, http_request, resilience
+from app.core.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RoutePolicy,
+)
+
+
+class Upstream:
+    """
+    Stand-in upstream answering with a scripted status and delay per call
+    """
+
+    def __init__(self, status_code: int = 200, delays: tuple = (), statuses=()):
+        self.status_code = status_code
+        self.delays = list(delays)
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        call = self.calls
+        status_code = self.statuses.pop(0) if self.statuses else self.status_code
+        if self.delays:
+            await asyncio.sleep(self.delays.pop(0))
+        return httpx.Response(status_code, json={"call": call})
+
+
+@pytest.fixture(autouse=True)
+def isolated_budget(monkeypatch):
+    """
+    A full retry budget per test and retries without backoff
+    """
+    budget = RetryBudget(ratio=0.1, min_per_second=0, max_tokens=10)
+    monkeypatch.setattr(http_request, "retry_budget", budget)
+    monkeypatch.setattr(config, "UPSTREAM_RETRY_BACKOFF", 0.0)
+    return budget
+
+
+def use_policy(monkeypatch, method: str, path: str, **settings):
+    monkeypatch.setitem(
+        resilience.route_policies, f"{method} {path}", RoutePolicy(**settings)
+    )
+
+
+async def call(client, method: str = "GET", path: str = "/product") -> int:
+    try:
+        return (await client.send(method, path)).json()["call"]
+    except HTTPException as exc:
+        return exc.status_code
+
+
+def test_circuit_opens_and_recovers_through_half_open(make_client, monkeypatch):
+    use_policy(monkeypatch, "GET", "/product", retries=0, hedge=False)
+    upstream = Upstream(status_code=500)
+    client = make_client(upstream, coalesce=False)
+    client.breaker = CircuitBreaker(
+        failure_threshold=2, recovery_timeout=0.05, half_open_calls=1
+    )
+
+    async def scenario():
+        assert await call(client) == 500
+        assert await call(client) == 500
+        assert client.breaker.state == OPEN
+
+        # rejected without reaching the upstream
+        with pytest.raises(CircuitOpenError):
+            await client.send("GET", "/product")
+        assert upstream.calls == 2
+
+        # the probe fails and the circuit opens again
+        await asyncio.sleep(0.06)
+        assert await call(client) == 500
+        assert client.breaker.state == OPEN
+        assert upstream.calls == 3
+
+        # one probe at a time, a successful one closes the circuit
+        await asyncio.sleep(0.06)
+        upstream.status_code = 200
+        upstream.delays = [0.02]
+        probe = asyncio.create_task(call(client))
+        await asyncio.sleep(0)
+        assert client.breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            await client.send("GET", "/product")
+        assert await probe == 4
+        assert client.breaker.state == CLOSED
+        assert await call(client) == 5
+
+    asyncio.run(scenario())
+    assert client.breaker.rejected == 2
+
+
+def test_client_errors_do_not_open_the_circuit(make_client, monkeypatch):
+    use_policy(monkeypatch, "GET", "/product", retries=2, hedge=False)
+    upstream = Upstream(status_code=404)
+    client = make_client(upstream, coalesce=False)
+    client.breaker = CircuitBreaker(
+        failure_threshold=1, recovery_timeout=30, half_open_calls=1
+    )
+
+    assert asyncio.run(call(client)) == 404
+    assert upstream.calls == 1
+    assert client.breaker.state == CLOSED
+
+
+def test_retries_stop_when_the_budget_is_exhausted(
+    make_client, monkeypatch, isolated_budget
+):
+    use_policy(monkeypatch, "GET", "/product", retries=5, hedge=False)
+    isolated_budget.ratio = 0.0
+    isolated_budget.tokens = 2
+    upstream = Upstream(status_code=503)
+    client = make_client(upstream, coalesce=False)
+    client.breaker = CircuitBreaker(
+        failure_threshold=100, recovery_timeout=30, half_open_calls=1
+    )
+
+    # the first call retries twice out of its five, the next one not at all
+    assert asyncio.run(call(client)) == 503
+    assert upstream.calls == 3
+    assert asyncio.run(call(client)) == 503
+    assert upstream.calls == 4
+    assert isolated_budget.retries == 2
+    assert isolated_budget.exhausted == 2
+
+
+def test_retry_succeeds_within_the_budget(make_client, monkeypatch):
+    use_policy(monkeypatch, "GET", "/product", retries=2, hedge=False)
+    upstream = Upstream(statuses=(503, 502))
+    client = make_client(upstream, coalesce=False)
+
+    assert asyncio.run(call(client)) == 3
+
+
+@pytest.mark.parametrize("method", ["POST", "PATCH", "DELETE"])
+def test_unsafe_methods_are_not_retried(make_client, monkeypatch, method):
+    use_policy(monkeypatch, method, "/product", retries=3, hedge=False)
+    upstream = Upstream(status_code=503)
+    client = make_client(upstream, coalesce=False)
+
+    assert asyncio.run(call(client, method)) == 503
+    assert upstream.calls == 1
+
+
+def test_slow_get_is_hedged(make_client, monkeypatch):
+    use_policy(monkeypatch, "GET", "/product", retries=0, hedge=True)
+    monkeypatch.setattr(config, "UPSTREAM_HEDGE_MIN_DELAY", 0.02)
+    upstream = Upstream(delays=(1.0, 0.0))
+    client = make_client(upstream, coalesce=False)
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        result = await call(client)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(scenario())
+
+    # the copy answers first and the slow call is cancelled
+    assert result == 2
+    assert elapsed < 0.5
+    assert client.hedged == 1
+
+
+def test_fast_get_is_not_hedged(make_client, monkeypatch):
+    use_policy(monkeypatch, "GET", "/product", retries=0, hedge=True)
+    monkeypatch.setattr(config, "UPSTREAM_HEDGE_MIN_DELAY", 0.5)
+    upstream = Upstream()
+    client = make_client(upstream, coalesce=False)
+
+    assert asyncio.run(call(client)) == 1
+    assert upstream.calls == 1
+    assert client.hedged == 0
+
+
+def test_hedge_waits_when_the_budget_is_exhausted(
+    make_client, monkeypatch, isolated_budget
+):
+    use_policy(monkeypatch, "GET", "/product", retries=0, hedge=True)
+    monkeypatch.setattr(config, "UPSTREAM_HEDGE_MIN_DELAY", 0.02)
+    isolated_budget.ratio = 0.0
+    isolated_budget.tokens = 0
+    upstream = Upstream(delays=(0.1,))
+    client = make_client(upstream, coalesce=False)
+
+    assert asyncio.run(call(client)) == 1
+    assert upstream.calls == 1
+    assert client.hedged == 0
+
+
+def test_cancelled_probe_gives_its_slot_back(make_client, monkeypatch):
+    use_policy(monkeypatch, "GET", "/product", retries=0, hedge=False)
+    upstream = Upstream(status_code=500)
+    client = make_client(upstream, coalesce=False)
+    client.breaker = CircuitBreaker(
+        failure_threshold=1, recovery_timeout=0.02, half_open_calls=1
+    )
+
+    async def scenario():
+        assert await call(client) == 500
+        await asyncio.sleep(0.03)
+
+        upstream.status_code = 200
+        upstream.delays = [1.0]
+        probe = asyncio.create_task(call(client))
+        await asyncio.sleep(0.01)
+        assert client.breaker.state == HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # the next call probes instead of being rejected
+        assert await call(client) == 3
+        assert client.breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_probe_ending_in_an_unexpected_error_gives_its_slot_back(
+    make_client, monkeypatch
+):
+    use_policy(monkeypatch, "GET", "/product", retries=0, hedge=False)
+    upstream = Upstream(status_code=500)
+
+    async def handler(request):
+        if upstream.calls:
+            raise ValueError("response not readable")
+        return await upstream(request)
+
+    client = make_client(handler, coalesce=False)
+    client.breaker = CircuitBreaker(
+        failure_threshold=1, recovery_timeout=0.02, half_open_calls=1
+    )
+
+    async def scenario():
+        assert await call(client) == 500
+        await asyncio.sleep(0.03)
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await client.send("GET", "/product")
+
+    asyncio.run(scenario())
+    assert client.breaker.state == HALF_OPEN
+    assert client.breaker.probes == 0
@@ -0,0 +1,112 @@
+import os
+import random
+import string
+import time
+import tracemalloc
+
+from app.core.search import SearchIndex
+
+# items of the benchmark index, SEARCH_BENCHMARK_ITEMS=1000000 for a full run
+BENCHMARK_ITEMS = int(os.environ.get("SEARCH_BENCHMARK_ITEMS", 10000))
+CATEGORIES = {f"category-{index}": f"Category {index}" for index in range(50)}
+
+
+def make_words(count: int, seed: int = 7) -> list[str]:
+    randomizer = random.Random(seed)
+    return [
+        "".join(randomizer.choices(string.ascii_lowercase, k=randomizer.randint(4, 9)))
+        for _ in range(count)
+    ]
+
+
+def make_items(count: int, seed: int = 7) -> list[tuple[str, str, list[str]]]:
+    randomizer = random.Random(seed)
+    words = make_words(count // 2 + 10, seed)
+    categories = list(CATEGORIES)
+    return [
+        (
+            f"item-{index}",
+            " ".join(randomizer.choices(words, k=3)),
+            randomizer.sample(categories, k=2),
+        )
+        for index in range(count)
+    ]
+
+
+def build(items, bulk: bool) -> SearchIndex:
+    index = SearchIndex()
+    index.category_names.update(CATEGORIES)
+    if bulk:
+        with index.bulk_load():
+            for doc_id, name, category_uuids in items:
+                index.add(doc_id, name, category_uuids, {"item_uuid": doc_id})
+    else:
+        for doc_id, name, category_uuids in items:
+            index.add(doc_id, name, category_uuids, {"item_uuid": doc_id})
+    return index
+
+
+def test_bulk_load_matches_the_incremental_index():
+    items = make_items(2000)
+    incremental = build(items, bulk=False)
+    bulk = build(items, bulk=True)
+
+    queries = [name.split()[0] for _, name, _ in items[:50]]
+    queries += [query[:3] for query in queries] + [
+        query[:-1] + "x" for query in queries
+    ]
+    for query in queries:
+        assert bulk.search(query, limit=50) == incremental.search(query, limit=50)
+    assert bulk.stats() == incremental.stats()
+
+
+def test_prefix_search_during_a_bulk_load():
+    index = SearchIndex()
+    with index.bulk_load():
+        index.add("1", "Keyboard", [], {"item_uuid": "1"})
+        index.add("2", "Key ring", [], {"item_uuid": "2"})
+        index.add("2", "Mouse", [], {"item_uuid": "2"})
+
+        assert index.search("key") == [{"item_uuid": "1"}]
+
+    assert index.search("key") == [{"item_uuid": "1"}]
+    assert index.search("mou") == [{"item_uuid": "2"}]
+    index.remove("1")
+    assert index.search("key") == []
+
+
+def test_search_benchmark():
+    items = make_items(BENCHMARK_ITEMS)
+
+    started = time.perf_counter()
+    build(items, bulk=False)
+    incremental_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    build(items, bulk=True)
+    bulk_seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    index = build(items, bulk=True)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    randomizer = random.Random(11)
+    queries = []
+    for _, name, _ in randomizer.sample(items, 500):
+        word = randomizer.choice(name.split())
+        queries += [word, word[:3], word[:-1] + "q", name]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, category_uuid=randomizer.choice([None, "category-1"]))
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+
+    print(
+        f"\nsearch index of {len(index)} items: bulk build {bulk_seconds:.2f}s, "
+        f"incremental build {incremental_seconds:.2f}s, "
+        f"{memory / 2**20:.0f} MiB, query p99 {p99 * 1000:.2f}ms"
+    )
+    assert len(index) == BENCHMARK_ITEMS
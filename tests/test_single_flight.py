@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.single_flight import SingleFlight
+
+
+def test_concurrent_identical_gets_make_one_upstream_call(make_client):
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=[{"item_uuid": "a"}])
+
+    async def main():
+        client = make_client(handler)
+        results = await asyncio.gather(
+            *[client.get("/product/all", params={"page": 1}) for _ in range(100)]
+        )
+        return client, results
+
+    client, results = asyncio.run(main())
+
+    assert calls == 1
+    assert all(result == [{"item_uuid": "a"}] for result in results)
+    assert client.flight.stats()["shared"] == 99
+
+
+def test_different_params_are_not_coalesced(make_client):
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"page": request.url.params["page"]})
+
+    async def main():
+        client = make_client(handler)
+        return await asyncio.gather(
+            *[client.get("/product/all", params={"page": page}) for page in (1, 2, 1)]
+        )
+
+    results = asyncio.run(main())
+
+    assert calls == 2
+    assert [result["page"] for result in results] == ["1", "2", "1"]
+
+
+def test_the_error_is_shared_by_every_waiter(make_client):
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(404, json={"detail": "Product not found"})
+
+    async def main():
+        client = make_client(handler)
+        return await asyncio.gather(
+            *[client.get("/product", params={"item_uuid": "x"}) for _ in range(10)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+
+    assert calls == 1
+    assert all(
+        isinstance(result, HTTPException) and result.status_code == 404
+        for result in results
+    )
+
+
+def test_waiters_past_the_limit_get_a_503():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight(max_waiters=2)
+        return await asyncio.gather(
+            *[flight.do("key", slow) for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    assert results[:2] == ["done", "done"]
+    assert isinstance(results[2], HTTPException)
+    assert results[2].status_code == 503
+
+
+def test_a_waiter_times_out_without_cancelling_the_call():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight(max_waiters=10, timeout=0.01)
+        with pytest.raises(HTTPException) as error:
+            await flight.do("key", slow)
+        assert error.value.status_code == 504
+
+        # the call kept running and later callers share it
+        flight.timeout = None
+        return await flight.do("key", slow), flight.stats()
+
+    result, stats = asyncio.run(main())
+
+    assert result == "done"
+    assert stats["calls"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.common import dependencies
+from app.common.dependencies import (
+    create_access_token,
+    get_current_admin_user,
+    get_current_basic_user,
+)
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.crypto import TextCrypto
+
+
+@pytest.fixture
+def claims_cache(monkeypatch):
+    cache = TTLCache(ttl=60, max_entries=100)
+    monkeypatch.setattr(dependencies, "token_claims_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def decryptions(monkeypatch):
+    """
+    Count the AES decryptions of the token claims
+    """
+    calls = []
+    decrypt_text = TextCrypto.decrypt_text
+
+    def counted(self):
+        calls.append(1)
+        return decrypt_text(self)
+
+    monkeypatch.setattr(TextCrypto, "decrypt_text", counted)
+    return calls
+
+
+def make_token(
+    username: str = "admin@store.test",
+    role: str = None,
+    expires_delta: timedelta = None,
+) -> str:
+    return create_access_token(
+        {
+            "sub": "user-1",
+            "name": TextCrypto(plain_text=username).encrypt_text(),
+            "role": TextCrypto(plain_text=role or config.ADMIN_ROLE).encrypt_text(),
+        },
+        expires_delta=expires_delta,
+    )
+
+
+def current_user(token: str) -> dict:
+    return asyncio.run(get_current_basic_user(token))
+
+
+def test_claims_are_decrypted_once_per_token(claims_cache, decryptions):
+    token = make_token()
+
+    first = current_user(token)
+    for _ in range(5):
+        assert current_user(token) == first
+
+    assert first == {
+        "user_uuid": "user-1",
+        "username": "admin@store.test",
+        "role": config.ADMIN_ROLE,
+    }
+    # the name and the role of the first request only
+    assert len(decryptions) == 2
+    assert claims_cache.stats()["hits"] == 5
+
+
+def test_every_token_has_its_own_claims(claims_cache):
+    admin = current_user(make_token())
+    customer = current_user(make_token("ana@store.test", role=config.USER_ROLE))
+
+    assert admin["role"] == config.ADMIN_ROLE
+    assert customer["role"] == config.USER_ROLE
+    assert asyncio.run(get_current_admin_user(admin)) == admin
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_current_admin_user(customer))
+    assert error.value.status_code == 403
+
+
+def test_cached_claims_expire_with_the_token(claims_cache):
+    token = make_token(expires_delta=timedelta(seconds=1))
+    current_user(token)
+
+    time.sleep(1.1)
+
+    with pytest.raises(HTTPException) as error:
+        current_user(token)
+    assert error.value.status_code == 401
+
+
+def test_invalid_tokens_are_not_cached(claims_cache, decryptions):
+    token = make_token()
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            current_user(tampered)
+        assert error.value.status_code == 401
+
+    assert claims_cache.stats()["size"] == 0
+    assert decryptions == []
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from app.core.write_log import AppendLog
+
+
+def test_records_are_written_in_order_off_the_loop(tmp_path):
+    log = AppendLog(str(tmp_path / "cart.log"))
+    threads = set()
+    original_write = None
+
+    async def scenario():
+        nonlocal original_write
+        log.open()
+        file = log._AppendLog__file
+        original_write = file.write
+
+        def write(line):
+            threads.add(threading.current_thread().name)
+            return original_write(line)
+
+        file.write = write
+        await asyncio.gather(*(log.append(["set", "c", str(i), i]) for i in range(200)))
+        await log.close()
+
+    asyncio.run(scenario())
+
+    assert threads == {"append-log"}
+    assert list(log.read()) == [["set", "c", str(i), i] for i in range(200)]
+
+
+def test_queued_records_share_one_fsync(tmp_path, monkeypatch):
+    log = AppendLog(str(tmp_path / "cart.log"), fsync=True)
+    syncs = []
+    monkeypatch.setattr("app.core.write_log.os.fsync", syncs.append)
+
+    async def scenario():
+        log.open()
+        await asyncio.gather(*(log.append(["clear", str(i)]) for i in range(100)))
+        await log.close()
+
+    asyncio.run(scenario())
+
+    assert len(list(log.read())) == 100
+    assert 1 <= len(syncs) < 100
+
+
+def test_rotate_keeps_the_records_queued_before_it(tmp_path):
+    log = AppendLog(str(tmp_path / "cart.log"))
+
+    async def scenario():
+        log.open()
+        log.append(["set", "c", "a", 1])
+        log.append(["set", "c", "b", 2])
+        segments = await log.rotate()
+        await log.append(["set", "c", "a", 3])
+        return segments
+
+    segments = asyncio.run(scenario())
+
+    assert [path.name for path in segments] == ["cart.log.1"]
+    assert segments[0].read_text().splitlines() == [
+        '["set","c","a",1]',
+        '["set","c","b",2]',
+    ]
+    # a crash before the segment is removed replays both files in order
+    assert list(log.read()) == [
+        ["set", "c", "a", 1],
+        ["set", "c", "b", 2],
+        ["set", "c", "a", 3],
+    ]
+
+    async def flushed():
+        log.open()
+        await log.remove(segments)
+        await log.close()
+
+    asyncio.run(flushed())
+    assert list(log.read()) == [["set", "c", "a", 3]]
+
+
+def test_cut_line_is_skipped_on_replay(tmp_path):
+    path = tmp_path / "cart.log"
+    path.write_text('["set","c","a",1]\n["set","c","b",')
+
+    assert list(AppendLog(str(path)).read()) == [["set", "c", "a", 1]]